@@ -30,9 +30,17 @@ setup(
     python_requires='>=3.5, <4',
     install_requires=[
         'docker',
+        'importlib_metadata; python_version < "3.8"',
     ],
+    entry_points={
+        'pytest11': [
+            'integration_tester = integration_tester.pytest_plugin',
+        ],
+    },
     extras_require={
         'dev': ['check-manifest'],
+        # The plugin registered under `pytest11` uses `pytest.StashKey`.
+        'pytest': ['pytest>=7'],
         'test': [
             'pymongo',
             'pika',
@@ -0,0 +1,44 @@
+""" Command Line Module.
+
+Maintenance commands run with `python -m integration_tester`.
+```
+python -m integration_tester reap [--max-age SECONDS] [--all]
+```
+"""
+import argparse
+import sys
+from typing import List, Optional
+
+from integration_tester import reaper
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """ Run the command line interface.
+
+    Returns:
+        The exit status of the command.
+    """
+    parser = argparse.ArgumentParser(prog="python -m integration_tester")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    reap = commands.add_parser(
+        "reap", help="Remove containers left behind by previous runs.")
+    reap.add_argument("--max-age",
+                      type=float,
+                      help="Also remove containers older than this many "
+                      "seconds, whichever process created them.")
+    reap.add_argument("--all",
+                      action="store_true",
+                      dest="everything",
+                      help="Remove every container created by a driver.")
+
+    arguments = parser.parse_args(argv)
+    removed = reaper.reap(arguments.max_age, arguments.everything)
+    for container_id in removed:
+        print(container_id)
+    print(f"Removed {len(removed)} container(s).", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+""" Asynchronous Driver Module.
+
+This module wraps the blocking `Driver` API for use with `asyncio`. Every
+blocking operation (starting the container, readiness checks, resets and
+teardown) is run in the default executor of the event loop, so container
+lifecycles overlap with other work on the loop instead of stalling it.
+
+Typical usage is done through an asynchronous context manager.
+``` python
+from integration_tester import mongo_driver
+
+async with mongo_driver.AsyncMongoDBDriver() as mongo:
+    # test code
+    await mongo.reset()
+```
+
+Asynchronous versions of the service drivers are found in their respective
+modules, i.e. `mongo_driver.AsyncMongoDBDriver`.
+"""
+import asyncio
+import functools
+from typing import Any, Callable, Optional, Type, Union
+
+from integration_tester import driver, reaper
+
+
+class AsyncDriver:
+    """ Base asynchronous Docker Abstraction.
+
+    This Class creates the driver of `driver_class` with the arguments given
+    on initialisation once `start` is awaited. The underlying driver is
+    available through the `driver` attribute once started.
+    """
+    driver_class: Type[driver.Driver] = driver.Driver
+
+    def __init__(self, *args, **kwargs):
+        """ Initialise the asynchronous driver.
+
+        No container is created until `start` is awaited.
+
+        Args:
+            args: Positional arguments used to create the driver.
+            kwargs: Keyword arguments used to create the driver.
+        """
+        self._args, self._kwargs = args, kwargs
+        self.driver: Optional[driver.Driver] = None
+
+    async def start(self) -> None:
+        """ Create and start the Docker container. """
+        # The container is created in the executor, the signal handlers can
+        # only be installed from the main thread.
+        reaper.install()
+        self.driver = await self._run(self.driver_class, *self._args,
+                                      **self._kwargs)
+
+    async def ready(self) -> bool:
+        """ Container ready check, see `Driver.ready`. """
+        return await self._run(self._started().ready)
+
+    async def wait_until_ready(self,
+                               wait_interval: Optional[Union[float,
+                                                             int]] = None,
+                               timeout: int = 60) -> None:
+        """ Wait until the container is ready to be used.
+
+        See `Driver.wait_until_ready`.
+        """
+        await self._run(self._started().wait_until_ready, wait_interval,
+                        timeout)
+
+    async def reset(self, *args, **kwargs) -> None:
+        """ Reset the service, see `Driver.reset`. """
+        await self._run(self._started().reset, *args, **kwargs)
+
+    async def stop(self) -> None:
+        """ Stop and remove the Docker container.
+
+        The driver is closed in the executor, so the Docker calls of
+        `Driver.close` do not block the event loop.
+        """
+        if self.driver is not None:
+            instance, self.driver = self.driver, None
+            await self._run(instance.close)
+
+    async def __aenter__(self) -> "AsyncDriver":
+        """ Start the container and wait until it is ready to be used. """
+        await self.start()
+        try:
+            await self.wait_until_ready()
+        except BaseException:
+            await self.stop()
+            raise
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    def _started(self) -> driver.Driver:
+        """ Retrieve the underlying driver, ensuring it has been started. """
+        if self.driver is None:
+            raise RuntimeError("The driver has not been started.")
+        return self.driver
+
+    @staticmethod
+    async def _run(function: Callable, *args, **kwargs) -> Any:
+        """ Run a blocking function in the default executor. """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(function, *args, **kwargs))
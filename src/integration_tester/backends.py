@@ -0,0 +1,298 @@
+""" Docker Backends Module.
+
+This module spreads containers over several Docker services. Each Docker
+service is an `Endpoint`, and a `Scheduler` places every new driver on the
+endpoint with the most spare capacity, so a large suite is not limited by a
+single machine.
+
+Typical usage is done through the `INTEGRATION_TESTER_DOCKER_HOSTS`
+environment variable, a comma separated list of Docker service URLs.
+```
+INTEGRATION_TESTER_DOCKER_HOSTS=tcp://10.0.0.2:2375,tcp://10.0.0.3:2375 pytest
+```
+
+The scheduler can also be configured in code.
+``` python
+from integration_tester import backends, mongo_driver
+
+backends.configure(["tcp://10.0.0.2:2375", "tcp://10.0.0.3:2375"])
+mongo = mongo_driver.MongoDBDriver(port=0)
+print(mongo.url)  # mongodb://10.0.0.2:49153
+```
+
+Without a scheduler every driver uses the `LOCAL` endpoint, the Docker service
+of the environment (`DOCKER_HOST`). Ports of containers on remote endpoints
+are published on every interface of the remote machine, and drivers report the
+address of that machine as their `host`.
+
+Docker does not report the free memory of a machine, it is estimated from the
+total memory and the number of running containers, see `Scheduler`.
+"""
+import os
+import threading
+import time
+import urllib.parse
+from typing import (ContextManager, Dict, Iterable, List, NamedTuple, Optional,
+                    Tuple)
+
+import docker
+import requests
+
+from integration_tester import docker_client, errors, monitor
+
+# Comma separated URLs of the Docker services to schedule containers on.
+HOSTS_ENVIRONMENT_VARIABLE = "INTEGRATION_TESTER_DOCKER_HOSTS"
+
+
+class Endpoint:
+    """ A single Docker service.
+
+    Attr:
+        base_url: URL of the Docker service, `None` for the environment.
+        host: Address the published ports of containers are reachable at,
+              `None` to keep the address requested by the driver.
+        bind_address: Address published ports are bound to on the Docker
+                      service machine, `None` to keep the address requested
+                      by the driver.
+        manager: Client manager of the Docker service.
+        monitor: Event stream monitor of the Docker service.
+    """
+    def __init__(self,
+                 base_url: Optional[str] = None,
+                 host: Optional[str] = None,
+                 bind_address: Optional[str] = "0.0.0.0"):
+        """ Initialise the endpoint.
+
+        No connection to Docker is made on initialisation.
+
+        Args:
+            base_url: URL of the Docker service, i.e. `tcp://10.0.0.2:2375`.
+                      If `None` the shared client of the environment is used.
+            host: Address the published ports are reachable at. Defaults to
+                  the host name of `base_url`, or to the address requested by
+                  each driver for local sockets.
+            bind_address: Address published ports are bound to, ignored for
+                          local sockets.
+        """
+        self.base_url = base_url
+        if base_url is None:
+            self.manager = docker_client.MANAGER
+            self.monitor = monitor.MONITOR
+        else:
+            self.manager = docker_client.ClientManager(base_url=base_url)
+            self.monitor = monitor.Monitor(client=self.manager.get)
+
+        url = urllib.parse.urlsplit(base_url or "")
+        remote = url.scheme in ("tcp", "http", "https", "ssh")
+        self.host = host or (url.hostname if remote else None)
+        self.bind_address = bind_address if remote else None
+
+    def client(self) -> docker.DockerClient:
+        """ Retrieve the Docker client of the endpoint.
+
+        Exceptions:
+            errors.DockerNotAvailable: Raised if the connection to the Docker
+                                       service can not be established.
+        """
+        return self.manager.get()
+
+    def connection(self) -> ContextManager[docker.DockerClient]:
+        """ Use the Docker client of the endpoint.
+
+        The client is discarded if the connection to the Docker service fails
+        within the block, see `docker_client.ClientManager.connection`.
+        """
+        return self.manager.connection()
+
+    def __repr__(self) -> str:
+        return f"Endpoint({self.base_url!r})"
+
+
+class Capacity(NamedTuple):
+    """ Resources of an endpoint, as last reported by the Docker service.
+
+    Attr:
+        cpus: Number of CPUs of the machine.
+        memory: Total memory of the machine in bytes.
+        running: Number of running containers.
+    """
+    cpus: int
+    memory: int
+    running: int
+
+
+class Scheduler:  # pylint: disable=R0903
+    """ Placement of containers across endpoints.
+
+    The resources of each endpoint are read with `docker info` at most once
+    every `refresh_interval` seconds. In between, every placement counts as a
+    running container so concurrent drivers are spread out.
+
+    An endpoint is chosen by, in order:
+    - enough estimated free memory for another container, each running
+      container being assumed to use `container_memory` bytes,
+    - the fewest running containers per CPU,
+    - the most estimated free memory.
+
+    Endpoints which can not be reached are skipped until the next refresh.
+    """
+    def __init__(self,
+                 endpoints: Iterable[Endpoint],
+                 container_memory: int = 512 * 1024 * 1024,
+                 refresh_interval: float = 5):
+        """ Initialise the scheduler.
+
+        Args:
+            endpoints: Endpoints to place containers on.
+            container_memory: Estimated memory used by each container, in
+                              bytes.
+            refresh_interval: Seconds the reported resources are reused for.
+        """
+        self.endpoints: List[Endpoint] = list(endpoints)
+        if not self.endpoints:
+            raise ValueError("A scheduler needs at least one endpoint.")
+        self.container_memory = container_memory
+        self.refresh_interval = refresh_interval
+
+        # Last report of each endpoint, `None` if it could not be reached,
+        # and the containers placed on it since.
+        self._capacities: Dict[int, Optional[Capacity]] = {}
+        self._reported_at: Dict[int, float] = {}
+        self._placed: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def place(self) -> Endpoint:
+        """ Choose the endpoint of a new container.
+
+        Endpoints are asked for their resources without holding the lock, so
+        a slow or unreachable endpoint only delays the placements refreshing
+        it, not the placements reusing a recent report.
+
+        Returns:
+            The endpoint with the most spare capacity.
+
+        Exceptions:
+            errors.DockerNotAvailable: Raised if no endpoint can be reached.
+        """
+        with self._lock:
+            stale = [
+                index for index in range(len(self.endpoints))
+                if self._stale(index)
+            ]
+
+        reports = []
+        for index in stale:
+            reports.append((index, time.monotonic(), self._read(index)))
+
+        with self._lock:
+            for index, reported_at, capacity in reports:
+                self._report(index, reported_at, capacity)
+            candidates = []
+            for index in range(len(self.endpoints)):
+                capacity = self._capacities.get(index)
+                if capacity is not None:
+                    candidates.append((self._load(index, capacity), index))
+            if not candidates:
+                raise errors.DockerNotAvailable()
+
+            _, index = min(candidates)
+            self._placed[index] += 1
+            return self.endpoints[index]
+
+    def _load(self, index: int, capacity: Capacity) -> Tuple[bool, float, int]:
+        """ Sort key of an endpoint, the lowest is placed on first. """
+        running = capacity.running + self._placed[index]
+        free_memory = capacity.memory - running * self.container_memory
+        return (free_memory < self.container_memory,
+                (running + 1) / max(capacity.cpus, 1), -free_memory)
+
+    def _stale(self, index: int) -> bool:
+        """ Whether the report of an endpoint has to be refreshed. """
+        reported_at = self._reported_at.get(index)
+        return reported_at is None or (time.monotonic() - reported_at
+                                       >= self.refresh_interval)
+
+    def _read(self, index: int) -> Optional[Capacity]:
+        """ Ask an endpoint for its resources, `None` if it is unreachable.
+        """
+        try:
+            info = self.endpoints[index].client().info()
+        except (docker.errors.APIError, errors.DockerNotAvailable,
+                requests.exceptions.RequestException):
+            return None
+        return Capacity(info.get("NCPU", 1), info.get("MemTotal", 0),
+                        info.get("ContainersRunning", 0))
+
+    def _report(self, index: int, reported_at: float,
+                capacity: Optional[Capacity]) -> None:
+        """ Store the resources of an endpoint read at `reported_at`.
+
+        Concurrent placements may refresh the same endpoint. A report read
+        before the stored one is dropped, it would forget the containers
+        placed since.
+        """
+        previous = self._reported_at.get(index)
+        if previous is not None and previous >= reported_at:
+            return
+        self._capacities[index] = capacity
+        self._reported_at[index] = reported_at
+        self._placed[index] = 0
+
+
+# Scheduler used for drivers created without an endpoint, see `configure`.
+SCHEDULER: Optional[Scheduler] = None
+
+# Endpoint of the Docker service of the environment.
+LOCAL = Endpoint()
+
+_ENDPOINTS: Dict[str, Endpoint] = {}
+_ENDPOINTS_LOCK = threading.Lock()
+
+
+def endpoint(base_url: Optional[str] = None) -> Endpoint:
+    """ Retrieve the endpoint of a Docker service URL.
+
+    The same endpoint, and so the same client and monitor, is returned for
+    every call with the same URL.
+
+    Args:
+        base_url: URL of the Docker service, `None` for `LOCAL`.
+    """
+    if base_url is None:
+        return LOCAL
+    with _ENDPOINTS_LOCK:
+        if base_url not in _ENDPOINTS:
+            _ENDPOINTS[base_url] = Endpoint(base_url)
+        return _ENDPOINTS[base_url]
+
+
+def configure(base_urls: Optional[Iterable[str]], **kwargs) -> None:
+    """ Schedule new drivers across several Docker services.
+
+    Args:
+        base_urls: URLs of the Docker services. `None` or no URLs disables
+                   the scheduler, placing every driver on `LOCAL`.
+        kwargs: Additional arguments passed to `Scheduler`.
+    """
+    global SCHEDULER  # pylint: disable=W0603
+    urls = list(base_urls or [])
+    SCHEDULER = None
+    if urls:
+        SCHEDULER = Scheduler([endpoint(url) for url in urls], **kwargs)
+
+
+def place() -> Endpoint:
+    """ Choose the endpoint of a new driver.
+
+    Returns:
+        The endpoint chosen by `SCHEDULER`, or `LOCAL` if it is not set.
+    """
+    if SCHEDULER is None:
+        return LOCAL
+    return SCHEDULER.place()
+
+
+if os.environ.get(HOSTS_ENVIRONMENT_VARIABLE):
+    configure(url.strip()
+              for url in os.environ[HOSTS_ENVIRONMENT_VARIABLE].split(",")
+              if url.strip())
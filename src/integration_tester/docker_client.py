@@ -0,0 +1,178 @@
+""" Shared Docker Client Module.
+
+This module manages a single, process-wide Docker client which is shared by
+all drivers. Sharing the client means the HTTP connection pool to the Docker
+service is reused instead of being rebuilt for every container operation.
+
+Typical usage is done through the module level `get_client` function.
+``` python
+from integration_tester import docker_client
+
+client = docker_client.get_client()
+```
+
+The health of the connection is checked with a cheap `ping` and the client is
+automatically recreated if the Docker service has been restarted. Calls made
+through `ClientManager.connection` discard the client as soon as they fail to
+reach the Docker service.
+``` python
+with docker_client.MANAGER.connection() as client:
+    client.containers.list()
+```
+"""
+import contextlib
+import threading
+import time
+from typing import Iterator, Optional, Union
+
+import docker
+import requests
+
+from integration_tester import errors
+
+
+class ClientManager:
+    """ Process-wide Docker client manager.
+
+    This Class lazily creates a `docker.DockerClient` and hands out the same
+    instance to every caller. The connection is re-validated with a `ping` when
+    it has not been checked for `probe_interval` seconds. If the probe fails,
+    the client is discarded and a new connection is attempted once before
+    raising `errors.DockerNotAvailable`.
+    """
+    def __init__(self,
+                 max_pool_size: int = docker.constants.DEFAULT_MAX_POOL_SIZE,
+                 probe_interval: Union[float, int] = 5,
+                 base_url: Optional[str] = None):
+        """ Initialise the client manager.
+
+        No connection to Docker is made on initialisation.
+
+        Args:
+            max_pool_size: Maximum number of HTTP connections kept open to the
+                           Docker service.
+            probe_interval: Seconds between health probes of the cached
+                            client.
+            base_url: URL of the Docker service, i.e. `tcp://10.0.0.2:2375`.
+                      Defaults to the environment, see `docker.from_env`.
+        """
+        self.base_url = base_url
+        self.max_pool_size = max_pool_size
+        self.probe_interval = probe_interval
+
+        self._client: Optional[docker.DockerClient] = None
+        self._last_probe = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> docker.DockerClient:
+        """ Retrieve the shared Docker client.
+
+        Returns:
+            A DockerClient object which is used to interact with the docker
+            service.
+
+        Exceptions:
+            errors.DockerNotAvailable: Raised if the connection to the Docker
+                                       service can not be established.
+        """
+        with self._lock:
+            if self._client is not None:
+                if time.monotonic() - self._last_probe < self.probe_interval:
+                    return self._client
+                if self._ping(self._client):
+                    return self._client
+
+                # The Docker service is gone or has been restarted, the pooled
+                # connections are stale.
+                self._discard()
+
+            self._client = self._connect()
+            return self._client
+
+    def invalidate(self, client: Optional[docker.DockerClient] = None) -> None:
+        """ Discard the cached client.
+
+        The next call to `get` will create a new connection. This should be
+        used when a Docker API call fails due to a broken connection.
+
+        Args:
+            client: Client the call failed with. It is only discarded if it is
+                    still the cached client, not if another thread already
+                    replaced it.
+        """
+        with self._lock:
+            if client is None or client is self._client:
+                self._discard()
+
+    @contextlib.contextmanager
+    def connection(self) -> Iterator[docker.DockerClient]:
+        """ Use the shared Docker client, discard it if the connection fails.
+
+        The client is invalidated, see `invalidate`, when the block raises a
+        `requests.exceptions.ConnectionError`, or a server error
+        `docker.errors.APIError` after which the Docker service no longer
+        answers a `ping`. The exception is raised again in every case.
+
+        Exceptions:
+            errors.DockerNotAvailable: Raised if the connection to the Docker
+                                       service can not be established.
+        """
+        client = self.get()
+        try:
+            yield client
+        except requests.exceptions.ConnectionError:
+            self.invalidate(client)
+            raise
+        except docker.errors.APIError as error:
+            if error.is_server_error() and not self._ping(client):
+                self.invalidate(client)
+            raise
+
+    def _connect(self) -> docker.DockerClient:
+        """ Create and validate a new Docker client.
+
+        Exceptions:
+            errors.DockerNotAvailable: Raised if the connection to the Docker
+                                       service can not be established.
+        """
+        try:
+            if self.base_url is None:
+                client = docker.from_env(max_pool_size=self.max_pool_size)
+            else:
+                client = docker.DockerClient(base_url=self.base_url,
+                                             max_pool_size=self.max_pool_size)
+        except (docker.errors.DockerException,
+                requests.exceptions.ConnectionError) as error:
+            raise errors.DockerNotAvailable() from error
+
+        if not self._ping(client):
+            client.close()
+            raise errors.DockerNotAvailable()
+        return client
+
+    def _ping(self, client: docker.DockerClient) -> bool:
+        """ Cheap health probe of the Docker service. """
+        try:
+            client.ping()
+        except (docker.errors.APIError, requests.exceptions.ConnectionError):
+            return False
+        self._last_probe = time.monotonic()
+        return True
+
+    def _discard(self) -> None:
+        """ Close and drop the cached client. """
+        if self._client is not None:
+            self._client.close()
+        self._client = None
+        self._last_probe = 0.0
+
+
+MANAGER = ClientManager()
+
+
+def get_client() -> docker.DockerClient:
+    """ Retrieve the process-wide shared Docker client.
+
+    See `ClientManager.get`.
+    """
+    return MANAGER.get()
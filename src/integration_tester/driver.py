@@ -13,48 +13,149 @@ class SomeNewDriver(driver.Driver):
     ...
 ```
 
-This module will raise a `DockerNotAvailable` exception on import if Docker is
-not running or incorrectly configured.
+Drivers should be closed once they are no longer needed, either explicitly
+or through a `with` block.
+``` python
+with SomeNewDriver() as service:
+    ...
+```
+
+Importing this module does not connect to Docker. The connection is made, and
+cached, the first time a driver is used. A `DockerNotAvailable` exception is
+raised at that point if Docker is not running or incorrectly configured.
 """
+import concurrent.futures
+import shlex
+import threading
 import time
-from typing import Dict, Optional, Tuple, Union
+from typing import Dict, List, Optional, Pattern, Tuple, Union
 
 import docker
-import requests
 
-from integration_tester import errors
+from integration_tester import (backends, docker_client, errors, images,
+                                instrumentation, monitor, readiness, reaper,
+                                resources, shell)
+
+# Options of the tmpfs mounts used for data directories. The mode allows the
+# unprivileged users the services run as to write to the mount.
+TMPFS_OPTIONS = "rw,mode=1777"
+
+
+def owned_directory_command(command: List[str], directory: str,
+                            user: str) -> List[str]:
+    """ Wrap the command of an official image to create a data directory.
+
+    The entrypoints of the official images only prepare the volumes declared
+    by the image for the unprivileged user the service runs as. The wrapped
+    command creates `directory`, hands it to `user` and then runs `command`
+    through the entrypoint as usual.
+
+    Returns:
+        The wrapped command.
+    """
+    quoted = shlex.quote(directory)
+    arguments = " ".join(shlex.quote(argument) for argument in command)
+    return [
+        "sh", "-c", f"mkdir -p {quoted} && chown {shlex.quote(user)} {quoted}"
+        f" && exec docker-entrypoint.sh {arguments}"
+    ]
+
 
-# Test Docker client connection
-try:
-    docker.from_env().images.list()
-except requests.exceptions.ConnectionError as error:
-    raise errors.DockerNotAvailable() from error
+# Executor removing the containers of drivers closed with `wait=False`. Its
+# threads are joined on interpreter exit, so pending removals still finish.
+REMOVER = concurrent.futures.ThreadPoolExecutor(
+    max_workers=8, thread_name_prefix="integration_tester_remove")
 
 
-class Driver:
+class Driver:  # pylint: disable=R0902
     """ Base Docker Abstraction.
 
     This Class abstracts the Python Docker SDK by starting, stopping and
     cleaning Docker containers and images. This driver should only be used as a
     base Class to other higher level Classes.
+
+    Subclasses tune readiness detection through the Class attributes:
+    `ready_backoff` sets the polling gaps of `wait_until_ready` and
+    `ready_log_pattern` is a regular expression matching the log line written
+    by the service once it accepts connections.
+
+    Subclasses which can keep their data outside of the volumes of the image,
+    through a `data_directory` argument, set `seed_directory` to the directory
+    used by `seeding`.
+
+    `memory_preset` and `cpu_preset` are the memory limit and the number of
+    CPUs given to the container when `mem_limit` and `cpuset_cpus` are set to
+    `resources.AUTO`.
+
+    `reset_command` is a shell command resetting the service from inside the
+    container, used by `exec_reset`.
     """
     _status = True
 
-    def __init__(self,
-                 tag: str,
-                 ports: Optional[Dict[int, Tuple[str, int]]] = None,
-                 remove_image: bool = False):
+    ready_backoff = readiness.Backoff(initial=0.01, factor=2, maximum=1)
+    ready_log_pattern: Optional[Union[str, Pattern]] = None
+    seed_directory: Optional[str] = None
+    memory_preset: Optional[str] = None
+    cpu_preset = 1
+    reset_command: Optional[str] = None
+
+    def __init__(  # pylint: disable=R0913
+            self,
+            tag: str,
+            ports: Optional[Dict[int, Tuple[str, int]]] = None,
+            remove_image: bool = False,
+            *,
+            command: Optional[Union[str, List[str]]] = None,
+            container_id: Optional[str] = None,
+            stop_timeout: Optional[int] = 10,
+            tmpfs: Optional[Dict[str, str]] = None,
+            image: Optional[str] = None,
+            endpoint: Optional[backends.Endpoint] = None,
+            mem_limit: Optional[resources.MemorySize] = None,
+            cpuset_cpus: Optional[str] = None,
+            nano_cpus: Optional[int] = None,
+            shm_size: Optional[resources.MemorySize] = None,
+            environment: Optional[Dict[str, str]] = None):
         """ Initialise the driver.
 
         Initialisation includes creating and starting a detached instance of
         the Docker container associated to the `tag` provided.
 
+        If `container_id` is provided, the already running container is used
+        instead. The driver does not own the container, so it is not removed
+        when the driver is closed.
+
         Args:
             tag: Reference to the specific version of Docker Image to pull from
                  Docker Hub.
             ports: Ports to expose from the container.
             remove_image: Flag to delete the Docker Image from the local machine
-                          on object deconstruction.
+                          when the driver is closed.
+            command: Command to run in the container instead of the default
+                     command of the image.
+            container_id: ID of a running container to attach to instead of
+                          starting a new container.
+            stop_timeout: Seconds the container is given to stop gracefully
+                          when the driver is closed. If `0` or `None` the
+                          container is killed straight away, which is the
+                          fastest teardown for disposable test data.
+            tmpfs: Paths inside the container to mount in memory, mapped to
+                   the mount options, i.e. `{"/data": TMPFS_OPTIONS}`.
+            image: Docker Image to run instead of `tag`, i.e. an image
+                   created with `commit`.
+            endpoint: Docker service to run the container on. Defaults to
+                      the endpoint chosen by `backends.place`, or to
+                      `backends.LOCAL` when attaching to `container_id`.
+            mem_limit: Memory limit of the container, in bytes or as a
+                       Docker memory size (i.e. `512m`). `resources.AUTO`
+                       uses the `memory_preset` of the driver.
+            cpuset_cpus: CPUs the container may run on, i.e. `0,1`.
+                         `resources.AUTO` pins the container to `cpu_preset`
+                         CPUs, disjoint from the other running containers,
+                         of every process, where possible.
+            nano_cpus: CPU quota of the container in units of 1e-9 CPUs.
+            shm_size: Size of `/dev/shm`, in bytes or as a Docker memory size.
+            environment: Environment variables set in the container.
 
         Tags refer to the Docker Image version "tag" which can be found on the
         [Docker Hub](https://hub.docker.com/) for any given public image.
@@ -67,26 +168,139 @@ class Driver:
         ```
         This will bind `port_from` to the address `address_to` and to the port
         `port_to`. I.E. `port_from` -> `address_to:port_to`.
+
+        If `port_to` is `0` or `None` Docker binds a free ephemeral port. The
+        host port actually bound is read back from the container and found in
+        the `ports` attribute, i.e. `driver.ports[port_from]`.
+
+        On a remote endpoint `address_to` is replaced by the bind address of
+        the endpoint, and the `host` attribute, the address clients of the
+        service connect to, by the address of the remote machine.
         """
         self.tag = tag
+        self.image = image or tag
+        self.command = command
+        self.stop_timeout = stop_timeout
+        self.tmpfs = tmpfs or {}
         self._remove_image = remove_image
+        self._owner = container_id is None
+        self._cpuset: Optional[str] = None
+        self._shell: Optional[shell.Shell] = None
+        self._shell_lock = threading.Lock()
+        self._closed = False
+
+        if endpoint is None:
+            endpoint = (backends.LOCAL
+                        if container_id is not None else backends.place())
+        self.endpoint = endpoint
+        if endpoint.host is not None:
+            self.host = endpoint.host
+
+        self._ports = self._port_bindings(ports or {}, endpoint.bind_address)
+
+        if container_id is not None:
+            self._container_id = container_id
+            self.ports = self._bound_ports()
+            return
+
+        self.mem_limit = self._memory_limit(mem_limit)
+        self.cpuset_cpus = cpuset_cpus
+        if cpuset_cpus == resources.AUTO:
+            self.cpuset_cpus = resources.allocator(endpoint).acquire(
+                self.cpu_preset, resources.foreign_cpusets(endpoint))
+            self._cpuset = self.cpuset_cpus
+
+        self._create_container({
+            "command": self.command,
+            "cpuset_cpus": self.cpuset_cpus,
+            "detach": True,
+            "environment": environment,
+            "labels": self._labels(),
+            "mem_limit": self.mem_limit,
+            "nano_cpus": nano_cpus,
+            "ports": self._ports,
+            "shm_size": shm_size,
+            "tmpfs": self.tmpfs,
+        })
+
+    def _labels(self) -> Dict[str, str]:
+        """ Labels of the container, see `reaper` and `resources`. """
+        labels = reaper.labels()
+        if self.cpuset_cpus is not None:
+            labels[resources.CPUSET_LABEL] = self.cpuset_cpus
+        return labels
+
+    def _create_container(self, options: Dict) -> None:
+        """ Create and start the container, pulling the image if needed. """
+        self.endpoint.monitor.start()
+        options = {
+            name: value
+            for name, value in options.items() if value is not None
+        }
+        # The container is created from the repository digest of the image,
+        # not its tag, see `images`.
+        image = images.MANAGER.cached(self.image)
+        if image is None:
+            with instrumentation.measure(self, "pull"):
+                image = self._resolve_image()
+        with self.endpoint.connection() as client:
+            try:
+                with instrumentation.measure(self, "create"):
+                    container = client.containers.create(image, **options)
+            except docker.errors.ImageNotFound:
+                with instrumentation.measure(self, "pull"):
+                    image = self._resolve_image()
+                with instrumentation.measure(self, "create"):
+                    container = client.containers.create(image, **options)
+            self._container_id = container.id
+
+            with instrumentation.measure(self, "start"):
+                container.start()
+            reaper.track(self)
+            self.ports = self._bound_ports(container)
+
+    def _resolve_image(self) -> str:
+        """ Pull the image if needed and return its repository digest. """
+        # Do not pull the image a second time if it is being pre-pulled.
+        images.MANAGER.wait(self.image, endpoint=self.endpoint)
+        return images.MANAGER.resolve(self.image, endpoint=self.endpoint)
+
+    @classmethod
+    def _memory_limit(
+            cls, mem_limit: Optional[resources.MemorySize]) -> Optional[int]:
+        """ Resolve a `mem_limit` argument to bytes.
+
+        Subclasses use it to size the memory settings of the service before
+        the container is created.
+        """
+        if mem_limit == resources.AUTO:
+            mem_limit = cls.memory_preset
+        return resources.memory_bytes(mem_limit)
 
-        self._ports = {}
-        if ports is not None:
-            self._ports = ports
-
-        # Client has to be recreated each time it is used. See issue#5:
-        # https://github.com/Liamdoult/integration_tester/issues/5
-        client = self._get_docker_client()
-        container = client.containers.run(self.tag,
-                                          detach=True,
-                                          ports=self._ports)
-        self._container_id = container.id
+    @staticmethod
+    def _port_bindings(ports: Dict[int, Tuple[str, int]],
+                       bind_address: Optional[str]) -> Dict[int, Tuple]:
+        """ Convert the requested ports to Docker port bindings.
 
-    def __del__(self) -> None:
+        Ports without a host port are bound to a free port chosen by Docker.
+        """
+        bindings = {}
+        for port_from, (address, port_to) in ports.items():
+            address = bind_address or address
+            bindings[port_from] = ((address, ) if port_to in (0, None) else
+                                   (address, port_to))
+        return bindings
+
+    def close(self, wait: bool = True) -> Optional[concurrent.futures.Future]:
         """ Ensure proper removal of docker resources.
 
         The container and its associated volume is stopped and *Force* deleted.
+        Closing a driver more than once has no effect.
+
+        The container is stopped with the `stop_timeout` grace period given on
+        initialisation, or killed if it is `0` or `None`. If `wait` is False
+        the removal is handed to the `REMOVER` background threads and a future
+        of the removal is returned.
 
         If `_remove_image` is set to True on initialisation this will delete
         the downloaded (or existing) local image. This is a soft delete
@@ -94,29 +308,215 @@ class Driver:
         *not* delete the image). This is to ensure that we don't get any "YouR
         CoDe BroKE mY dAtA ConTainEr" messages.
         """
-        # Client has to be recreated each time it is used. See issue#5:
-        # https://github.com/Liamdoult/integration_tester/issues/5
-        client = self._get_docker_client()
-        container = client.containers.get(self._container_id)
+        # Initialisation may have failed before the container was created.
+        if getattr(self, "_closed", True):
+            return None
+        self._closed = True
+        reaper.untrack(self)
+        if self._cpuset is not None:
+            resources.allocator(self.endpoint).release(self._cpuset)
+            self._cpuset = None
+
+        self._close_clients()
+        with self._shell_lock:
+            if self._shell is not None:
+                self._shell.close()
+                self._shell = None
+        if not self._owner or not hasattr(self, "_container_id"):
+            return None
+
+        if not wait:
+            return REMOVER.submit(self._remove_container)
+        self._remove_container()
+        return None
+
+    def _remove_container(self) -> None:
+        """ Stop, or kill, and remove the container and the optional image. """
+        with self.endpoint.connection() as client:
+            container = client.containers.get(self._container_id)
+
+            # Image needs to be retrieved prior to container object
+            # deconstruction.
+            image = container.image
+
+            # A forced removal kills the container, skipping the stop entirely.
+            if self.stop_timeout:
+                with instrumentation.measure(self, "stop"):
+                    container.stop(timeout=self.stop_timeout)
+            with instrumentation.measure(self, "remove"):
+                container.remove(v=True, force=True)
+
+            # Image needs to be deleted after container deconstruction due to
+            # referencing issues.
+            if self._remove_image is True:
+                try:
+                    client.images.remove(image.id)
+                except docker.errors.APIError as error:
+                    if error.status_code != 409:
+                        raise error
+
+    def execute(self, command: Union[str, List[str]]) -> Tuple[int, bytes]:
+        """ Run a command inside the container.
 
-        # Image needs to be retrieved prior to container object deconstruction.
-        image = container.image
+        Args:
+            command: Command to run, i.e. `["redis-cli", "flushall"]`.
 
-        container.stop()
-        container.remove(v=True, force=True)
+        Returns:
+            The exit code of the command and its combined output.
+        """
+        with self.endpoint.connection() as client:
+            exec_id = client.api.exec_create(self._container_id, command)["Id"]
+            output = client.api.exec_start(exec_id)
+            return client.api.exec_inspect(exec_id)["ExitCode"], output
 
-        # Image needs to be deleted after container deconstruction due to
-        # referencing issues.
-        if self._remove_image is True:
-            try:
-                client.images.remove(image.id)
-            except docker.errors.APIError as error:
-                if error.status_code != 409:
-                    raise error
+    def shell(self,
+              command: str,
+              timeout: Optional[float] = None) -> Tuple[int, bytes]:
+        """ Run a command with the shell kept running inside the container.
+
+        Unlike `execute`, no exec instance is created per command. The shell
+        is started by the first call and reused until the driver is closed,
+        or started again if it has exited.
+
+        Args:
+            command: Shell command line, i.e. `redis-cli FLUSHALL ASYNC`.
+            timeout: Seconds to wait for the command, `None` to wait forever.
+
+        Returns:
+            The exit code of the command and its combined output.
+
+        Exceptions:
+            errors.ShellExited: Raised if the shell exits while running the
+                                command, i.e. when the container stops.
+        """
+        with self._shell_lock:
+            if self._shell is None or self._shell.closed:
+                self._shell = shell.Shell(self.endpoint.client().api,
+                                          self._container_id)
+            session = self._shell
+        return session.run(command, timeout)
+
+    @instrumentation.timed("reset")
+    def exec_reset(self) -> None:
+        """ Reset the service from inside the container.
+
+        `reset_command` is run through `shell`, so the reset takes a single
+        round trip to Docker and needs no client library or published port.
+        Drivers without a `reset_command` are left as they are.
+
+        Exceptions:
+            RuntimeError: Raised if the command fails, with its output.
+        """
+        self._exec_reset()
+
+    def _exec_reset(self) -> None:
+        """ Run `reset_command`, `exec_reset` without timing the call.
+
+        Drivers whose `reset` falls back to the command call this method, so
+        the reset is only timed once.
+        """
+        if self.reset_command is None:
+            return
+        exit_code, output = self.shell(self.reset_command)
+        if exit_code != 0:
+            raise RuntimeError(output.decode("utf-8", "replace"))
+
+    def commit(self, reference: str) -> str:
+        """ Save the container, including its data, as a local Docker Image.
+
+        Drivers can be started from the image with the `image` argument. Data
+        kept in the volumes declared by the image is not part of the commit,
+        see `seeding` for drivers which keep their data outside of them.
+
+        Args:
+            reference: Reference of the image, i.e. `seeded/mongo:latest`.
+
+        Returns:
+            The ID of the committed image.
+        """
+        self._flush()
+        repository, tag = images.split_reference(reference)
+        with self.endpoint.connection() as client:
+            container = client.containers.get(self._container_id)
+            return container.commit(repository, tag).id
+
+    def _flush(self) -> None:
+        """ Write the data held in memory by the service to disk.
+
+        This method *should* be overridden by drivers whose service does not
+        write its data to disk immediately.
+        """
+
+    def __del__(self) -> None:
+        """ Close the driver if it has not been closed explicitly.
+
+        The garbage collector may run in any thread, including one holding a
+        lock `close` needs, so the driver is closed by the `REMOVER` threads.
+        """
+        if getattr(self, "_closed", True):
+            return
+        try:
+            REMOVER.submit(self.close)
+        except RuntimeError:
+            # The executor has been shut down with the interpreter.
+            self.close()
+
+    def __enter__(self) -> "Driver":
+        """ Wait until the container is ready to be used. """
+        self.wait_or_close()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def detach(self) -> None:
+        """ Give up ownership of the container.
+
+        The container is left running when the driver is closed. This allows
+        a container to outlive the driver, i.e. to be shared with other
+        processes.
+        """
+        self._owner = False
+        reaper.untrack(self)
+
+    def _bound_ports(
+        self,
+        container: Optional[docker.models.containers.Container] = None
+    ) -> Dict[int, int]:
+        """ Resolve the host port bound to each exposed container port.
+
+        Fixed ports are taken from the requested bindings. The container is
+        only inspected if Docker chose a port, or if the driver attached to an
+        existing container.
+
+        Returns:
+            The host port bound to each container port.
+        """
+        bound = {
+            port_from: int(binding[1])
+            for port_from, binding in self._ports.items() if len(binding) == 2
+        }
+        if self._owner and len(bound) == len(self._ports):
+            return bound
+
+        if container is None:
+            container = self.endpoint.client().containers.get(
+                self._container_id)
+        container.reload()
+        published = container.attrs["NetworkSettings"]["Ports"] or {}
+        for name, bindings in published.items():
+            port, _, protocol = name.partition("/")
+            if bindings and protocol == "tcp":
+                bound[int(port)] = int(bindings[0]["HostPort"])
+        return bound
 
     @staticmethod
     def _get_docker_client() -> docker.DockerClient:
-        """ Create a new docker instance.
+        """ Retrieve the shared docker instance.
+
+        The client is shared across all drivers within the process, see
+        `docker_client.ClientManager`. It is the client of `backends.LOCAL`,
+        drivers use the client of their `endpoint`.
 
         Returns:
             A DockerClient object which is used to interact with the docker
@@ -126,12 +526,7 @@ class Driver:
             errors.DockerNotAvailable: Raised if the connection to the Docker
                                        service is interrupted.
         """
-        try:
-            client = docker.from_env()
-            client.images.list()
-            return client
-        except requests.exceptions.ConnectionError as error:
-            raise errors.DockerNotAvailable() from error
+        return docker_client.get_client()
 
     def ready(self) -> bool:
         """ Container ready check.
@@ -143,8 +538,16 @@ class Driver:
         """
         return self._status
 
+    def _close_clients(self) -> None:
+        """ Close the service clients held by the driver.
+
+        This method *should* be overridden by drivers which hold a client
+        connection to the service.
+        """
+
     # Pylint disabled: this method should be overridden and `self` may be
     # required.
+    @instrumentation.timed("reset")
     def reset(self) -> bool:  # pylint: disable=R0201
         """ Reset the service.
 
@@ -155,8 +558,9 @@ class Driver:
         """
         return
 
+    @instrumentation.timed("ready")
     def wait_until_ready(self,
-                         wait_interval: Union[float, int] = 1,
+                         wait_interval: Optional[Union[float, int]] = None,
                          timeout: int = 60) -> None:
         """ Block until container is ready to be used.
 
@@ -165,20 +569,88 @@ class Driver:
         inside the container is "ready". i.e. Docker says the MongoDB container
         is ready but the mongo application inside the container is starting.
 
+        `ready` is polled with the exponential backoff of `ready_backoff`. The
+        wait is cut short when the container reports a `healthy` Docker
+        HEALTHCHECK status or writes a log line matching `ready_log_pattern`.
+
         Args:
-            wait_interval: Gaps between checks of the container (Not
+            wait_interval: Fixed gap between checks of the container. Defaults
+                           to the exponential backoff of the driver (Not
                            recommended to change).
             timeout: Timeout if the container does not become `ready`.
         """
-        start_time = time.time()
-        while not self.ready():
-            interval = time.time() - start_time
+        backoff = self.ready_backoff
+        if wait_interval is not None:
+            backoff = readiness.Backoff.fixed(wait_interval)
+
+        # The state of the container is followed through the event stream of
+        # the monitor of the endpoint, the container is only inspected while
+        # the monitor has no entry for it, i.e. an attached container which
+        # started before the monitor did.
+        client = self.endpoint.client()
+        container = client.containers.prepare_model({"Id": self._container_id})
+        wake = threading.Event()
+        self.endpoint.monitor.subscribe(self._container_id, wake.set)
+
+        watcher = None
+        if self.ready_log_pattern is not None:
+            watcher = readiness.LogWatcher(container, self.ready_log_pattern,
+                                           wake)
+
+        start_time = time.monotonic()
+        try:
+            for delay in backoff.delays():
+                with instrumentation.measure(self, "ready_probe"):
+                    ready = self.ready()
+                if ready:
+                    return
+                if watcher is not None and watcher.matched:
+                    return
+
+                state = self.endpoint.monitor.state(self._container_id)
+                if state is None:
+                    container.reload()
+                    state = monitor.inspected_state(container.attrs)
+                if state is not None and state.exit_code is not None:
+                    raise errors.ContainerExited(state.exit_code,
+                                                 self._log_tail())
+                if state is not None and state.health == "healthy":
+                    return
+
+                remaining = timeout - (time.monotonic() - start_time)
+                if remaining <= 0:
+                    raise errors.ReadyTimeout("Container failed to start.")
+
+                # Make sure the wait will not be longer than the timeout. The
+                # wait is cut short by a matching log line or a state change.
+                wake.wait(min(delay, remaining))
+                wake.clear()
+        finally:
+            self.endpoint.monitor.unsubscribe(self._container_id, wake.set)
+            if watcher is not None:
+                watcher.stop()
+
+    def wait_or_close(self, timeout: int = 60) -> None:
+        """ Block until the container is ready, closing the driver if it
+        never is.
+
+        The error of `wait_until_ready` is raised once the container has been
+        removed, so a driver which fails to start does not leak its container.
 
-            if interval >= timeout:
-                raise errors.ReadyTimeout("Container failed to start.")
+        Args:
+            timeout: Timeout if the container does not become `ready`.
+        """
+        try:
+            self.wait_until_ready(timeout=timeout)
+        except BaseException:
+            self.close()
+            raise
 
-            # Make sure the wait will not be longer than the timeout
-            if timeout - interval < wait_interval:
-                time.sleep(timeout - interval)
-            else:
-                time.sleep(wait_interval)
+    def _log_tail(self, lines: int = 20) -> str:
+        """ Read the last lines written to the container logs. """
+        try:
+            logs = self.endpoint.client().api.logs(self._container_id,
+                                                   tail=lines)
+        except docker.errors.APIError:
+            return ""
+        return logs.decode("utf-8", "replace").rstrip()
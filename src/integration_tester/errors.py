@@ -2,6 +2,7 @@
 
 This module contains all error handling classes.
 """
+from typing import Optional
 
 
 class DockerNotAvailable(Exception):
@@ -33,3 +34,47 @@ class ReadyTimeout(Exception):
 
     This exception is raised when the `wait_until_ready` timesout.
     """
+
+
+class ContainerExited(ReadyTimeout):
+    """ Container Exited Exception.
+
+    This exception is raised when the container dies during `wait_until_ready`
+    instead of becoming ready.
+
+    Attr:
+        exit_code: Exit code of the main process of the container.
+        logs: The last lines written to the container logs.
+    """
+    def __init__(self, exit_code: Optional[int], logs: str = ""):
+        message = (f"Container exited with code {exit_code} before it was"
+                   " ready.")
+        if logs:
+            message = f"{message}\n{logs}"
+        super().__init__(message)
+        self.exit_code = exit_code
+        self.logs = logs
+
+
+class DependencyError(Exception):
+    """ Dependency Error Exception.
+
+    This exception is raised when a `Stack` has a service that depends on an
+    unknown service or when the service dependencies are circular.
+    """
+
+
+class DatabaseUnavailable(Exception):
+    """ Database Unavailable Exception.
+
+    This exception is raised when every logical database of a service has
+    already been handed out.
+    """
+
+
+class ShellExited(Exception):
+    """ Shell Exited Exception.
+
+    This exception is raised when the shell kept running inside a container
+    exits, i.e. because the container was stopped, before a command finished.
+    """
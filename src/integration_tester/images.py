@@ -0,0 +1,407 @@
+""" Image Management Module.
+
+This module pulls the Docker Images used by drivers ahead of time. Pulling the
+images of a test session in parallel when the session starts, instead of
+serially when each driver is first created, removes the pull time from the
+first test that uses each image.
+
+Typical usage is done through the shared `MANAGER` instance.
+``` python
+from integration_tester import images
+
+images.MANAGER.warm(["mongo:3.4", "redis:5.0.7", "rabbitmq:latest"])
+```
+
+Tags are resolved to repository digests (i.e. `mongo@sha256:...`) and the
+resolution is cached on disk. Drivers create their containers from the digest,
+so a tag moved in the registry during a session, or between the Docker
+services of `backends`, does not change the service under test. When the cached
+digest is already present the registry is not contacted at all, so sessions
+work offline once the images have been pulled.
+
+Cached resolutions expire after a day (see the `ttl` argument of
+`ImageManager`), so moving tags such as `latest` are followed. The first
+session resolving an expired tag pulls it again. If the registry can not be
+reached the expired digest is used for the session, and the next session tries
+again. A tag is resolved again straight away with
+`resolve(reference, refresh=True)`, or by deleting the cache file.
+
+Sessions, including pytest-xdist workers, share the cache file. Each
+resolution is merged into the file under a file lock, so concurrent sessions
+do not drop each other's entries.
+"""
+import concurrent.futures
+import contextlib
+import json
+import os
+import threading
+import time
+from typing import (Any, Callable, Dict, Iterable, Iterator, List, Optional,
+                    Set, Tuple)
+
+import docker
+
+from integration_tester import backends, docker_client
+
+# File locks are not available on every platform, without them concurrent
+# sessions may drop each other's resolutions.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # pylint: disable=C0103
+
+# Location of the tag to digest cache, may be overridden with an environment
+# variable.
+CACHE_ENVIRONMENT_VARIABLE = "INTEGRATION_TESTER_IMAGE_CACHE"
+DEFAULT_CACHE_PATH = os.path.join("~", ".cache", "integration_tester",
+                                  "images.json")
+
+# Seconds a cached resolution is used for before the tag is pulled again.
+DEFAULT_TTL = 24 * 60 * 60
+
+
+def split_reference(reference: str) -> Tuple[str, str]:
+    """ Split an image reference into its repository and tag.
+
+    The tag defaults to `latest`. Registry ports (i.e. `localhost:5000/image`)
+    are not mistaken for tags, and the digest of a repository digest (i.e.
+    `mongo@sha256:...`) is returned as its tag.
+
+    Returns:
+        The repository and the tag of the reference.
+    """
+    if "@" in reference:
+        repository, _, digest = reference.partition("@")
+        return repository, digest
+    repository, separator, tag = reference.rpartition(":")
+    if not separator or "/" in tag:
+        return reference, "latest"
+    return repository, tag
+
+
+class ImageManager:  # pylint: disable=R0902
+    """ Image pre-puller and tag to digest cache.
+
+    All methods are thread safe. Resolutions are stored in a JSON file mapping
+    image references to the repository digest they resolved to and the time
+    they were resolved at. Images without a repository digest, such as
+    committed images, are never cached as their tag is moved locally.
+
+    A resolution only expires between sessions, a reference used by the
+    manager keeps its digest for the lifetime of the manager.
+    """
+    def __init__(self,
+                 cache_path: Optional[str] = None,
+                 client: Optional[Callable[[], docker.DockerClient]] = None,
+                 max_workers: int = 4,
+                 ttl: Optional[float] = DEFAULT_TTL):
+        """ Initialise the image manager.
+
+        Args:
+            cache_path: Path of the digest cache file. Defaults to the
+                        `INTEGRATION_TESTER_IMAGE_CACHE` environment variable
+                        or `~/.cache/integration_tester/images.json`.
+            client: Callable returning the Docker client to use. Defaults to
+                    the shared client of `docker_client`.
+            max_workers: Maximum number of images pulled at the same time.
+            ttl: Seconds a cached resolution is used for before the tag is
+                 pulled again. `None` keeps resolutions forever.
+        """
+        if cache_path is None:
+            cache_path = os.environ.get(CACHE_ENVIRONMENT_VARIABLE,
+                                        DEFAULT_CACHE_PATH)
+        self.cache_path = os.path.expanduser(cache_path)
+        self.max_workers = max_workers
+        self.ttl = ttl
+
+        self._client = client or docker_client.get_client
+        # Values are `{"digest": ..., "resolved_at": ...}`.
+        self._cache: Optional[Dict[str, Dict[str, Any]]] = None
+        # References used by this manager, which no longer expire.
+        self._pinned: Set[str] = set()
+        self._lock = threading.Lock()
+        self._warming: Dict[Tuple[Optional[str], str],
+                            concurrent.futures.Future] = {}
+
+    def cached(self, reference: str) -> Optional[str]:
+        """ Retrieve the cached repository digest of a reference.
+
+        No request is made to Docker, the digest may not be present on every
+        Docker service.
+
+        Returns:
+            The repository digest, or `None` if the reference is not cached or
+            its resolution has expired.
+        """
+        entry = self._load().get(reference)
+        if entry is None or self._expired(reference, entry):
+            return None
+        with self._lock:
+            self._pinned.add(reference)
+        return entry["digest"]
+
+    def resolve(self,
+                reference: str,
+                refresh: bool = False,
+                endpoint: Optional[backends.Endpoint] = None) -> str:
+        """ Ensure an image is present and return its repository digest.
+
+        A cached digest missing from the Docker service is pulled by digest,
+        so every Docker service runs the same image. The tag is only resolved
+        again in the registry if the reference is not cached and not present,
+        if its resolution has expired, or if `refresh` is set. An expired
+        digest is kept if the tag can not be pulled.
+
+        Args:
+            reference: Image reference, i.e. `mongo:3.4`.
+            refresh: Pull the image even if it is present.
+            endpoint: Docker service the image is needed on. Defaults to the
+                      client of the manager.
+
+        Returns:
+            The repository digest the reference resolved to, or the image ID
+            for images which have not been pulled from a registry.
+        """
+        client = endpoint.client() if endpoint is not None else self._client()
+        expired = self._expired_digest(reference)
+        if not refresh:
+            digest = self.cached(reference)
+            if digest is not None and self._present(client, digest):
+                return digest
+            if digest is not None and "@" in digest:
+                try:
+                    self._pull(client, digest)
+                    return digest
+                except docker.errors.APIError:
+                    # The registry may no longer serve the digest, fall back
+                    # to the tag.
+                    pass
+            if expired is None and self._present(client, reference):
+                return self._pin(reference, client.images.get(reference))
+
+        try:
+            return self._pin(reference, self._pull(client, reference))
+        except docker.errors.APIError:
+            # The registry can not be reached, the expired digest is used for
+            # the session. It is not stored again, so the next session pulls
+            # the tag.
+            if refresh or expired is None or not self._present(
+                    client, expired):
+                raise
+            with self._lock:
+                self._pinned.add(reference)
+            return expired
+
+    def prepull(
+        self,
+        references: Iterable[str],
+        endpoints: Optional[Iterable[backends.Endpoint]] = None
+    ) -> Dict[str, str]:
+        """ Resolve several images in parallel, blocking until done.
+
+        Args:
+            references: Image references.
+            endpoints: Docker services the images are needed on, see `warm`.
+
+        Returns:
+            The repository digest of each reference.
+
+        Exceptions:
+            docker.errors.APIError: Raised if an image could not be pulled on
+                                    one of the Docker services.
+        """
+        futures = self.warm(references, endpoints)
+        digests = {}
+        for (_, reference), future in futures.items():
+            digests[reference] = future.result()
+        return digests
+
+    def warm(
+        self,
+        references: Iterable[str],
+        endpoints: Optional[Iterable[backends.Endpoint]] = None
+    ) -> Dict[Tuple[Optional[str], str], concurrent.futures.Future]:
+        """ Resolve several images in parallel in the background.
+
+        Images which are already being warmed on a Docker service are not
+        pulled twice. Failed warms are dropped, so they are retried.
+
+        Args:
+            references: Image references.
+            endpoints: Docker services the images are needed on. Defaults to
+                       the endpoints of `backends.SCHEDULER`, or the client of
+                       the manager without a scheduler.
+
+        Returns:
+            A future of the repository digest of each Docker service URL and
+            reference.
+        """
+        futures = {}
+        targets = self._endpoints(endpoints)
+        executor = concurrent.futures.ThreadPoolExecutor(self.max_workers)
+        with self._lock:
+            for reference in dict.fromkeys(references):
+                for endpoint in targets:
+                    key = (self._url(endpoint), reference)
+                    future = self._warming.get(key)
+                    if future is None or self._failed(future):
+                        self._warming[key] = executor.submit(self.resolve,
+                                                             reference,
+                                                             endpoint=endpoint)
+                    futures[key] = self._warming[key]
+        executor.shutdown(wait=False)
+        return futures
+
+    def wait(self,
+             reference: str,
+             timeout: Optional[float] = None,
+             endpoint: Optional[backends.Endpoint] = None) -> None:
+        """ Block until a background warm of an image has finished.
+
+        Returns immediately if the image is not being warmed on the Docker
+        service. Errors raised while warming are not raised here, the caller
+        will pull the image itself.
+        """
+        key = (self._url(endpoint), reference)
+        with self._lock:
+            future = self._warming.get(key)
+        if future is not None:
+            concurrent.futures.wait([future], timeout)
+            with self._lock:
+                if self._failed(future) and self._warming.get(key) is future:
+                    del self._warming[key]
+
+    @staticmethod
+    def _endpoints(
+        endpoints: Optional[Iterable[backends.Endpoint]]
+    ) -> List[Optional[backends.Endpoint]]:
+        """ Resolve the Docker services to warm images on. """
+        if endpoints is not None:
+            return list(endpoints)
+        if backends.SCHEDULER is not None:
+            return list(backends.SCHEDULER.endpoints)
+        return [None]
+
+    @staticmethod
+    def _url(endpoint: Optional[backends.Endpoint]) -> Optional[str]:
+        """ Key of a Docker service in the warms. """
+        return endpoint.base_url if endpoint is not None else None
+
+    @staticmethod
+    def _failed(future: concurrent.futures.Future) -> bool:
+        """ Check if a warm has finished with an error. """
+        return (future.done() and not future.cancelled()
+                and future.exception() is not None)
+
+    @staticmethod
+    def _pull(client: docker.DockerClient,
+              reference: str) -> docker.models.images.Image:
+        """ Pull an image by tag or by digest. """
+        repository, tag = split_reference(reference)
+        return client.images.pull(repository, tag=tag)
+
+    def _pin(self, reference: str, image: docker.models.images.Image) -> str:
+        """ Find and cache the repository digest of a resolved image.
+
+        Returns:
+            The repository digest of the image in the repository of the
+            reference, or the image ID if it has none.
+        """
+        repository, _ = split_reference(reference)
+        for digest in image.attrs.get("RepoDigests") or []:
+            if digest.partition("@")[0] == repository:
+                return self._store(reference, digest)
+        return image.id
+
+    @staticmethod
+    def _present(client: docker.DockerClient, reference: str) -> bool:
+        """ Check if an image is present locally. """
+        try:
+            client.images.get(reference)
+        except docker.errors.ImageNotFound:
+            return False
+        return True
+
+    def _expired(self, reference: str, entry: Dict[str, Any]) -> bool:
+        """ Check if the cached resolution of a reference has expired. """
+        with self._lock:
+            if reference in self._pinned:
+                return False
+        return self.ttl is not None and (time.time() - entry["resolved_at"]
+                                         >= self.ttl)
+
+    def _expired_digest(self, reference: str) -> Optional[str]:
+        """ Retrieve the digest of an expired resolution, if there is one. """
+        entry = self._load().get(reference)
+        if entry is None or not self._expired(reference, entry):
+            return None
+        return entry["digest"]
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """ Load the digest cache from disk, once. """
+        with self._lock:
+            if self._cache is None:
+                self._cache = self._read()
+            return dict(self._cache)
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        """ Read the digest cache file.
+
+        Caches written before resolutions expired map references to bare
+        digests, these are treated as expired.
+        """
+        try:
+            with open(self.cache_path, encoding="utf-8") as cache:
+                return {
+                    reference: entry if isinstance(entry, dict) else {
+                        "digest": entry,
+                        "resolved_at": 0
+                    }
+                    for reference, entry in json.load(cache).items()
+                }
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    @contextlib.contextmanager
+    def _locked_file(self) -> Iterator[None]:
+        """ Hold the file lock of the digest cache, if available. """
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.cache_path}.lock", "a+", encoding="utf-8") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _store(self, reference: str, digest: str) -> str:
+        """ Record a resolution and merge it into the digest cache on disk.
+
+        The file is read again under the file lock, so the resolutions stored
+        by other sessions since it was loaded are kept. It is replaced
+        atomically so concurrent sessions never read a partially written
+        cache.
+        """
+        self._load()
+        entry = {"digest": digest, "resolved_at": time.time()}
+        with self._lock:
+            self._pinned.add(reference)
+            self._cache[reference] = entry
+            temporary = f"{self.cache_path}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+                with self._locked_file():
+                    entries = self._read()
+                    entries[reference] = entry
+                    with open(temporary, "w", encoding="utf-8") as cache:
+                        json.dump(entries, cache, indent=2, sort_keys=True)
+                    os.replace(temporary, self.cache_path)
+            except OSError:
+                # The cache is an optimisation, a read only home directory
+                # should not stop images being resolved.
+                pass
+        return digest
+
+
+MANAGER = ImageManager()
@@ -0,0 +1,190 @@
+""" Instrumentation Module.
+
+This module reports how long each phase of the lifecycle of a driver takes.
+Drivers emit an `Event` for each of the following phases:
+- `pull`: ensuring the Docker Image is present locally.
+- `create` and `start`: creating and starting the container.
+- `ready_probe`: a single `ready` check, and `ready`: the whole of
+  `wait_until_ready`.
+- `reset`: resetting the service.
+- `stop` and `remove`: stopping and removing the container.
+
+Events are handed to every registered listener. A listener which raises is
+logged and otherwise ignored, instrumentation never changes the outcome of a
+driver operation.
+``` python
+from integration_tester import instrumentation
+
+instrumentation.add_listener(print)
+```
+
+Setting the `INTEGRATION_TESTER_EVENTS` environment variable to a path writes
+every event to that file as JSON lines, see `JsonLinesExporter`. The pytest
+plugin prints the slowest phases of each driver at the end of the session.
+"""
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Path of the JSON lines file events are exported to, if set.
+EVENTS_ENVIRONMENT_VARIABLE = "INTEGRATION_TESTER_EVENTS"
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Event(NamedTuple):
+    """ Timing of a single lifecycle phase of a driver.
+
+    Attr:
+        driver: Name of the driver Class.
+        container_id: Short ID of the container, if created.
+        phase: Name of the lifecycle phase, i.e. `pull`.
+        started: Wall clock time the phase started at, in seconds since the
+                 epoch.
+        duration: Duration of the phase in seconds.
+        error: Name of the exception raised by the phase, if any.
+    """
+    driver: str
+    container_id: Optional[str]
+    phase: str
+    started: float
+    duration: float
+    error: Optional[str]
+
+
+Listener = Callable[[Event], None]
+
+_LISTENERS: List[Listener] = []
+_LOCK = threading.Lock()
+
+
+def add_listener(listener: Listener) -> None:
+    """ Register a callable receiving every event. """
+    with _LOCK:
+        _LISTENERS.append(listener)
+
+
+def remove_listener(listener: Listener) -> None:
+    """ Unregister a listener added with `add_listener`. """
+    with _LOCK:
+        if listener in _LISTENERS:
+            _LISTENERS.remove(listener)
+
+
+def emit(event: Event) -> None:
+    """ Hand an event to every listener.
+
+    Errors raised by a listener, i.e. a full disk under `JsonLinesExporter`,
+    are logged and do not stop the other listeners.
+    """
+    for listener in list(_LISTENERS):
+        try:
+            listener(event)
+        except Exception:  # pylint: disable=W0703
+            LOGGER.exception("Instrumentation listener %r failed.", listener)
+
+
+@contextlib.contextmanager
+def measure(instance, phase: str) -> Iterator[None]:
+    """ Time the body of a `with` block as a phase of a driver.
+
+    The event is emitted even if the block raises. Nothing is timed while no
+    listener is registered.
+
+    Args:
+        instance: Driver the phase belongs to.
+        phase: Name of the lifecycle phase.
+    """
+    if not _LISTENERS:
+        yield
+        return
+
+    started, start = time.time(), time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as exception:
+        error = type(exception).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        container_id = getattr(instance, "_container_id", None)
+        if container_id is not None:
+            container_id = container_id[:12]
+        emit(
+            Event(type(instance).__name__, container_id, phase, started,
+                  duration, error))
+
+
+def timed(phase: str) -> Callable[[Callable], Callable]:
+    """ Decorate a driver method to time every call as a phase. """
+    def decorator(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with measure(self, phase):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class JsonLinesExporter:  # pylint: disable=R0903
+    """ Listener writing each event as a line of JSON to a file.
+
+    Lines are appended with a single write each, so several processes (i.e.
+    pytest-xdist workers) can share a file.
+    """
+    def __init__(self, path: str):
+        """ Initialise the exporter.
+
+        Args:
+            path: Path of the file to append events to.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, event: Event) -> None:
+        line = json.dumps(event._asdict(), sort_keys=True) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as events:
+                events.write(line)
+
+
+class Summary:
+    """ Listener aggregating the durations of each phase of each driver. """
+    def __init__(self):
+        # Count, total and maximum duration by driver and phase.
+        self.phases: Dict[Tuple[str, str], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event: Event) -> None:
+        with self._lock:
+            phase = self.phases.setdefault((event.driver, event.phase),
+                                           [0, 0.0, 0.0])
+            phase[0] += 1
+            phase[1] += event.duration
+            phase[2] = max(phase[2], event.duration)
+
+    def slowest(self,
+                count: int = 10) -> List[Tuple[str, str, int, float, float]]:
+        """ Find the phases with the longest total duration.
+
+        Returns:
+            Up to `count` tuples of driver, phase, number of events, total
+            and maximum duration, slowest first.
+        """
+        with self._lock:
+            rows = [(driver, phase, int(calls), total, maximum)
+                    for (driver, phase), (calls, total,
+                                          maximum) in self.phases.items()]
+        return sorted(rows, key=lambda row: row[3], reverse=True)[:count]
+
+
+if os.environ.get(EVENTS_ENVIRONMENT_VARIABLE):
+    add_listener(JsonLinesExporter(os.environ[EVENTS_ENVIRONMENT_VARIABLE]))
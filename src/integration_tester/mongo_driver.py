@@ -10,19 +10,82 @@ from integration_tester import mongo_driver
 driver = mongo_driver.MongoDBDriver()
 ```
 
-This module will raise a `OptionalModuleNotInstalledException` if the `pymongo`
-package has not been installed.
+The module can be imported without the `pymongo` package, readiness is
+probed over the wire protocol. Using `client`, `reset` or `snapshot` will raise
+a `OptionalModuleNotInstalled` exception if it has not been installed.
 """
-from integration_tester import driver, errors
+import json
+import shlex
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
-# This module is an optional extra, this checks that the required packages are
-# installed.
+from integration_tester import (async_driver, driver, errors, instrumentation,
+                                probes, readiness)
+
+# This module is an optional extra, `client` checks that the required packages
+# are installed.
 try:
     import pymongo
-except ModuleNotFoundError as error:
-    raise errors.OptionalModuleNotInstalled(
-        "To support the optional MongoDB driver please install the pymongo"
-        " package.") from error
+except ModuleNotFoundError:
+    pymongo = None  # pylint: disable=C0103
+
+# Databases which are managed by MongoDB itself and never part of a snapshot.
+SYSTEM_DATABASES = {"admin", "config", "local"}
+
+# Milliseconds `client` waits for the MongoDB Service before an operation
+# fails. The service is ready before the client is used, the timeout only has
+# to cover a busy machine or a restarting service, not the start up.
+SERVER_SELECTION_TIMEOUT_MS = 5000
+
+# Data directories of the image, mounted in memory by `fast` drivers.
+DATA_DIRECTORIES = ("/data/db", "/data/configdb")
+
+# Shell script dropping every non-system database in a single evaluation.
+RESET_SCRIPT = (
+    "db.getMongo().getDBNames().forEach(function (name) {"
+    f" if ({json.dumps(sorted(SYSTEM_DATABASES))}.indexOf(name) === -1) {{"
+    " db.getSiblingDB(name).dropDatabase(); } });")
+
+
+def _version(tag: str) -> Optional[Tuple[int, int]]:
+    """ Parse the major and minor MongoDB version from an image tag.
+
+    Returns:
+        The version, or None if the tag is not versioned (i.e. `latest`).
+    """
+    try:
+        major, minor = tag.split("-")[0].split(".")[:2]
+        return int(major), int(minor)
+    except ValueError:
+        return None
+
+
+def _cache_size(memory: int) -> str:
+    """ WiredTiger cache size for a memory limit, in GB.
+
+    Uses the default of MongoDB, 50% of (memory - 1 GB) with a 0.25 GB
+    minimum, applied to the limit of the container.
+    """
+    gigabyte = 1024**3
+    return f"{max(0.5 * (memory - gigabyte) / gigabyte, 0.25):.2f}"
+
+
+class CollectionSnapshot(NamedTuple):
+    """ Captured state of a single collection.
+
+    Attr:
+        documents: Every document within the collection.
+        indexes: Index information as returned by `index_information`.
+        options: Options the collection was created with.
+        digest: The `dbHash` digest of the collection contents.
+    """
+    documents: List[Dict]
+    indexes: Dict[str, Dict]
+    options: Dict
+    digest: Optional[str]
+
+
+# Captured collections by database and collection name.
+Snapshot = Dict[str, Dict[str, CollectionSnapshot]]
 
 
 class MongoDBDriver(driver.Driver):
@@ -44,20 +107,55 @@ class MongoDBDriver(driver.Driver):
     3. Reset the MongoDB instide the service to factory settings and not reset
        the container itself.
 
-    If ensuring the container is reset completely each iteration, you can delete
+    If ensuring the container is reset completely each iteration, you can close
     the existing container and start a new one.
     ``` python
     mongo = MongoDBDriver()
-    del(mongo)
+    mongo.close()
     mongo = MongoDBDriver()
     ```
     This will completely remove the container and its volume, then create a new
     container and volume.
+
+    The driver holds a single `pymongo.MongoClient` which is reused by
+    `reset` and `snapshot`. Tests can reuse it through `client`
+    instead of creating their own.
+    ``` python
+    mongo.client.test.collection.insert_one({"test": "test"})
+    ```
+
+    If every test should start from the same seeded data, a snapshot of the
+    baseline state can be taken once. `reset` then restores the snapshot
+    instead of dropping every database.
+    ``` python
+    mongo = MongoDBDriver()
+    # seed data and create indexes
+    mongo.snapshot()
+    # test code
+    mongo.reset()
+    ```
+
+    `exec_reset` drops every non-system database with a single evaluation of
+    the mongo shell inside the container, without `pymongo`. It ignores the
+    snapshot.
     """
+    ready_backoff = readiness.Backoff(initial=0.05, factor=2, maximum=0.5)
+    ready_log_pattern = r"[Ww]aiting for connections"
+    seed_directory = "/data/seed"
+    # `mongosh` replaced the `mongo` shell in MongoDB 6.0.
+    reset_command = ("$(command -v mongosh || echo mongo) --quiet --eval "
+                     f"{shlex.quote(RESET_SCRIPT)}")
+    memory_preset = "1g"
+    cpu_preset = 2
+
     def __init__(self,
                  tag: str = "3.4",
                  host: str = "127.0.0.1",
-                 port: int = 27017):
+                 port: Optional[int] = 27017,
+                 *,
+                 fast: bool = False,
+                 data_directory: Optional[str] = None,
+                 **kwargs):
         """ Initialise the MongoDB Driver.
 
         This will configure and then start the Docker container.
@@ -66,35 +164,93 @@ class MongoDBDriver(driver.Driver):
             tag: Reference to the specific version of Docker Image to pull from
                  Docker Hub.
             host: Host address to bind the port.
-            port: The port to bind the container.
+            port: The port to bind the container. If `0` or `None` a free
+                  port is chosen by Docker and available in `port` once
+                  started.
+            fast: Trade durability for speed. The data directories are
+                  mounted in memory and, for versions supporting it, the
+                  journal and periodic flushes to disk are disabled.
+            data_directory: Directory to keep the databases in instead of the
+                            `/data/db` volume of the image. Data outside of
+                            the volume is saved by `commit`.
+            kwargs: Additional arguments passed to `driver.Driver`, i.e.
+                    `container_id`.
 
         Container tags can be found on the
         [Docker Hub](https://hub.docker.com/_/mongo).
         """
         self.host, self.port = host, port
+        self.fast = fast
+        self._snapshot: Optional[Snapshot] = None
+        self._client: Optional["pymongo.MongoClient"] = None
+
+        command = ["mongod"]
+        if fast:
+            kwargs.setdefault("tmpfs", {
+                directory: driver.TMPFS_OPTIONS
+                for directory in DATA_DIRECTORIES
+            })
+            # `--nojournal` was removed in MongoDB 6.1.
+            version = _version(tag)
+            if version is not None and version < (6, 1):
+                command += ["--nojournal", "--syncdelay", "0"]
+
+        # MongoDB sizes its cache from the memory of the machine, not the
+        # memory limit of the container.
+        memory = self._memory_limit(kwargs.get("mem_limit"))
+        if memory is not None:
+            command += ["--wiredTigerCacheSizeGB", _cache_size(memory)]
+
+        if data_directory is not None:
+            command += ["--dbpath", data_directory]
+            command = driver.owned_directory_command(command, data_directory,
+                                                     "mongodb")
+        if len(command) > 1:
+            kwargs.setdefault("command", command)
+
         ports = {27017: (host, port)}
-        super().__init__(f"mongo:{tag}", ports)
+        super().__init__(f"mongo:{tag}", ports, **kwargs)
+        self.port = self.ports[27017]
+
+    @property
+    def url(self) -> str:
+        """ Connection string of the MongoDB Service. """
+        return f"mongodb://{self.host}:{self.port}"
+
+    @property
+    def client(self) -> "pymongo.MongoClient":
+        """ Client connected to the MongoDB Service.
+
+        The client is created on first use and kept for the lifetime of the
+        driver. `pymongo` reconnects automatically if the connection is lost.
+
+        Exceptions:
+            errors.OptionalModuleNotInstalled: Raised if the `pymongo` package
+                                               has not been installed.
+        """
+        if pymongo is None:
+            raise errors.OptionalModuleNotInstalled(
+                "To support the optional MongoDB driver please install the"
+                " pymongo package.")
+        if self._client is None:
+            self._client = pymongo.MongoClient(
+                self.url, serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS)
+        return self._client
 
     def ready(self) -> bool:
         """ Confirm if the MongoDB Service is running.
 
         Confirm if the MongoDB Service within the container is running and
-        ready to accept connections. To achieve this, a `pymongo.MongoClient`
-        object is created and the the server is polled using the `.server_info`
-        method. This method serves no information purpose other than starting
-        an active connection to the service.
+        ready to accept connections. To achieve this, the `isMaster` handshake
+        is sent over a raw socket with `probes.mongodb_hello`, so `pymongo` is
+        not required.
 
         Returns:
             This function returns True if the MongoDB Service is active.
         """
-        try:
-            client = pymongo.MongoClient(f"{self.host}:{self.port}",
-                                         serverSelectionTimeoutMS=100)
-            client.server_info()
-            return True
-        except pymongo.errors.ConnectionFailure:
-            return False
+        return probes.mongodb_hello(self.host, self.port)
 
+    @instrumentation.timed("reset")
     def reset(self) -> None:
         """ Reset the database to factory new.
 
@@ -102,11 +258,134 @@ class MongoDBDriver(driver.Driver):
         allows for a clean testing environment without the slow reset of Docker.
         However, this is not a completely isolated process. If complete
         isolation is required, please see Class doc on how to reset completely.
+
+        If a snapshot has been taken with `snapshot`, the databases are
+        restored to the snapshot instead.
         """
-        client = pymongo.MongoClient(f"{self.host}:{self.port}",
-                                     serverSelectionTimeoutMS=100)
+        client = self.client
+        if self._snapshot is not None:
+            self._restore(client, self._snapshot)
+            return
+
         for database in client.list_database_names():
-            if database not in {"admin"}:
+            if database not in SYSTEM_DATABASES:
                 for collection in client[database].list_collection_names():
                     client[database][collection].drop()
                 client.drop_database(database)
+
+    def snapshot(self) -> None:
+        """ Capture the current state as the baseline for `reset`.
+
+        Every document, index and collection option of the non-system
+        databases is held in memory together with the `dbHash` digest of each
+        collection. The digests allow `reset` to restore only the collections
+        that have changed, keeping the indexes of unchanged collections. See
+        `_restore` for how changed indexes are found.
+        """
+        client = self.client
+        snapshot = {}
+        for name in client.list_database_names():
+            if name in SYSTEM_DATABASES:
+                continue
+            database = client[name]
+            digests = database.command("dbHash")["collections"]
+            snapshot[name] = {}
+            for info in database.list_collections():
+                if info.get("type", "collection") != "collection":
+                    continue
+                collection = database[info["name"]]
+                snapshot[name][info["name"]] = CollectionSnapshot(
+                    list(collection.find({})), collection.index_information(),
+                    info.get("options", {}), digests.get(info["name"]))
+        self._snapshot = snapshot
+
+    def _flush(self) -> None:
+        """ Flush every pending write to the data files. """
+        self.client.admin.command("fsync")
+
+    def _close_clients(self) -> None:
+        """ Close the client connected to the MongoDB Service. """
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def discard_snapshot(self) -> None:
+        """ Discard the snapshot, `reset` drops every database again. """
+        self._snapshot = None
+
+    @staticmethod
+    def _restore(client: "pymongo.MongoClient", snapshot: Snapshot) -> None:
+        """ Restore the databases to a snapshot.
+
+        Collections are compared to the snapshot using a single `dbHash`
+        command per database. Only the documents of collections which were
+        added, removed or changed since the snapshot was taken are touched.
+        Changed collections are emptied and refilled, so their indexes are
+        kept.
+
+        `dbHash` does not cover indexes. The indexes of changed collections
+        are compared to the snapshot, the indexes of the other collections
+        only if the number of indexes of the database, from a single
+        `dbStats` command, differs from the snapshot. An index replaced by
+        another one on a collection whose documents are unchanged is not
+        noticed.
+        """
+        for name in client.list_database_names():
+            if name not in SYSTEM_DATABASES and name not in snapshot:
+                client.drop_database(name)
+
+        for name, collections in snapshot.items():
+            database = client[name]
+            digests = database.command("dbHash")["collections"]
+
+            for collection in set(digests) - set(collections):
+                database[collection].drop()
+
+            indexes_changed = database.command("dbStats")["indexes"] != sum(
+                len(saved.indexes) for saved in collections.values())
+
+            for collection, saved in collections.items():
+                if collection not in digests:
+                    database.create_collection(collection, **saved.options)
+                    changed = True
+                else:
+                    changed = digests[collection] != saved.digest
+                    if changed:
+                        database[collection].delete_many({})
+
+                if changed or indexes_changed:
+                    MongoDBDriver._restore_indexes(database[collection],
+                                                   saved.indexes)
+                if changed and saved.documents:
+                    database[collection].insert_many(saved.documents)
+
+    @staticmethod
+    def _restore_indexes(collection: "pymongo.collection.Collection",
+                         indexes: Dict[str, Dict]) -> None:
+        """ Make the indexes of a collection match the snapshot. """
+        current = collection.index_information()
+        for name in set(current) - set(indexes) - {"_id_"}:
+            collection.drop_index(name)
+        for name, info in indexes.items():
+            if name in current:
+                continue
+            options = {
+                key: value
+                for key, value in info.items()
+                if key not in {"key", "v", "ns"}
+            }
+            collection.create_index(info["key"], name=name, **options)
+
+
+class AsyncMongoDBDriver(async_driver.AsyncDriver):
+    """ Asynchronous MongoDB Driver.
+
+    This class wraps `MongoDBDriver` for use with `asyncio`. It accepts the
+    same arguments as `MongoDBDriver`.
+    ``` python
+    async with AsyncMongoDBDriver() as mongo:
+        # test code
+        await mongo.reset()
+    ```
+    """
+    driver_class = MongoDBDriver
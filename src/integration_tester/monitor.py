@@ -0,0 +1,208 @@
+""" Container Monitor Module.
+
+This module follows the Docker event stream and keeps the state of every
+container created by a driver in memory. A single background subscriber serves
+all drivers of the process, so the state of a container is known without
+inspecting it, and a container which dies (i.e. crashes or is OOM killed) is
+noticed as soon as Docker reports it.
+
+Typical usage is done through the shared `MONITOR` instance.
+``` python
+from integration_tester import monitor
+
+monitor.MONITOR.start()
+state = monitor.MONITOR.state(container_id)
+if state is not None and state.exit_code is not None:
+    print(f"Container exited with code {state.exit_code}.")
+```
+
+Containers are matched on the `reaper.LABEL` label, so containers created by
+other processes, i.e. shared by pytest-xdist workers, are followed as well.
+Events are only received while the stream is connected, `state` returns `None`
+for containers the monitor has not heard about.
+"""
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import docker
+import requests
+
+from integration_tester import docker_client, errors, reaper
+
+Callback = Callable[[], None]
+
+
+class State(NamedTuple):
+    """ State of a container, as reported by the Docker event stream.
+
+    Attr:
+        running: True once the container has started and until it dies.
+        exit_code: Exit code of the main process, once the container died.
+        oom_killed: True if the container was killed for running out of
+                    memory.
+        health: Docker HEALTHCHECK status, i.e. `healthy`, if reported.
+    """
+    running: bool = False
+    exit_code: Optional[int] = None
+    oom_killed: bool = False
+    health: Optional[str] = None
+
+
+def inspected_state(attrs: Dict) -> State:
+    """ Build the state of a container from its inspected attributes.
+
+    Used when the event stream is not available.
+    """
+    state = attrs.get("State") or {}
+    exit_code = None
+    if state.get("Status") in ("exited", "dead"):
+        exit_code = state.get("ExitCode")
+    return State(running=bool(state.get("Running")),
+                 exit_code=exit_code,
+                 oom_killed=bool(state.get("OOMKilled")),
+                 health=(state.get("Health") or {}).get("Status"))
+
+
+class Monitor:
+    """ Background subscriber of the Docker event stream.
+
+    All methods are thread safe. The stream is opened by `start` and followed
+    by a daemon thread until `stop` is called or the connection is lost, in
+    which case the next `start` subscribes again.
+    """
+    def __init__(self,
+                 client: Optional[Callable[[], docker.DockerClient]] = None):
+        """ Initialise the monitor.
+
+        No connection to Docker is made on initialisation.
+
+        Args:
+            client: Callable returning the Docker client to subscribe with.
+                    Defaults to the shared `docker_client.get_client`.
+        """
+        self._client = client or docker_client.get_client
+        self._states: Dict[str, State] = {}
+        self._callbacks: Dict[str, List[Callback]] = {}
+        self._stream = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        """ True while the event stream is followed. """
+        return self._stream is not None
+
+    def start(self) -> bool:
+        """ Subscribe to the event stream, unless already subscribed.
+
+        Only events emitted after the subscription are received, it should be
+        started before the containers it follows are created.
+
+        Returns:
+            True if the event stream is followed.
+        """
+        with self._lock:
+            if self.running:
+                return True
+            try:
+                stream = self._client().events(decode=True,
+                                               filters={
+                                                   "type": "container",
+                                                   "label": [reaper.LABEL],
+                                               })
+            except (docker.errors.APIError, errors.DockerNotAvailable,
+                    requests.exceptions.RequestException):
+                return False
+            self._stream = stream
+            self._thread = threading.Thread(target=self._follow,
+                                            args=(stream, ),
+                                            name="integration_tester_monitor",
+                                            daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self) -> None:
+        """ Close the event stream and forget every container. """
+        with self._lock:
+            stream, self._stream = self._stream, None
+            self._states.clear()
+        if stream is not None:
+            stream.close()
+
+    def state(self, container_id: str) -> Optional[State]:
+        """ Retrieve the last known state of a container.
+
+        Returns:
+            The state of the container, or `None` if no event has been
+            received for it.
+        """
+        with self._lock:
+            return self._states.get(container_id)
+
+    def subscribe(self, container_id: str, callback: Callback) -> None:
+        """ Call `callback` every time the state of a container changes. """
+        with self._lock:
+            self._callbacks.setdefault(container_id, []).append(callback)
+
+    def unsubscribe(self, container_id: str, callback: Callback) -> None:
+        """ Remove a callback added with `subscribe`. """
+        with self._lock:
+            callbacks = self._callbacks.get(container_id, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if not callbacks:
+                self._callbacks.pop(container_id, None)
+
+    def _follow(self, stream) -> None:
+        """ Apply every event of the stream until it is closed. """
+        try:
+            for event in stream:
+                self._apply(event)
+        except (docker.errors.APIError, requests.exceptions.RequestException,
+                AttributeError, OSError, ValueError):
+            # The stream was closed by `stop` or the connection was lost.
+            pass
+        finally:
+            with self._lock:
+                if self._stream is stream:
+                    self._stream = None
+
+    def _apply(self, event: Dict) -> None:
+        """ Update the state of a container from a single event. """
+        actor = event.get("Actor") or {}
+        container_id = actor.get("ID") or event.get("id")
+        action = event.get("Action") or event.get("status") or ""
+        if not container_id:
+            return
+
+        with self._lock:
+            if action == "destroy":
+                self._states.pop(container_id, None)
+                callbacks = self._callbacks.pop(container_id, [])
+            else:
+                self._states[container_id] = self._next_state(
+                    self._states.get(container_id, State()), action,
+                    actor.get("Attributes") or {})
+                callbacks = list(self._callbacks.get(container_id, []))
+
+        for callback in callbacks:
+            callback()
+
+    @staticmethod
+    def _next_state(state: State, action: str, attributes: Dict) -> State:
+        """ Apply the action of an event to the state of a container. """
+        if action == "start":
+            return State(running=True)
+        if action == "oom":
+            return state._replace(oom_killed=True)
+        if action == "die":
+            exit_code = attributes.get("exitCode")
+            return state._replace(
+                running=False,
+                exit_code=None if exit_code is None else int(exit_code))
+        if action.startswith("health_status:"):
+            return state._replace(health=action.partition(":")[2].strip())
+        return state
+
+
+MONITOR = Monitor()
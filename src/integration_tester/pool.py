@@ -0,0 +1,315 @@
+""" Container Pool Module.
+
+This module provides a pool of running drivers which are reused between tests
+instead of starting a new container every time. Drivers are soft reset using
+`Driver.reset` when they are returned to the pool, so an acquired driver is
+always running, ready and reset.
+
+Typical usage is done through a shared pool instance.
+``` python
+from integration_tester import mongo_driver, pool
+
+containers = pool.ContainerPool(spares=1)
+
+with containers.lease(mongo_driver.MongoDBDriver) as mongo:
+    # test code
+    ...
+```
+
+Drivers are matched on their configuration (the driver Class and the
+arguments used to create it, i.e. image tag, ports and environment). Only a
+driver created with the same configuration will be handed out.
+"""
+import collections
+import contextlib
+import inspect
+import logging
+import threading
+import time
+import weakref
+from typing import (Any, Dict, Hashable, Iterable, Iterator, Optional, Tuple,
+                    Type, Union)
+
+from integration_tester import driver, reaper
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _freeze(value: Any) -> Hashable:
+    """ Convert a driver argument into a hashable value.
+
+    Dictionaries (such as port configurations or environments) and lists are
+    converted to sorted tuples so they can be used as part of a pool key.
+    """
+    if isinstance(value, dict):
+        return tuple(
+            sorted(((key, _freeze(item)) for key, item in value.items()),
+                   key=repr))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        frozen = tuple(_freeze(item) for item in value)
+        if isinstance(value, (set, frozenset)):
+            return tuple(sorted(frozen, key=repr))
+        return frozen
+    return value
+
+
+def _free_port(driver_class: Type[driver.Driver], kwargs: Dict) -> Dict:
+    """ Arguments of a spare, bound to a free host port if possible.
+
+    Spares run next to the driver of the same configuration, a fixed `port`
+    would already be allocated. Drivers without a `port` argument keep their
+    ports.
+    """
+    if "port" not in inspect.signature(driver_class).parameters:
+        return kwargs
+    return dict(kwargs, port=0)
+
+
+def _close(instances: Iterable[driver.Driver], wait: bool = False) -> None:
+    """ Close drivers, removing their containers in the background unless
+    `wait` is set.
+    """
+    futures = [instance.close(wait=False) for instance in instances]
+    if wait:
+        for future in futures:
+            if future is not None:
+                future.result()
+
+
+class ContainerPool:  # pylint: disable=R0902
+    """ Pool of warm, reusable drivers.
+
+    Idle drivers are kept running after they are released. When the pool holds
+    more than `max_idle` drivers, the least recently used are evicted. Drivers
+    which have been idle for longer than `ttl` seconds are evicted as well.
+    Evicted drivers are closed, which stops and removes their container in
+    the background (see `Driver.close`).
+
+    If `spares` is set, the pool keeps that many ready drivers of each
+    configuration that has been acquired, starting replacements in the
+    background. A fixed host port can only be bound by a single container, so
+    spares are started on free ports chosen by Docker (`port=0`) for drivers
+    taking a `port` argument. Spares which fail to start are logged.
+    """
+    def __init__(self,
+                 max_idle: int = 4,
+                 ttl: Optional[Union[float, int]] = 300,
+                 spares: int = 0,
+                 timeout: int = 60):
+        """ Initialise the pool.
+
+        Args:
+            max_idle: Maximum number of idle drivers kept running.
+            ttl: Seconds an idle driver is kept before it is evicted. `None`
+                 disables time based eviction.
+            spares: Number of ready drivers to keep for each configuration.
+            timeout: Timeout passed to `wait_until_ready` for new drivers.
+        """
+        self.max_idle = max_idle
+        self.ttl = ttl
+        self.spares = spares
+        self.timeout = timeout
+
+        # Ordered from least to most recently released. Values are
+        # `(key, driver, released_at)`.
+        self._idle = collections.OrderedDict()
+        self._keys = weakref.WeakKeyDictionary()
+        self._warming = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(driver_class: Type[driver.Driver], *args, **kwargs) -> Hashable:
+        """ Build the pool key for a driver configuration.
+
+        Args:
+            driver_class: Driver Class to create.
+            args: Positional arguments used to create the driver.
+            kwargs: Keyword arguments used to create the driver.
+        """
+        return (driver_class, _freeze(args), _freeze(kwargs))
+
+    def acquire(self, driver_class: Type[driver.Driver], *args,
+                **kwargs) -> driver.Driver:
+        """ Retrieve a ready driver from the pool.
+
+        The most recently released driver of the same configuration is
+        returned. If none is available a new driver is created and waited on.
+
+        Args:
+            driver_class: Driver Class to create.
+            args: Positional arguments used to create the driver.
+            kwargs: Keyword arguments used to create the driver.
+
+        Returns:
+            A running and reset driver.
+        """
+        key = self.key(driver_class, *args, **kwargs)
+        with self._lock:
+            evicted = self._evict()
+            instance = self._take(key)
+        _close(evicted)
+
+        if self.spares and key not in self._warming:
+            # The spares are created in a thread, the signal handlers can only
+            # be installed from the main thread.
+            reaper.install()
+            threading.Thread(target=self._warm_spares,
+                             args=(key, driver_class, args,
+                                   _free_port(driver_class, kwargs)),
+                             daemon=True).start()
+
+        if instance is None:
+            instance = self._create(driver_class, *args, **kwargs)
+        return instance
+
+    def release(self, instance: driver.Driver, *args, **kwargs) -> None:
+        """ Reset a driver and return it to the pool.
+
+        If the reset fails the driver is closed and the error is raised.
+
+        Args:
+            instance: Driver previously retrieved with `acquire`.
+            args: Positional arguments passed to `reset`.
+            kwargs: Keyword arguments passed to `reset`.
+        """
+        key = self._keys.get(instance)
+        if key is None:
+            raise ValueError("Driver was not acquired from this pool.")
+
+        try:
+            instance.reset(*args, **kwargs)
+        except BaseException:
+            instance.close()
+            raise
+        self._store(key, instance)
+
+    @contextlib.contextmanager
+    def lease(self, driver_class: Type[driver.Driver], *args,
+              **kwargs) -> Iterator[driver.Driver]:
+        """ Acquire a driver for the duration of a `with` block.
+
+        The driver is released back to the pool when the block exits.
+        """
+        instance = self.acquire(driver_class, *args, **kwargs)
+        try:
+            yield instance
+        finally:
+            self.release(instance)
+
+    def warm(self, count: int, driver_class: Type[driver.Driver], *args,
+             **kwargs) -> None:
+        """ Ensure a number of idle drivers are ready for a configuration.
+
+        Args:
+            count: Number of idle drivers to keep for the configuration.
+            driver_class: Driver Class to create.
+            args: Positional arguments used to create the driver.
+            kwargs: Keyword arguments used to create the driver.
+        """
+        self._warm(self.key(driver_class, *args, **kwargs), count,
+                   driver_class, args, kwargs)
+
+    def evict(self) -> None:
+        """ Evict expired and least recently used idle drivers. """
+        with self._lock:
+            evicted = self._evict()
+        _close(evicted)
+
+    def clear(self) -> None:
+        """ Evict every idle driver, blocking until they are removed. """
+        with self._lock:
+            evicted = [instance for _, instance, _ in self._idle.values()]
+            self._idle.clear()
+        _close(evicted, wait=True)
+
+    def __len__(self) -> int:
+        """ Number of idle drivers held by the pool. """
+        return len(self._idle)
+
+    def _warm(self, key: Hashable, count: int,
+              driver_class: Type[driver.Driver], args: Tuple,
+              kwargs: Dict) -> None:
+        """ Create idle drivers for `key` until there are `count` of them.
+
+        The drivers are created with `args` and `kwargs`, which may differ
+        from the configuration of `key`, see `_free_port`.
+        """
+        with self._lock:
+            if key in self._warming:
+                return
+            self._warming.add(key)
+            missing = count - self._count(key)
+
+        try:
+            for _ in range(missing):
+                instance = self._create(driver_class, *args, **kwargs)
+                self._keys[instance] = key
+                self._store(key, instance)
+        finally:
+            with self._lock:
+                self._warming.discard(key)
+
+    def _warm_spares(self, key: Hashable, driver_class: Type[driver.Driver],
+                     args: Tuple, kwargs: Dict) -> None:
+        """ Start the spares of a configuration in a background thread.
+
+        Nobody waits on the thread, so errors are logged instead of raised.
+        """
+        try:
+            self._warm(key, self.spares, driver_class, args, kwargs)
+        except Exception:  # pylint: disable=W0703
+            LOGGER.exception("Failed to start a spare %s.",
+                             driver_class.__name__)
+
+    def _create(self, driver_class: Type[driver.Driver], *args,
+                **kwargs) -> driver.Driver:
+        """ Start a new driver and wait until it is ready.
+
+        A driver which fails to become ready is closed and the error is
+        raised.
+        """
+        instance = driver_class(*args, **kwargs)
+        instance.wait_or_close(self.timeout)
+        self._keys[instance] = self.key(driver_class, *args, **kwargs)
+        return instance
+
+    def _store(self, key: Hashable, instance: driver.Driver) -> None:
+        """ Add a ready driver to the idle drivers. """
+        with self._lock:
+            self._idle[id(instance)] = (key, instance, time.monotonic())
+            evicted = self._evict()
+        _close(evicted)
+
+    def _take(self, key: Hashable) -> Optional[driver.Driver]:
+        """ Remove and return the most recently released driver for `key`. """
+        for identifier in reversed(self._idle):
+            idle_key, instance, _ = self._idle[identifier]
+            if idle_key == key:
+                del self._idle[identifier]
+                return instance
+        return None
+
+    def _count(self, key: Hashable) -> int:
+        """ Count the idle drivers for `key`. """
+        return sum(1 for idle_key, _, _ in self._idle.values()
+                   if idle_key == key)
+
+    def _evict(self) -> Tuple[driver.Driver, ...]:
+        """ Remove expired drivers and drivers exceeding `max_idle`.
+
+        The removed drivers are returned so the caller can close them once the
+        lock is released.
+        """
+        evicted = []
+        if self.ttl is not None:
+            now = time.monotonic()
+            for identifier in list(self._idle):
+                _, instance, released_at = self._idle[identifier]
+                if now - released_at > self.ttl:
+                    del self._idle[identifier]
+                    evicted.append(instance)
+
+        while len(self._idle) > self.max_idle:
+            _, (_, instance, _) = self._idle.popitem(last=False)
+            evicted.append(instance)
+        return tuple(evicted)
@@ -0,0 +1,195 @@
+""" Readiness Probes Module.
+
+This module confirms a service is ready by speaking just enough of its wire
+protocol over a raw socket, without the client library of the service. A
+probe is a single connection, one request and one short response, so it
+costs a fraction of a millisecond once the service is up.
+
+Typical usage is done through the `ready` method of the drivers, probes can
+also be called directly.
+``` python
+from integration_tester import probes
+
+probes.redis_ping("127.0.0.1", 6379)  # True once Redis answers `PONG`
+```
+
+Probes never raise for an unavailable service, they return False when the
+connection is refused, reset, times out or the response is unexpected.
+"""
+import socket
+import struct
+import time
+from typing import Callable, Optional
+
+# Seconds a probe may take before the service is considered not ready.
+TIMEOUT = 0.5
+
+# Redis `PING` in the RESP protocol, the reply is `+PONG`.
+REDIS_PING = b"*1\r\n$4\r\nPING\r\n"
+
+# AMQP 0-9-1 protocol header, the broker replies with `Connection.Start`.
+AMQP_HEADER = b"AMQP\x00\x00\x09\x01"
+
+# `OP_QUERY` and `OP_REPLY` operation codes of the MongoDB wire protocol.
+_OP_QUERY = 2004
+_OP_REPLY = 1
+
+# Size of the BSON values with a fixed size, by element type.
+_BSON_SIZES = {
+    0x01: 8,  # double
+    0x07: 12,  # ObjectId
+    0x08: 1,  # boolean
+    0x09: 8,  # UTC datetime
+    0x10: 4,  # 32 bit integer
+    0x11: 8,  # timestamp
+    0x12: 8,  # 64 bit integer
+    0x13: 16,  # decimal128
+}
+
+
+def _exchange(host: str,
+              port: int,
+              request: bytes,
+              complete: Callable[[bytes], bool],
+              timeout: float = TIMEOUT) -> Optional[bytes]:
+    """ Send a request and read the response.
+
+    The socket is non-blocking, every operation is polled against a single
+    deadline so the whole exchange never exceeds `timeout`.
+
+    Args:
+        host: Address of the service.
+        port: Port of the service.
+        request: Bytes sent once connected, nothing is sent if empty.
+        complete: Function returning True once enough of the response has
+                  been read.
+        timeout: Seconds allowed for the whole exchange.
+
+    Returns:
+        The response read, or None if the exchange failed.
+    """
+    deadline = time.monotonic() + timeout
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if request:
+                sock.settimeout(max(deadline - time.monotonic(), 0.001))
+                sock.sendall(request)
+            response = b""
+            while not complete(response):
+                sock.settimeout(max(deadline - time.monotonic(), 0.001))
+                chunk = sock.recv(4096)
+                if not chunk:
+                    return None
+                response += chunk
+            return response
+    except OSError:
+        return None
+
+
+def tcp_connect(host: str, port: int, timeout: float = TIMEOUT) -> bool:
+    """ Confirm a port accepts TCP connections.
+
+    This only proves something is listening, Docker accepts connections on
+    published ports before the service inside the container does.
+    """
+    return _exchange(host, port, b"", lambda _: True, timeout) is not None
+
+
+def redis_ping(host: str, port: int, timeout: float = TIMEOUT) -> bool:
+    """ Confirm a Redis Service answers `PING`.
+
+    A Redis Service still loading its data set replies with a `LOADING`
+    error, which is not ready.
+    """
+    response = _exchange(host, port, REDIS_PING, lambda data: b"\r\n" in data,
+                         timeout)
+    return response is not None and response.startswith(b"+PONG")
+
+
+def mongodb_hello(host: str, port: int, timeout: float = TIMEOUT) -> bool:
+    """ Confirm a MongoDB Service answers the `isMaster` handshake.
+
+    The handshake is sent as an `OP_QUERY` on `admin.$cmd`, which every
+    MongoDB version accepts for `isMaster` and `hello`, including those
+    without `OP_MSG`.
+    """
+    document = _bson_int32_document("isMaster", 1)
+    body = (struct.pack("<i", 0) + b"admin.$cmd\x00" +
+            struct.pack("<ii", 0, -1) + document)
+    request = struct.pack("<iiii", 16 + len(body), 1, 0, _OP_QUERY) + body
+
+    def complete(data: bytes) -> bool:
+        return (len(data) >= 4
+                and len(data) >= struct.unpack_from("<i", data)[0])
+
+    response = _exchange(host, port, request, complete, timeout)
+    if response is None or len(response) < 36:
+        return False
+    _, _, response_to, op_code = struct.unpack_from("<iiii", response)
+    if response_to != 1 or op_code != _OP_REPLY:
+        return False
+    # The reply document follows the 16 byte header and 20 bytes of flags,
+    # cursor id, starting from and number returned.
+    return _bson_ok(response[36:])
+
+
+def amqp_handshake(host: str, port: int, timeout: float = TIMEOUT) -> bool:
+    """ Confirm an AMQP broker starts the connection handshake.
+
+    The protocol header is sent and the first frame must be the
+    `Connection.Start` method on channel 0. The connection is closed before
+    authenticating, which brokers log as a closed handshake.
+    """
+    response = _exchange(host, port, AMQP_HEADER, lambda data: len(data) >= 11,
+                         timeout)
+    if response is None:
+        return False
+    frame_type, channel = struct.unpack_from(">BH", response)
+    class_id, method_id = struct.unpack_from(">HH", response, 7)
+    return (frame_type, channel, class_id, method_id) == (1, 0, 10, 10)
+
+
+def _bson_int32_document(key: str, value: int) -> bytes:
+    """ Encode a BSON document holding a single 32 bit integer. """
+    element = b"\x10" + key.encode("utf-8") + b"\x00" + struct.pack(
+        "<i", value)
+    return struct.pack("<i", len(element) + 5) + element + b"\x00"
+
+
+def _bson_ok(document: bytes) -> bool:
+    """ Confirm the `ok` field of a BSON command reply is 1.
+
+    Only the top level elements are walked, nested documents are skipped as
+    a whole.
+    """
+    try:
+        end = struct.unpack_from("<i", document)[0] - 1
+        offset = 4
+        while offset < end:
+            kind = document[offset]
+            name_end = document.index(b"\x00", offset + 1)
+            name = document[offset + 1:name_end]
+            offset = name_end + 1
+            if name == b"ok":
+                if kind == 0x01:
+                    return struct.unpack_from("<d", document, offset)[0] == 1
+                if kind in (0x10, 0x12):
+                    fmt = "<i" if kind == 0x10 else "<q"
+                    return struct.unpack_from(fmt, document, offset)[0] == 1
+                return False
+            if kind in _BSON_SIZES:
+                offset += _BSON_SIZES[kind]
+            elif kind in (0x02, 0x03, 0x04, 0x05):
+                length = struct.unpack_from("<i", document, offset)[0]
+                # Strings are prefixed by their length, excluding the prefix.
+                offset += length + (4 if kind == 0x02 else 0)
+                # Binary data has a subtype byte after the length.
+                offset += 5 if kind == 0x05 else 0
+            elif kind in (0x06, 0x0A, 0x7F, 0xFF):
+                continue
+            else:
+                return False
+    except (IndexError, ValueError, struct.error):
+        return False
+    return False
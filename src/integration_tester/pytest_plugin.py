@@ -0,0 +1,437 @@
+""" Pytest Plugin Module.
+
+This module is registered as a pytest plugin when the package is installed. It
+provides the `mongo`, `redis` and `rabbitmq` fixtures, each yielding a ready
+driver which is reset after every test. The plugin needs pytest 7 or later,
+which is installed with the `pytest` extra (`integration_tester[pytest]`).
+``` python
+def test_insert(mongo):
+    mongo.client.test.test.insert_one({"test": "test"})
+```
+
+By default a single container per service is started for the whole session.
+The scope and the image tags are configured in the pytest ini file.
+```
+[pytest]
+integration_tester_scope = module
+integration_tester_mongo_tag = 4.4
+```
+
+Containers keep their data in memory with durability disabled (see the `fast`
+argument of the drivers), unless `integration_tester_fast = false` is set.
+With `integration_tester_limits = true` the memory of each container is
+limited to the preset of its service, and containers are pinned to disjoint
+CPU sets (see `resources.AUTO`). CPU sets are shared between the processes of
+the machine, so workers and shards running side by side do not starve each
+other.
+
+Containers publish their services on free host ports chosen by Docker, the
+drivers expose them through `port` and `url`. Under pytest-xdist, workers
+coordinate through a file locked registry in the shared temporary directory of
+the session instead of each starting its own containers. The first worker
+needing a container starts it and records it, the others attach to it, and the
+last worker to finish removes it. In the default `share` mode every worker
+uses a single container per service. In the `shard` mode
+(`integration_tester_xdist = shard`) workers are spread across
+`integration_tester_xdist_shards` containers per service, two by default.
+```
+[pytest]
+integration_tester_xdist = shard
+integration_tester_xdist_shards = 4
+```
+
+Each worker is isolated in its own part of the shared services, which is reset
+after every test:
+- Redis: a logical database, `redis_db`, which `client` and `url` are bound
+  to.
+- RabbitMQ: a vhost, which `client` and `url` are bound to.
+- MongoDB: a database, `mongo_db`. Only that database is dropped after each
+  test, tests must keep their data in it.
+
+The images of the services used by the collected tests are pulled in the
+background as soon as collection finishes.
+
+The slowest lifecycle phases of the drivers (see `instrumentation`) are listed
+at the end of the session. Under pytest-xdist the phases run in the workers,
+use the `INTEGRATION_TESTER_EVENTS` JSON lines export to collect them.
+"""
+import contextlib
+import importlib
+import json
+import os
+from typing import Dict, Iterator, List, NamedTuple
+
+import pytest
+
+from integration_tester import (backends, driver, images, instrumentation,
+                                resources)
+
+
+class Service(NamedTuple):
+    """ Description of a service provided as a fixture.
+
+    Attr:
+        module: Module containing the driver Class.
+        class_name: Name of the driver Class.
+        image: Docker Image repository of the service.
+        tag: Default Docker Image tag.
+    """
+    module: str
+    class_name: str
+    image: str
+    tag: str
+
+
+SERVICES = {
+    "mongo":
+    Service("integration_tester.mongo_driver", "MongoDBDriver", "mongo",
+            "3.4"),
+    "redis":
+    Service("integration_tester.redis_driver", "RedisDriver", "redis",
+            "5.0.7"),
+    "rabbitmq":
+    Service("integration_tester.rabbitmq_driver", "RabbitMQDriver", "rabbitmq",
+            "latest"),
+}
+
+SCOPES = ("session", "package", "module", "class", "function")
+XDIST_MODES = ("share", "shard")
+
+
+class ContainerRegistry:  # pylint: disable=R0903
+    """ Registry of containers shared between pytest-xdist workers.
+
+    The registry is a JSON file guarded by an exclusive file lock. Entries map
+    a service name, and its shard in the `shard` mode, to the container ID and
+    the workers using the container.
+    """
+    def __init__(self, directory: str):
+        """ Initialise the registry.
+
+        Args:
+            directory: Directory shared by every worker of the session.
+        """
+        self.path = os.path.join(directory, "integration_tester.json")
+
+    @contextlib.contextmanager
+    def locked(self) -> Iterator[Dict[str, Dict]]:
+        """ Lock the registry and yield its entries.
+
+        Changes made to the entries are written back when the block exits.
+        """
+        # Imported here as `fcntl` is not available on every platform and the
+        # registry is only used under pytest-xdist.
+        import fcntl  # pylint: disable=C0415
+
+        with open(f"{self.path}.lock", "a+", encoding="utf-8") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.path, encoding="utf-8") as registry:
+                        entries = json.load(registry)
+                except (OSError, ValueError):
+                    entries = {}
+
+                yield entries
+
+                with open(self.path, "w", encoding="utf-8") as registry:
+                    json.dump(entries, registry)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """ Register the ini options of the plugin. """
+    parser.addini("integration_tester_scope",
+                  "Scope of the service containers: " + ", ".join(SCOPES),
+                  default="session")
+    parser.addini("integration_tester_fast",
+                  "Keep service data in memory with durability disabled",
+                  type="bool",
+                  default=True)
+    parser.addini("integration_tester_limits",
+                  "Limit the memory and CPUs of each service container",
+                  type="bool",
+                  default=False)
+    parser.addini("integration_tester_xdist",
+                  "Container sharing between pytest-xdist workers: " +
+                  ", ".join(XDIST_MODES),
+                  default="share")
+    parser.addini("integration_tester_xdist_shards",
+                  "Containers per service in the shard mode",
+                  default="2")
+    for name, service in SERVICES.items():
+        parser.addini(f"integration_tester_{name}_tag",
+                      f"Docker Image tag of the {name} fixture",
+                      default=service.tag)
+
+
+SUMMARY = pytest.StashKey[instrumentation.Summary]()
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    """ Start collecting the timings of the driver lifecycle phases. """
+    config.stash[SUMMARY] = instrumentation.Summary()
+    instrumentation.add_listener(config.stash[SUMMARY])
+
+
+def pytest_unconfigure(config: pytest.Config) -> None:
+    """ Stop collecting the timings of the driver lifecycle phases. """
+    if SUMMARY in config.stash:
+        instrumentation.remove_listener(config.stash[SUMMARY])
+
+
+def pytest_terminal_summary(terminalreporter, config: pytest.Config) -> None:
+    """ Report the slowest lifecycle phases of the drivers. """
+    rows = config.stash[SUMMARY].slowest()
+    if not rows:
+        return
+    terminalreporter.write_sep("=", "slowest integration_tester phases")
+    for driver_name, phase, calls, total, maximum in rows:
+        terminalreporter.write_line(
+            f"{total:8.2f}s total {maximum:8.2f}s max {calls:5d}x "
+            f"{driver_name} {phase}")
+
+
+def pytest_collection_modifyitems(config: pytest.Config,
+                                  items: List[pytest.Item]) -> None:
+    """ Pull the images of the services used by the collected tests. """
+    if config.option.collectonly:
+        return
+    used = {
+        name
+        for item in items
+        for name in SERVICES if name in getattr(item, "fixturenames", ())
+    }
+    images.MANAGER.warm(_image(config, name) for name in sorted(used))
+
+
+def _image(config: pytest.Config, name: str) -> str:
+    """ Image reference of a service. """
+    tag = config.getini(f"integration_tester_{name}_tag")
+    return f"{SERVICES[name].image}:{tag}"
+
+
+def _scope(fixture_name: str, config: pytest.Config) -> str:  # pylint: disable=W0613
+    """ Resolve the configured scope of the service containers. """
+    scope = config.getini("integration_tester_scope")
+    if scope not in SCOPES:
+        raise pytest.UsageError(
+            f"integration_tester_scope must be one of {', '.join(SCOPES)}.")
+    return scope
+
+
+def _xdist_mode(config: pytest.Config) -> str:
+    """ Resolve the configured pytest-xdist sharing mode. """
+    mode = config.getini("integration_tester_xdist")
+    if mode not in XDIST_MODES:
+        modes = ", ".join(XDIST_MODES)
+        raise pytest.UsageError(
+            f"integration_tester_xdist must be one of {modes}.")
+    return mode
+
+
+def _shards(config: pytest.Config) -> int:
+    """ Resolve the configured number of containers per service to shard.
+    """
+    shards = config.getini("integration_tester_xdist_shards")
+    try:
+        shards = int(shards)
+    except ValueError:
+        shards = 0
+    if shards < 1:
+        raise pytest.UsageError(
+            "integration_tester_xdist_shards must be a positive integer.")
+    return shards
+
+
+def _registry_key(name: str, config: pytest.Config) -> str:
+    """ Registry entry of the container of a service used by the worker. """
+    if _xdist_mode(config) == "share":
+        return name
+    return f"{name}-{_worker_index() % _shards(config)}"
+
+
+def _worker_index() -> int:
+    """ Index of the current pytest-xdist worker, 0 without xdist. """
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
+    return int(worker.lstrip("gw") or 0)
+
+
+def _provide(
+        name: str, config: pytest.Config,
+        tmp_path_factory: pytest.TempPathFactory) -> Iterator[driver.Driver]:
+    """ Start, or attach to, the container of a service.
+
+    The driver is created directly on a free host port, unless running in a
+    pytest-xdist worker, in which case the registry is used to find the
+    container shared with other workers.
+    """
+    service = SERVICES[name]
+    driver_class = getattr(importlib.import_module(service.module),
+                           service.class_name)
+    kwargs = {
+        "tag": config.getini(f"integration_tester_{name}_tag"),
+        "fast": config.getini("integration_tester_fast"),
+    }
+    if config.getini("integration_tester_limits"):
+        kwargs["mem_limit"] = kwargs["cpuset_cpus"] = resources.AUTO
+    if name == "redis":
+        workers = int(os.environ.get("PYTEST_XDIST_WORKER_COUNT", 1))
+        kwargs["databases"] = max(16, workers)
+
+    if not _shared(config):
+        instance = driver_class(port=0, stop_timeout=0, **kwargs)
+        try:
+            instance.wait_until_ready()
+            yield instance
+        finally:
+            # The removal does not hold up the session, pending removals are
+            # finished on interpreter exit.
+            instance.close(wait=False)
+        return
+
+    worker = os.environ["PYTEST_XDIST_WORKER"]
+    if name == "redis":
+        kwargs["db"] = _worker_index()
+    elif name == "rabbitmq":
+        kwargs["vhost"] = f"integration_tester_{worker}"
+
+    key = _registry_key(name, config)
+    registry = ContainerRegistry(str(tmp_path_factory.getbasetemp().parent))
+    with registry.locked() as entries:
+        entry = entries.get(key)
+        if entry is None:
+            instance = driver_class(port=0, **kwargs)
+            instance.wait_or_close()
+            entry = {
+                "container_id": instance._container_id,  # pylint: disable=W0212
+                "docker_host": instance.endpoint.base_url,
+                "users": [],
+            }
+            entries[key] = entry
+        else:
+            instance = driver_class(container_id=entry["container_id"],
+                                    endpoint=backends.endpoint(
+                                        entry["docker_host"]),
+                                    **kwargs)
+        entry["users"].append(worker)
+
+    # The container is removed by the last worker using it.
+    instance.detach()
+    if name == "rabbitmq":
+        # Create the vhost of the worker, a driver attached to the container
+        # of another worker has not waited for it.
+        instance.create_vhost()
+    yield instance
+    instance.close()
+
+    with registry.locked() as entries:
+        entry = entries[key]
+        entry["users"].remove(worker)
+        if not entry["users"]:
+            del entries[key]
+            client = instance.endpoint.client()
+            client.containers.get(entry["container_id"]).remove(v=True,
+                                                                force=True)
+
+
+def _shared(config: pytest.Config) -> bool:
+    """ Check if containers are shared between pytest-xdist workers. """
+    if "PYTEST_XDIST_WORKER" not in os.environ:
+        return False
+    # Reject an unknown mode before any container is started.
+    _xdist_mode(config)
+    return True
+
+
+def _driver_fixture(name: str):
+    """ Create the container fixture of a service with a configurable scope.
+    """
+
+    @pytest.fixture(scope=_scope, name=f"integration_tester_{name}")
+    def fixture(
+            request: pytest.FixtureRequest,
+            tmp_path_factory: pytest.TempPathFactory
+    ) -> Iterator[driver.Driver]:
+        yield from _provide(name, request.config, tmp_path_factory)
+
+    return fixture
+
+
+integration_tester_mongo = _driver_fixture("mongo")
+integration_tester_redis = _driver_fixture("redis")
+integration_tester_rabbitmq = _driver_fixture("rabbitmq")
+
+
+@pytest.fixture
+def mongo_db(request: pytest.FixtureRequest) -> str:
+    """ MongoDB database reserved for the current worker.
+
+    This is always `test` unless containers are shared between pytest-xdist
+    workers, in which case each worker uses a database named after it.
+    """
+    if _shared(request.config):
+        return f"test_{os.environ['PYTEST_XDIST_WORKER']}"
+    return "test"
+
+
+@pytest.fixture
+def mongo(
+    request: pytest.FixtureRequest,
+    integration_tester_mongo: driver.Driver,  # pylint: disable=W0621
+    mongo_db: str  # pylint: disable=W0621
+) -> Iterator[driver.Driver]:
+    """ Ready `MongoDBDriver`, reset after the test.
+
+    Only the database of `mongo_db` is dropped when the container is shared
+    between pytest-xdist workers.
+    """
+    yield integration_tester_mongo
+    if _shared(request.config):
+        integration_tester_mongo.client.drop_database(mongo_db)
+    else:
+        integration_tester_mongo.reset()
+
+
+@pytest.fixture
+def redis_db(request: pytest.FixtureRequest) -> int:
+    """ Logical Redis database reserved for the current worker.
+
+    This is always 0 unless containers are shared between pytest-xdist
+    workers, in which case each worker uses the database of its index.
+    """
+    if _shared(request.config):
+        return _worker_index()
+    return 0
+
+
+@pytest.fixture
+def redis(
+    request: pytest.FixtureRequest,
+    integration_tester_redis: driver.Driver,  # pylint: disable=W0621
+    redis_db: int  # pylint: disable=W0621
+) -> Iterator[driver.Driver]:
+    """ Ready `RedisDriver`, reset after the test.
+
+    When the container is shared between pytest-xdist workers, the driver is
+    bound to the database of `redis_db` and only that database is flushed.
+    """
+    yield integration_tester_redis
+    if _shared(request.config):
+        integration_tester_redis.reset([redis_db])
+    else:
+        integration_tester_redis.reset()
+
+
+@pytest.fixture
+def rabbitmq(
+    integration_tester_rabbitmq: driver.Driver  # pylint: disable=W0621
+) -> Iterator[driver.Driver]:
+    """ Ready `RabbitMQDriver`, reset after the test.
+
+    When the container is shared between pytest-xdist workers, the driver is
+    bound to a vhost of the worker and only that vhost is reset.
+    """
+    yield integration_tester_rabbitmq
+    integration_tester_rabbitmq.reset()
@@ -10,22 +10,27 @@ from integration_tester import rabbitmq_driver
 driver = rabbitmq_driver.RabbitMQDriver()
 ```
 
-This module will raise a `OptionalModuleNotInstalledException` if the `pika`
-package has not been installed.
+The module can be imported without the `pika` package, readiness is probed
+over the wire protocol. Using `client` or `reset` will raise a
+`OptionalModuleNotInstalled` exception if it has not been installed.
 """
-from typing import List
+import json
+import shlex
+import urllib.parse
+from typing import List, Optional, Tuple, Union
 
-from integration_tester import driver, errors
+import requests
+
+from integration_tester import (async_driver, driver, errors, instrumentation,
+                                probes, readiness)
 
 try:
     import pika
-except ModuleNotFoundError as error:
-    raise errors.OptionalModuleNotInstalled(
-        "To support the optional RabbitMQ Driver please install the pika"
-        " package.") from error
+except ModuleNotFoundError:
+    pika = None  # pylint: disable=C0103
 
 
-class RabbitMQDriver(driver.Driver):
+class RabbitMQDriver(driver.Driver):  # pylint: disable=R0902
     """ RabbitMQ Driver.
 
     This class extends the Docker driver to provide an interface for a RabbitMQ
@@ -44,23 +49,74 @@ class RabbitMQDriver(driver.Driver):
     3. Reset the RabbitMQ instide the service to factory settings and not reset
        the container itself.
 
-    If ensuring the container is reset completely each iteration, you can delete
+    If ensuring the container is reset completely each iteration, you can close
     the existing container and start a new one.
     ``` python
     rabbitmq = RabbitMQDriver()
-    del(rabbitmq)
+    rabbitmq.close()
     rabbitmq = RabbitMQDriver()
     ```
     This will completely remove the container and its volume, then create a new
     container and volume.
+
+    `reset` finds every queue and exchange by itself through the management
+    HTTP API when a `-management` tag is running. Other tags have no cheap
+    way to list them, so `reset` recreates the vhost like `exec_reset`
+    instead, which closes the connections of the tests. Listing them with
+    `rabbitmqctl` inside the container, two slow executions of the Erlang VM,
+    is opt-in with `discover`.
+
+    The driver holds a single `pika.BlockingConnection` which is reused by
+    `reset` when deleting queues and exchanges. Tests can reuse it through
+    `client` instead of creating their own.
+
+    `exec_reset` recreates the vhost with `rabbitmqctl` inside the container
+    instead, without `pika` or a list of queues. Open
+    connections to the vhost, including the ones of the tests, are closed by
+    the broker, the connection of `client` is replaced on next use.
+
+    The vhost is `/`, the `RABBITMQ_DEFAULT_VHOST` environment variable of the
+    container, or the `vhost` given on initialisation. A `vhost` given on
+    initialisation is created by `wait_until_ready`, the broker only creates
+    the default vhost.
+
+    Attr:
+        vhost: Name of the vhost clients connect to and resets clean.
     """
+    ready_backoff = readiness.Backoff(initial=0.1, factor=2, maximum=2)
+    ready_log_pattern = "Server startup complete"
+    memory_preset = "512m"
+    cpu_preset = 2
+    # Recreating the vhost removes every queue, exchange and binding. Only the
+    # public `rabbitmqctl` commands are used, the internal functions reachable
+    # through `eval` change between releases. Deleting a missing vhost fails,
+    # the error is ignored.
+    reset_command = ('V="${RABBITMQ_DEFAULT_VHOST:-/}";'
+                     ' U="${RABBITMQ_DEFAULT_USER:-guest}";'
+                     ' rabbitmqctl -q delete_vhost "$V" > /dev/null 2>&1;'
+                     ' rabbitmqctl -q add_vhost "$V"'
+                     ' && rabbitmqctl -q set_permissions -p "$V" "$U"'
+                     """ '.*' '.*' '.*'""")
+    # Creates the vhost of the driver, the vhost may already exist when the
+    # container is shared.
+    vhost_command = ('V="${RABBITMQ_DEFAULT_VHOST:-/}";'
+                     ' U="${RABBITMQ_DEFAULT_USER:-guest}";'
+                     ' rabbitmqctl -q add_vhost "$V" > /dev/null 2>&1;'
+                     ' rabbitmqctl -q set_permissions -p "$V" "$U"'
+                     """ '.*' '.*' '.*'""")
+
     def __init__(  # pylint: disable=R0913
             self,
             tag: str = "latest",
             host: str = "127.0.0.1",
-            port: int = 5672,
+            port: Optional[int] = 5672,
             username: str = "guest",
-            password: str = "guest"):
+            password: str = "guest",
+            *,
+            management_port: Optional[int] = 15672,
+            fast: bool = False,
+            vhost: Optional[str] = None,
+            **kwargs):
         """ Initialise the RabbitMQ Driver.
 
         This will configure and then start the Docker container.
@@ -69,68 +125,305 @@ class RabbitMQDriver(driver.Driver):
             tag: Reference to the specific version of Docker Image to pull from
                  Docker Hub.
             host: Host address to bind the port.
-            port: The port to bind the container.
+            port: The port to bind the container. If `0` or `None` a free
+                  port is chosen by Docker and available in `port` once
+                  started.
             username: Connection authentication username to configure the
                       service with.
             password: Connection authentication password to configure the
                       service with.
+            management_port: The port to bind the management HTTP API to.
+                             Only used by `-management` tags. If `0` or `None`
+                             a free port is chosen by Docker.
+            fast: Trade durability for speed. The data directory, holding
+                  the message stores and the schema database, is mounted in
+                  memory.
+            vhost: The vhost to connect to and reset, i.e. a vhost per
+                   pytest-xdist worker sharing the container. Defaults to the
+                   `RABBITMQ_DEFAULT_VHOST` environment variable, or `/`. It
+                   is created by `wait_until_ready`.
+            kwargs: Additional arguments passed to `driver.Driver`, i.e.
+                    `container_id`.
 
         Container tags can be found on the
         [Docker Hub](https://hub.docker.com/_/rabbitmq).
         """
         self.host, self.port = host, port
         self.username, self.password = username, password
+        self.fast = fast
+        self.vhost = vhost or (kwargs.get("environment") or {}).get(
+            "RABBITMQ_DEFAULT_VHOST", "/")
+        # The vhost of the driver overrides the default of the container.
+        self._vhost_created = vhost is None or vhost == "/"
+        if vhost is not None:
+            self.reset_command = (
+                f"RABBITMQ_DEFAULT_VHOST={shlex.quote(vhost)};"
+                f" {self.reset_command}")
+            self.vhost_command = (
+                f"RABBITMQ_DEFAULT_VHOST={shlex.quote(vhost)};"
+                f" {self.vhost_command}")
 
+        self.management_port: Optional[int] = None
         ports = {5672: (host, port)}
-        super().__init__(f"rabbitmq:{tag}", ports)
+        if "management" in tag:
+            ports[15672] = (host, management_port)
+
+        self._connection: Optional["pika.BlockingConnection"] = None
+        self._channel: Optional[
+            "pika.adapters.blocking_connection.BlockingChannel"] = None
+        self._session: Optional[requests.Session] = None
+
+        if fast:
+            kwargs.setdefault("tmpfs",
+                              {"/var/lib/rabbitmq": driver.TMPFS_OPTIONS})
+
+        # RabbitMQ sizes its memory alarm from the memory of the machine, not
+        # the memory limit of the container. Publishers are blocked at 40% of
+        # the limit, the default relative watermark.
+        memory = self._memory_limit(kwargs.get("mem_limit"))
+        if memory is not None:
+            environment = dict(kwargs.get("environment") or {})
+            watermark = f"{{absolute,{memory * 2 // 5}}}"
+            environment.setdefault(
+                "RABBITMQ_SERVER_ADDITIONAL_ERL_ARGS",
+                f"-rabbit vm_memory_high_watermark {watermark}")
+            kwargs["environment"] = environment
+
+        super().__init__(f"rabbitmq:{tag}", ports, **kwargs)
+        self.port = self.ports[5672]
+        self.management_port = self.ports.get(15672)
+
+    @property
+    def url(self) -> str:
+        """ AMQP connection URL of the vhost of the RabbitMQ Service. """
+        credentials = ":".join(
+            urllib.parse.quote(value, safe="")
+            for value in (self.username, self.password))
+        vhost = urllib.parse.quote(self.vhost, safe="")
+        return f"amqp://{credentials}@{self.host}:{self.port}/{vhost}"
+
+    @property
+    def client(self) -> "pika.BlockingConnection":
+        """ Connection to the RabbitMQ Service.
+
+        The connection is created on first use and kept for the lifetime of
+        the driver. A new connection is created if it has been closed.
+        Heartbeats are disabled as the connection may be idle between uses.
+
+        Exceptions:
+            errors.OptionalModuleNotInstalled: Raised if the `pika` package has
+                                               not been installed.
+        """
+        if pika is None:
+            raise errors.OptionalModuleNotInstalled(
+                "To support the optional RabbitMQ Driver please install the"
+                " pika package.")
+        if self._connection is None or not self._connection.is_open:
+            credentials = pika.PlainCredentials(self.username, self.password)
+            parameters = pika.ConnectionParameters(self.host,
+                                                   self.port,
+                                                   self.vhost,
+                                                   credentials,
+                                                   heartbeat=0)
+            self._connection = pika.BlockingConnection(parameters)
+            self._channel = None
+        return self._connection
 
     def ready(self) -> bool:
         """ Confirm if the RabbitMQ Service is running.
 
         Confirm if the RabbitMQ Service within the container is running and
-        ready to accept connections. To achieve this, a
-        `pika.BlockingConnection` object is created and the the server is
-        polled using the `.is_open` method.  This method serves no information
-        purpose other than starting an active connection to the service.
+        ready to accept connections. To achieve this, the AMQP protocol header
+        is sent over a raw socket with `probes.amqp_handshake`, so `pika` is
+        not required.
 
         Returns:
             This function returns True if the RabbitMQ Service is active.
         """
-        credentials = pika.PlainCredentials(self.username, self.password)
-        parameters = pika.ConnectionParameters(self.host, self.port, '/',
-                                               credentials)
+        return probes.amqp_handshake(self.host, self.port)
 
-        try:
-            connection = pika.BlockingConnection(parameters)
-        except pika.exceptions.AMQPConnectionError:
-            return False
+    def wait_until_ready(self,
+                         wait_interval: Optional[Union[float, int]] = None,
+                         timeout: int = 60) -> None:
+        """ Block until the RabbitMQ Service is ready, then create the vhost.
 
-        connected = connection.is_open
-        connection.close()
-        return connected
+        The `vhost` given on initialisation is created with `create_vhost`, so
+        clients can connect to it without `exec_reset`.
 
-    def reset(self, queues: List[str]) -> None:  # pylint: disable=W0221
-        """ Reset the database to factory new.
+        Args:
+            wait_interval: Fixed gap between checks of the container.
+            timeout: Timeout if the container does not become `ready`.
+        """
+        super().wait_until_ready(wait_interval, timeout)
+        self.create_vhost()
+
+    def create_vhost(self) -> None:
+        """ Create the `vhost` given on initialisation.
 
-        *NB*: Please provide *ALL* queues created within your code to ensure a
-        proper reset.
+        The vhost is only created once by the driver, the broker only creates
+        its default vhost. A driver attached to a running container, i.e. one
+        shared by pytest-xdist workers, calls this directly.
+
+        Exceptions:
+            RuntimeError: Raised if the vhost can not be created, with the
+                          output of the command.
+        """
+        if self._vhost_created:
+            return
+        exit_code, output = self.shell(self.vhost_command)
+        if exit_code != 0:
+            raise RuntimeError(output.decode("utf-8", "replace"))
+        self._vhost_created = True
+
+    @instrumentation.timed("reset")
+    def reset(  # pylint: disable=W0221
+            self,
+            queues: Optional[List[str]] = None,
+            discover: bool = False) -> None:
+        """ Reset the database to factory new.
 
         This method soft resets the RabbitMQ Service within the container. This
         allows for a clean testing environment without the slow reset of
         Docker. However, this is not a completely isolated process. If complete
         isolation is required, please see Class doc on how to reset completely.
 
-        Args:
-            queues: List of queues creating during usage of the instance.
+        Every queue and every exchange declared by clients is found and
+        deleted, which removes their bindings as well. The deletes are sent
+        over a single connection which is kept open between resets.
+
+        Without the management HTTP API the vhost is recreated instead, like
+        `exec_reset`. The broker then closes *every* connection to the vhost,
+        including the connections of the caller, which have to reconnect
+        after `reset`. Use a `-management` tag, `queues` or `discover` to keep
+        them open.
 
-        This method currently relies on the user to provide accurate queue
-        information as there is no way to check what queues have been created
-        and the names of the created queues are required to reset the service.
+        Args:
+            queues: Only delete these queues and skip finding the queues and
+                    exchanges of the service.
+            discover: Find the queues and exchanges with `rabbitmqctl` when
+                      the management HTTP API is not available, instead of
+                      recreating the vhost. Open connections are kept.
         """
-        credentials = pika.PlainCredentials(self.username, self.password)
-        parameters = pika.ConnectionParameters(self.host, self.port, '/',
-                                               credentials)
-        connection = pika.BlockingConnection(parameters)
-        channel = connection.channel()
+        if queues is None and self.management_port is None and not discover:
+            self._exec_reset()
+            return
+
+        exchanges: List[str] = []
+        if queues is None:
+            queues, exchanges = self._discover()
+
         for queue in queues:
-            channel.queue_delete(queue=queue)
+            self._delete(queue=queue)
+        for exchange in exchanges:
+            self._delete(exchange=exchange)
+
+    def _exec_reset(self) -> None:
+        """ Recreate the vhost with `reset_command`.
+
+        The connection of `client` is closed by the broker with the vhost, but
+        `pika` only notices on its next use. It is dropped so `client` and
+        `reset` open a new connection.
+        """
+        super()._exec_reset()
+        self._close_clients()
+
+    def _delete(self,
+                queue: Optional[str] = None,
+                exchange: Optional[str] = None) -> None:
+        """ Delete a queue or exchange over the control channel.
+
+        Queues and exchanges which have already been removed (404) or are
+        exclusive to another connection (405) are skipped. The broker closes
+        the channel in both cases, it is reopened on the next delete.
+        """
+        channel = self._get_channel()
+        try:
+            if queue is not None:
+                channel.queue_delete(queue=queue)
+            else:
+                channel.exchange_delete(exchange=exchange)
+        except pika.exceptions.ChannelClosedByBroker as error:
+            if error.reply_code not in {404, 405}:
+                raise
+
+    def _get_channel(
+            self) -> "pika.adapters.blocking_connection.BlockingChannel":
+        """ Retrieve the control channel of `client`, reopening if closed. """
+        connection = self.client
+        if self._channel is None or not self._channel.is_open:
+            self._channel = connection.channel()
+        return self._channel
+
+    def _close_clients(self) -> None:
+        """ Close the connections to the RabbitMQ Service. """
+        if self._connection is not None and self._connection.is_open:
+            try:
+                self._connection.close()
+            except pika.exceptions.AMQPError:
+                # The broker may have closed the connection already.
+                pass
+        self._connection, self._channel = None, None
+
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _discover(self) -> Tuple[List[str], List[str]]:
+        """ Find the queues and client declared exchanges of the service.
+
+        Returns:
+            The names of the queues and the names of the exchanges. The default
+            exchange and the `amq.*` exchanges are excluded as they can not be
+            deleted.
+        """
+        if self.management_port is not None:
+            queues = self._management_names("queues")
+            exchanges = self._management_names("exchanges")
+        else:
+            queues = self._rabbitmqctl_names("list_queues")
+            exchanges = self._rabbitmqctl_names("list_exchanges")
+
+        exchanges = [
+            exchange for exchange in exchanges
+            if exchange and not exchange.startswith("amq.")
+        ]
+        return queues, exchanges
+
+    def _management_names(self, resource: str) -> List[str]:
+        """ List the names of a resource of the vhost over HTTP. """
+        if self._session is None:
+            self._session = requests.Session()
+            self._session.auth = (self.username, self.password)
+
+        vhost = urllib.parse.quote(self.vhost, safe="")
+        response = self._session.get(
+            f"http://{self.host}:{self.management_port}/api/{resource}/"
+            f"{vhost}",
+            params={"columns": "name"})
+        response.raise_for_status()
+        return [item["name"] for item in response.json()]
+
+    def _rabbitmqctl_names(self, command: str) -> List[str]:
+        """ List the names of a resource with `rabbitmqctl` in the container.
+        """
+        exit_code, output = self.execute([
+            "rabbitmqctl", command, "-q", "-p", self.vhost, "--formatter",
+            "json", "name"
+        ])
+        if exit_code != 0:
+            raise RuntimeError(output.decode("utf-8", "replace"))
+        return [item["name"] for item in json.loads(output)]
+
+
+class AsyncRabbitMQDriver(async_driver.AsyncDriver):
+    """ Asynchronous RabbitMQ Driver.
+
+    This class wraps `RabbitMQDriver` for use with `asyncio`. It accepts the
+    same arguments as `RabbitMQDriver`.
+    ``` python
+    async with AsyncRabbitMQDriver() as rabbitmq:
+        # test code
+        await rabbitmq.reset()
+    ```
+    """
+    driver_class = RabbitMQDriver
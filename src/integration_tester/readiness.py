@@ -0,0 +1,135 @@
+""" Readiness Module.
+
+This module contains the building blocks used by `Driver.wait_until_ready` to
+detect that the software inside a container is ready as early as possible.
+
+Polling is done with an exponential backoff, starting with very short gaps so
+fast services are detected quickly, then backing off so slow services are not
+polled excessively.
+``` python
+from integration_tester import readiness
+
+backoff = readiness.Backoff(initial=0.01, factor=2, maximum=1)
+```
+
+A `LogWatcher` streams the logs of a container and flags when a line matching
+a pattern (i.e. "Ready to accept connections") has been written.
+"""
+import random
+import re
+import threading
+from typing import Iterator, Optional, Pattern, Union
+
+import docker
+import requests
+
+
+class Backoff:
+    """ Exponential backoff with jitter.
+
+    Delays start at `initial` and are multiplied by `factor` after each attempt
+    up to `maximum`. Each delay is reduced by a random fraction of at most
+    `jitter` so that drivers started together do not poll in lock step.
+    """
+    def __init__(self,
+                 initial: Union[float, int] = 0.01,
+                 factor: Union[float, int] = 2,
+                 maximum: Union[float, int] = 1,
+                 jitter: float = 0.1):
+        """ Initialise the backoff.
+
+        Args:
+            initial: First delay in seconds.
+            factor: Multiplier applied to the delay after each attempt.
+            maximum: Largest delay in seconds.
+            jitter: Maximum fraction each delay is randomly reduced by.
+        """
+        self.initial = initial
+        self.factor = factor
+        self.maximum = maximum
+        self.jitter = jitter
+
+    @classmethod
+    def fixed(cls, interval: Union[float, int]) -> "Backoff":
+        """ Create a backoff which always waits `interval` seconds. """
+        return cls(interval, 1, interval, 0)
+
+    def delays(self) -> Iterator[float]:
+        """ Generate the delays between attempts.
+
+        Returns:
+            An endless iterator of delays in seconds.
+        """
+        delay = self.initial
+        while True:
+            yield delay * (1 - random.uniform(0, self.jitter))
+            delay = min(delay * self.factor, self.maximum)
+
+
+class LogWatcher:
+    """ Background watcher of container logs.
+
+    A daemon thread follows the log stream of the container and sets `matched`
+    once a line matching `pattern` has been written. Logs written before the
+    watcher started are included.
+    """
+    def __init__(self,
+                 container: docker.models.containers.Container,
+                 pattern: Union[str, Pattern],
+                 event: Optional[threading.Event] = None):
+        """ Initialise and start the watcher.
+
+        Args:
+            container: Container to follow the logs of.
+            pattern: Regular expression searched for in each log line.
+            event: Event set once a matching line has been written. Passing
+                   an event shared with other sources allows a single `wait`
+                   on all of them.
+        """
+        self.pattern = re.compile(pattern)
+        self._event = event or threading.Event()
+        self._matched = False
+        self._stream = container.logs(stream=True, follow=True)
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    @property
+    def matched(self) -> bool:
+        """ True once a log line matching the pattern has been written. """
+        return self._matched
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """ Block until a matching log line is written or `timeout` passes.
+
+        Returns:
+            True if a matching log line has been written.
+        """
+        self._event.wait(timeout)
+        return self._matched
+
+    def stop(self) -> None:
+        """ Close the log stream and stop following the logs. """
+        self._stream.close()
+
+    def _match(self) -> None:
+        """ Flag the match and wake the waiters. """
+        self._matched = True
+        self._event.set()
+
+    def _watch(self) -> None:
+        """ Follow the log stream and search each complete line. """
+        buffer = b""
+        try:
+            for chunk in self._stream:
+                lines = (buffer + chunk).split(b"\n")
+                buffer = lines.pop()
+                for line in lines:
+                    if self.pattern.search(line.decode("utf-8", "replace")):
+                        self._match()
+                        return
+            if self.pattern.search(buffer.decode("utf-8", "replace")):
+                self._match()
+        except (docker.errors.APIError, requests.exceptions.RequestException,
+                AttributeError, OSError, ValueError):
+            # The stream was closed by `stop` or the container was removed.
+            return
@@ -0,0 +1,240 @@
+""" Container Reaper Module.
+
+Every container created by a driver is labelled with the process which created
+it. This module uses the labels to make sure containers do not outlive their
+test run.
+
+Drivers which are still open when the interpreter exits, or when the process
+receives `SIGINT` or `SIGTERM`, are closed by handlers installed the first
+time a container is created, the signal handlers the first time it happens in
+the main thread. The signal handlers only unwind the interrupted code, the
+drivers are closed by the exit handler once their locks have been released.
+
+Containers left behind by crashed or killed runs are removed in bulk by `reap`,
+on every Docker service of `backends`.
+``` python
+from integration_tester import reaper
+
+reaper.reap()
+```
+
+The same is available from the command line, i.e. at the start of a CI job.
+```
+python -m integration_tester reap --max-age 3600
+```
+"""
+import atexit
+import concurrent.futures
+import os
+import signal
+import socket
+import threading
+import time
+import weakref
+from typing import Dict, List, Optional, Union
+
+import docker
+
+from integration_tester import errors
+
+# Label set on every container created by a driver, the owning process is
+# recorded in the labels prefixed with it.
+LABEL = "integration_tester"
+PID_LABEL = f"{LABEL}.pid"
+HOST_LABEL = f"{LABEL}.host"
+CREATED_LABEL = f"{LABEL}.created"
+
+_DRIVERS = weakref.WeakSet()
+_LOCK = threading.Lock()
+# The exit handler is registered from any thread, the signal handlers only
+# once a container is tracked from the main thread.
+_EXIT_INSTALLED = False
+_SIGNALS_INSTALLED = False
+
+
+def labels() -> Dict[str, str]:
+    """ Labels identifying a container created by the current process. """
+    return {
+        LABEL: "true",
+        PID_LABEL: str(os.getpid()),
+        HOST_LABEL: socket.gethostname(),
+        CREATED_LABEL: str(int(time.time())),
+    }
+
+
+def track(instance) -> None:
+    """ Close a driver on interpreter exit or termination if still open.
+
+    Only a weak reference to the driver is held.
+    """
+    with _LOCK:
+        _DRIVERS.add(instance)
+    install()
+
+
+def untrack(instance) -> None:
+    """ Stop tracking a driver, i.e. once it has been closed. """
+    with _LOCK:
+        _DRIVERS.discard(instance)
+
+
+def close_all() -> None:
+    """ Close every driver of the current process which is still open. """
+    with _LOCK:
+        instances = list(_DRIVERS)
+    for instance in instances:
+        try:
+            instance.close()
+        except Exception:  # pylint: disable=W0703
+            # Cleanup is best effort, one failure must not leave the other
+            # containers running.
+            pass
+
+
+def install() -> None:
+    """ Install the exit and signal handlers, once.
+
+    Signal handlers can only be installed from the main thread, from other
+    threads only the exit handler is installed and the signal handlers are
+    installed by the next call from the main thread. Previously installed
+    signal handlers are still called.
+    """
+    global _EXIT_INSTALLED, _SIGNALS_INSTALLED  # pylint: disable=W0603
+    main = threading.current_thread() is threading.main_thread()
+    with _LOCK:
+        register = not _EXIT_INSTALLED
+        _EXIT_INSTALLED = True
+        signals = main and not _SIGNALS_INSTALLED
+        if signals:
+            _SIGNALS_INSTALLED = True
+
+    if register:
+        atexit.register(close_all)
+    if not signals:
+        return
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(signum)
+        signal.signal(signum, _handler(previous))
+
+
+def _handler(previous):
+    """ Create a signal handler exiting through the exit handler.
+
+    The signal may interrupt code holding the locks of this module, of the
+    Docker clients or of a driver, so the drivers are not closed in the
+    handler itself. Without a previous handler the process exits by raising
+    `SystemExit`, which runs `close_all` from the exit handler once the
+    interrupted code has unwound. `SIGINT` raises `KeyboardInterrupt` through
+    the default handler of Python.
+    """
+
+    def handle(signum, frame):
+        if callable(previous):
+            previous(signum, frame)
+        elif previous == signal.SIG_DFL:
+            raise SystemExit(128 + signum)
+
+    return handle
+
+
+def reap(max_age: Optional[Union[float, int]] = None,
+         everything: bool = False,
+         client: Optional[docker.DockerClient] = None) -> List[str]:
+    """ Remove stale labelled containers.
+
+    A container is stale when the process which created it, on this host, is
+    no longer running. Containers from other hosts sharing the Docker service
+    are only removed once older than `max_age`.
+
+    Args:
+        max_age: Seconds after which any labelled container is stale.
+        everything: Remove every labelled container, stale or not.
+        client: Docker client to use. Defaults to the clients of the local
+                Docker service and of every endpoint of `backends`. Remote
+                endpoints which can not be reached are skipped.
+
+    Returns:
+        The IDs of the removed containers.
+    """
+    containers = [
+        container for container in _labelled(client)
+        if everything or _stale(container.labels, max_age)
+    ]
+    if not containers:
+        return []
+
+    with concurrent.futures.ThreadPoolExecutor(min(len(containers),
+                                                   16)) as executor:
+        removed = executor.map(_remove, containers)
+    return [
+        container.id for container, done in zip(containers, removed) if done
+    ]
+
+
+def _labelled(
+    client: Optional[docker.DockerClient]
+) -> List[docker.models.containers.Container]:
+    """ List the labelled containers of a client, or of every endpoint. """
+    # `backends` depends on this module through `monitor`.
+    from integration_tester import backends  # pylint: disable=C0415,R0401
+
+    if client is not None:
+        clients = [client]
+    else:
+        clients = [backends.LOCAL.client()]
+        scheduler = backends.SCHEDULER
+        for endpoint in scheduler.endpoints if scheduler is not None else []:
+            if endpoint.base_url is None:
+                continue
+            try:
+                clients.append(endpoint.client())
+            except errors.DockerNotAvailable:
+                continue
+
+    containers = []
+    for instance in clients:
+        containers += instance.containers.list(all=True,
+                                               filters={"label": LABEL})
+    return containers
+
+
+def _stale(container_labels: Dict[str, str],
+           max_age: Optional[Union[float, int]]) -> bool:
+    """ Check if the labels of a container mark it as stale. """
+    if max_age is not None:
+        created = int(container_labels.get(CREATED_LABEL, 0))
+        if time.time() - created > max_age:
+            return True
+
+    if container_labels.get(HOST_LABEL) != socket.gethostname():
+        return False
+    try:
+        pid = int(container_labels.get(PID_LABEL, ""))
+    except ValueError:
+        return False
+    return pid != os.getpid() and not running(pid)
+
+
+def running(pid: int) -> bool:
+    """ Check if a process is running on this host. """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # The process exists but belongs to another user.
+        pass
+    return True
+
+
+def _remove(container: docker.models.containers.Container) -> bool:
+    """ Force remove a container and its volumes.
+
+    Returns:
+        False if the container had already been removed.
+    """
+    try:
+        container.remove(v=True, force=True)
+    except docker.errors.NotFound:
+        return False
+    return True
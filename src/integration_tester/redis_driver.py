@@ -10,20 +10,23 @@ from integration_tester import redis_driver
 driver = redis_driver.RedisDriver()
 ```
 
-This module will raise a `OptionalModuleNotInstalledException` if the `redis`
-package has not been installed.
+The module can be imported without the `redis` package, readiness is probed
+over the wire protocol. Using `client` or `reset` will raise a
+`OptionalModuleNotInstalled` exception if it has not been installed.
 """
-from integration_tester import driver, errors
+import threading
+from typing import Iterable, Optional
+
+from integration_tester import (async_driver, driver, errors, instrumentation,
+                                probes, readiness)
 
 try:
     import redis
-except ModuleNotFoundError as error:
-    raise errors.OptionalModuleNotInstalled(
-        "To support the optional Redis Driver please install the redis"
-        " package.") from error
+except ModuleNotFoundError:
+    redis = None  # pylint: disable=C0103
 
 
-class RedisDriver(driver.Driver):
+class RedisDriver(driver.Driver):  # pylint: disable=R0902
     """ Redis Driver.
 
     This class extends the Docker driver to provide an interface for a Redis
@@ -42,20 +45,51 @@ class RedisDriver(driver.Driver):
     3. Reset the Redis instide the service to factory settings and not reset
        the container itself.
 
-    If ensuring the container is reset completely each iteration, you can delete
+    If ensuring the container is reset completely each iteration, you can close
     the existing container and start a new one.
     ``` python
     redis = RedisDriver()
-    del(redis)
+    redis.close()
     redis = RedisDriver()
     ```
     This will completely remove the container and its volume, then create a new
     container and volume.
+
+    The driver holds a single `redis.Redis` client backed by a connection pool
+    which is reused by `reset`. Tests can reuse it through `client` instead of
+    creating their own.
+
+    `exec_reset` flushes every database with `redis-cli` inside the container
+    instead, without the `redis` package.
+
+    Tests running in parallel can share a single container by each using their
+    own logical database. Only the database that was used is flushed when it
+    is released. Database `db`, the database of `client` and `url`, is never
+    handed out.
+    ``` python
+    redis = RedisDriver(databases=32)
+    db = redis.acquire_db()
+    # test code using `redis.Redis(db=db)`
+    redis.release_db(db)
+    ```
     """
-    def __init__(self,
-                 tag: str = "5.0.7",
-                 host: str = "127.0.0.1",
-                 port: str = 6379):
+    ready_backoff = readiness.Backoff(initial=0.01, factor=2, maximum=0.25)
+    ready_log_pattern = "Ready to accept connections"
+    seed_directory = "/seed"
+    reset_command = "redis-cli FLUSHALL ASYNC"
+    memory_preset = "256m"
+
+    def __init__(  # pylint: disable=R0913
+            self,
+            tag: str = "5.0.7",
+            host: str = "127.0.0.1",
+            port: Optional[int] = 6379,
+            *,
+            databases: int = 16,
+            db: int = 0,
+            fast: bool = False,
+            data_directory: Optional[str] = None,
+            **kwargs):
         """ Initialise the Redis Driver.
 
         This will configure and then start the Docker container.
@@ -64,42 +98,171 @@ class RedisDriver(driver.Driver):
             tag: Reference to the specific version of Docker Image to pull from
                  Docker Hub.
             host: Host address to bind the port.
-            port: The port to bind the container.
+            port: The port to bind the container. If `0` or `None` a free
+                  port is chosen by Docker and available in `port` once
+                  started.
+            databases: Number of logical databases configured in the service.
+            db: Logical database `client` and `url` are bound to, i.e. the
+                database leased to a pytest-xdist worker.
+            fast: Trade durability for speed. The data directory is mounted in
+                  memory and RDB snapshots and the append only file are
+                  disabled.
+            data_directory: Directory to keep the RDB file in instead of the
+                            `/data` volume of the image. Data outside of the
+                            volume is saved by `commit`.
+            kwargs: Additional arguments passed to `driver.Driver`, i.e.
+                    `container_id`.
 
         Container tags can be found on the
         [Docker Hub](https://hub.docker.com/_/redis).
         """
         self.host, self.port = host, port
+        self.databases = databases
+        self.db = db
+        self.fast = fast
+
+        # The database of `client` is not leased, `reset` and `release_db`
+        # would flush it under the feet of the driver.
+        self._free_dbs = set(range(databases)) - {db}
+        self._lock = threading.Lock()
+        self._client: Optional["redis.Redis"] = None
 
         ports = {6379: (self.host, self.port)}
-        super().__init__(f"redis:{tag}", ports)
+        command = ["redis-server", "--databases", str(databases)]
+        if fast:
+            command += ["--save", "", "--appendonly", "no"]
+            kwargs.setdefault("tmpfs", {"/data": driver.TMPFS_OPTIONS})
+
+        # Leave room for the memory used by the server itself, writes fail
+        # instead of the container being killed once the limit is reached.
+        memory = self._memory_limit(kwargs.get("mem_limit"))
+        if memory is not None:
+            command += ["--maxmemory", str(memory * 3 // 4)]
+
+        if data_directory is not None:
+            command += ["--dir", data_directory]
+            command = driver.owned_directory_command(command, data_directory,
+                                                     "redis")
+        super().__init__(f"redis:{tag}", ports, command=command, **kwargs)
+        self.port = self.ports[6379]
+
+    @property
+    def url(self) -> str:
+        """ Connection URL of database `db` of the Redis Service. """
+        return f"redis://{self.host}:{self.port}/{self.db}"
+
+    @property
+    def client(self) -> "redis.Redis":
+        """ Client connected to database `db` of the Redis Service.
+
+        The client is created on first use and kept for the lifetime of the
+        driver. Connections are pooled and reconnect automatically.
+
+        Exceptions:
+            errors.OptionalModuleNotInstalled: Raised if the `redis` package
+                                               has not been installed.
+        """
+        if redis is None:
+            raise errors.OptionalModuleNotInstalled(
+                "To support the optional Redis Driver please install the redis"
+                " package.")
+        if self._client is None:
+            pool = redis.ConnectionPool(host=self.host,
+                                        port=self.port,
+                                        db=self.db)
+            self._client = redis.Redis(connection_pool=pool)
+        return self._client
 
     def ready(self) -> bool:
         """ Confirm if the Redis Service is running.
 
         Confirm if the Redis Service within the container is running and ready
-        to accept connections. To achieve this, a `redis.Redis` object is
-        created and the the server is polled using the `.client_list` method.
-        This method serves no information purpose other than starting an active
-        connection to the service.
+        to accept connections. To achieve this, `PING` is sent over a raw
+        socket with `probes.redis_ping`, so the `redis` package is not
+        required.
 
         Returns:
             This function returns True if the Redis Service is active.
         """
-        try:
-            instance = redis.Redis(self.host, self.port, db=0)
-            instance.client_list()
-            return True
-        except redis.ConnectionError:
-            return False
-
-    def reset(self):
+        return probes.redis_ping(self.host, self.port)
+
+    @instrumentation.timed("reset")
+    def reset(self, dbs: Optional[Iterable[int]] = None) -> None:
         """ Reset the database to factory new.
 
         This method soft resets the Redis Service within the container. This
         allows for a clean testing environment without the slow reset of
         Docker. However, this is not a completely isolated process. If complete
         isolation is required, please see Class doc on how to reset completely.
+
+        Keys are released in the background by the service (`ASYNC`), they are
+        no longer visible once this method returns.
+
+        Args:
+            dbs: Logical databases to flush. Every database is flushed if not
+                 provided.
         """
-        instance = redis.Redis(self.host, self.port)
-        instance.flushall()
+        if dbs is None:
+            self.client.flushall(asynchronous=True)
+            return
+
+        # Flush every database in a single round trip. The connection is
+        # returned to database `db` so it can be reused by the pool.
+        pipeline = self.client.pipeline(transaction=False)
+        for db in dbs:
+            pipeline.execute_command("SELECT", db)
+            pipeline.execute_command("FLUSHDB", "ASYNC")
+        pipeline.execute_command("SELECT", self.db)
+        pipeline.execute()
+
+    def acquire_db(self) -> int:
+        """ Reserve a logical database for exclusive use.
+
+        Returns:
+            The index of the reserved database.
+
+        Exceptions:
+            errors.DatabaseUnavailable: Raised if every database has already
+                                        been reserved.
+        """
+        with self._lock:
+            if not self._free_dbs:
+                raise errors.DatabaseUnavailable(
+                    f"All {self.databases} Redis databases are in use.")
+            db = min(self._free_dbs)
+            self._free_dbs.remove(db)
+        return db
+
+    def release_db(self, db: int) -> None:
+        """ Flush a reserved logical database and make it available again.
+
+        Args:
+            db: Index of a database returned by `acquire_db`.
+        """
+        self.reset([db])
+        with self._lock:
+            self._free_dbs.add(db)
+
+    def _flush(self) -> None:
+        """ Save every database to the RDB file of the data directory. """
+        self.client.save()
+
+    def _close_clients(self) -> None:
+        """ Close the pooled connections to the Redis Service. """
+        if self._client is not None:
+            self._client.connection_pool.disconnect()
+            self._client = None
+
+
+class AsyncRedisDriver(async_driver.AsyncDriver):
+    """ Asynchronous Redis Driver.
+
+    This class wraps `RedisDriver` for use with `asyncio`. It accepts the same
+    arguments as `RedisDriver`.
+    ``` python
+    async with AsyncRedisDriver() as redis:
+        # test code
+        await redis.reset()
+    ```
+    """
+    driver_class = RedisDriver
@@ -0,0 +1,223 @@
+""" Resources Module.
+
+This module sizes the CPU and memory given to containers. Limiting each
+container stops services started in parallel, i.e. by test shards on a single
+machine, from starving each other of CPU and memory.
+
+Limits are passed to any driver.
+``` python
+from integration_tester import mongo_driver, resources
+
+mongo = mongo_driver.MongoDBDriver(mem_limit="1g", cpuset_cpus="0,1")
+```
+
+`AUTO` picks the limits for the service. The memory limit is taken from the
+`memory_preset` of the driver, and the service is configured to stay within it
+(i.e. the WiredTiger cache size of MongoDB). CPUs are handed out by a
+`CpuAllocator` of the Docker service, so containers running at the same time
+are pinned to disjoint CPU sets for as long as there are enough CPUs. The
+allocations are shared by every process of the machine, so parallel test
+workers do not start from the same CPUs.
+``` python
+mongo = mongo_driver.MongoDBDriver(mem_limit=resources.AUTO,
+                                   cpuset_cpus=resources.AUTO)
+```
+"""
+import contextlib
+import hashlib
+import json
+import os
+import socket
+import tempfile
+import threading
+import weakref
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from integration_tester import backends, reaper
+
+# File locks are not available on every platform, without them allocations
+# are only shared within the process.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # pylint: disable=C0103
+
+# Value of `mem_limit` and `cpuset_cpus` choosing the limit automatically.
+AUTO = "auto"
+
+# Memory size in bytes or in the Docker format, i.e. `512m`.
+MemorySize = Union[int, str]
+
+# Label recording the CPU set of a container, see `foreign_cpusets`.
+CPUSET_LABEL = f"{reaper.LABEL}.cpuset"
+
+# Directory of the claims files sharing CPU sets between processes.
+CLAIMS_DIRECTORY = tempfile.gettempdir()
+
+_UNITS = {"b": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
+
+
+def memory_bytes(value: Optional[MemorySize]) -> Optional[int]:
+    """ Convert a Docker memory size, i.e. `512m`, to bytes.
+
+    Returns:
+        The number of bytes, or `None` if `value` is `None`.
+
+    Exceptions:
+        ValueError: Raised if `value` is not a valid memory size.
+    """
+    if value is None or isinstance(value, int):
+        return value
+    text = value.strip().lower()
+    if text and text[-1] in _UNITS:
+        return int(float(text[:-1]) * _UNITS[text[-1]])
+    return int(text)
+
+
+class CpuAllocator:
+    """ Allocator of CPU sets to concurrently running containers.
+
+    Each allocation takes the CPUs used by the fewest running containers, so
+    CPU sets are disjoint until every CPU is in use, and shared evenly after.
+
+    With a `path`, the allocations are claims in a JSON file guarded by an
+    exclusive file lock, shared by every process of the machine using the
+    same Docker service, i.e. pytest-xdist workers and shards running side by
+    side. Claims of processes which are no longer running are dropped. All
+    methods are thread safe.
+
+    Attr:
+        cpus: Number of CPUs of the Docker service machine.
+        path: Claims file shared between processes, `None` to keep the
+              allocations within the process.
+    """
+    def __init__(self, cpus: int, path: Optional[str] = None):
+        """ Initialise the allocator.
+
+        Args:
+            cpus: Number of CPUs of the Docker service machine.
+            path: Claims file shared between processes. Ignored where file
+                  locks are not available.
+        """
+        self.cpus = max(cpus, 1)
+        self.path = path if fcntl is not None else None
+        self._local: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def usage(self) -> List[int]:
+        """ Number of allocations of each CPU, across every process. """
+        with self._claims() as claims:
+            return self._usage(claims.values())
+
+    def acquire(self, count: int = 1, busy: Iterable[str] = ()) -> str:
+        """ Allocate a CPU set.
+
+        Args:
+            count: Number of CPUs in the set, limited to the number of CPUs
+                   of the machine.
+            busy: CPU sets used by containers which are not claimed, i.e.
+                  created from another machine, see `foreign_cpusets`.
+
+        Returns:
+            The CPU set in the Docker `cpuset_cpus` format, i.e. `0,1`.
+        """
+        count = min(max(count, 1), self.cpus)
+        with self._claims() as claims:
+            usage = self._usage(list(claims.values()) + [list(busy)])
+            chosen = sorted(
+                sorted(range(self.cpus), key=lambda cpu: usage[cpu])[:count])
+            cpuset = ",".join(str(cpu) for cpu in chosen)
+            claims.setdefault(str(os.getpid()), []).append(cpuset)
+        return cpuset
+
+    def release(self, cpuset: str) -> None:
+        """ Return a CPU set allocated by `acquire`. """
+        with self._claims() as claims:
+            pid = str(os.getpid())
+            owned = claims.get(pid, [])
+            if cpuset in owned:
+                owned.remove(cpuset)
+            if not owned:
+                claims.pop(pid, None)
+
+    def _usage(self, claims: Iterable[List[str]]) -> List[int]:
+        """ Count the allocations of each CPU. """
+        usage = [0] * self.cpus
+        for cpusets in claims:
+            for cpuset in cpusets:
+                for cpu in cpuset.split(","):
+                    if cpu.isdigit() and int(cpu) < self.cpus:
+                        usage[int(cpu)] += 1
+        return usage
+
+    @contextlib.contextmanager
+    def _claims(self) -> Iterator[Dict[str, List[str]]]:
+        """ Lock and yield the CPU sets claimed by each process ID.
+
+        Changes made to the claims are written back when the block exits.
+        """
+        with self._lock:
+            if self.path is None:
+                yield self._local
+                return
+
+            with open(f"{self.path}.lock", "a+", encoding="utf-8") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    try:
+                        with open(self.path, encoding="utf-8") as file:
+                            claims = json.load(file)
+                    except (OSError, ValueError):
+                        claims = {}
+                    claims = {
+                        pid: cpusets
+                        for pid, cpusets in claims.items()
+                        if int(pid) == os.getpid() or reaper.running(int(pid))
+                    }
+
+                    yield claims
+
+                    with open(self.path, "w", encoding="utf-8") as file:
+                        json.dump(claims, file)
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+_ALLOCATORS: Dict[backends.Endpoint,
+                  CpuAllocator] = weakref.WeakKeyDictionary()
+_ALLOCATORS_LOCK = threading.Lock()
+
+
+def allocator(endpoint: backends.Endpoint) -> CpuAllocator:
+    """ Retrieve the CPU allocator of a Docker service.
+
+    The number of CPUs is read from the Docker service on first use, which
+    may differ from the machine running the tests, i.e. with a remote or a
+    virtualised Docker service. Every process of the machine using the same
+    Docker service shares the claims file of the allocator.
+    """
+    with _ALLOCATORS_LOCK:
+        if endpoint not in _ALLOCATORS:
+            info = endpoint.client().info()
+            daemon = info.get("ID") or endpoint.base_url or "local"
+            name = hashlib.sha256(daemon.encode("utf-8")).hexdigest()[:16]
+            path = os.path.join(CLAIMS_DIRECTORY,
+                                f"integration_tester_cpus_{name}.json")
+            _ALLOCATORS[endpoint] = CpuAllocator(info.get("NCPU", 1), path)
+        return _ALLOCATORS[endpoint]
+
+
+def foreign_cpusets(endpoint: backends.Endpoint) -> List[str]:
+    """ CPU sets of running containers created from other machines.
+
+    Processes of other machines sharing the Docker service can not share the
+    claims file, their containers are found through `CPUSET_LABEL`.
+    """
+    hostname = socket.gethostname()
+    containers = endpoint.client().api.containers(
+        filters={"label": CPUSET_LABEL})
+    return [
+        container["Labels"][CPUSET_LABEL] for container in containers
+        if container["Labels"].get(reaper.HOST_LABEL) != hostname
+    ]
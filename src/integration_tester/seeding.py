@@ -0,0 +1,178 @@
+""" Seeding Module.
+
+This module starts drivers from images which already hold a fixture dataset.
+The dataset is loaded by a seed function once, the container is committed to a
+local image, and every later driver is started straight from that image
+instead of loading the dataset again.
+
+Typical usage is done through the `start` function.
+``` python
+import json
+
+from integration_tester import mongo_driver, seeding
+
+def load_users(mongo):
+    with open("fixtures/users.json") as users:
+        mongo.client.test.users.insert_many(json.load(users))
+
+mongo = seeding.start(mongo_driver.MongoDBDriver, load_users,
+                      inputs=["fixtures/users.json"], tag="4.4")
+```
+
+Images are tagged with a hash of the driver Class, the arguments of the
+driver, the source of the seed function and the contents of the `inputs`.
+Changing any of them, i.e. the seed script, a fixture file or the base image
+tag, starts from a new image which is seeded again.
+
+Only drivers defining a `seed_directory` are supported, as data kept in the
+volumes declared by an image is not committed.
+
+`reset` still returns a driver to factory settings, dropping the dataset. Take
+a snapshot of the seeded state where the driver supports it, i.e.
+`MongoDBDriver.snapshot`, so `reset` restores the dataset instead.
+"""
+import functools
+import hashlib
+import inspect
+import os
+from typing import Any, Callable, Iterable, Type, Union
+
+import docker
+
+from integration_tester import backends, driver
+
+# Repository of the committed images, the driver Class name is appended.
+REPOSITORY = "integration_tester_seed"
+
+# Driver arguments which only affect how a container is run, not its data.
+RUNTIME_ARGUMENTS = {
+    "host", "port", "management_port", "remove_image", "stop_timeout",
+    "endpoint", "mem_limit", "cpuset_cpus", "nano_cpus", "shm_size"
+}
+
+
+def key(driver_class: Type[driver.Driver],
+        seed: Callable[[driver.Driver], None],
+        *args,
+        inputs: Iterable[Union[str, bytes]] = (),
+        **kwargs) -> str:
+    """ Hash the inputs of a seeded image.
+
+    Args:
+        driver_class: Driver Class to create.
+        seed: Function loading the dataset into a ready driver.
+        args: Positional arguments used to create the driver.
+        inputs: Additional inputs of the dataset. Paths of files or
+                directories are hashed by content, other strings and bytes
+                are hashed as is.
+        kwargs: Keyword arguments used to create the driver. Arguments of
+                `RUNTIME_ARGUMENTS`, i.e. `port`, are not part of the key.
+
+    Returns:
+        The hexadecimal SHA-256 digest of the inputs.
+    """
+    digest = hashlib.sha256()
+
+    # Default arguments are included, so a new default tag changes the key.
+    bound = inspect.signature(driver_class).bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = dict(bound.arguments)
+    arguments.update(arguments.pop("kwargs", {}))
+    identity = sorted((name, value) for name, value in arguments.items()
+                      if name not in RUNTIME_ARGUMENTS)
+    digest.update(f"{driver_class.__module__}.{driver_class.__qualname__}"
+                  f"{identity!r}".encode("utf-8"))
+
+    try:
+        digest.update(inspect.getsource(seed).encode("utf-8"))
+    except (OSError, TypeError):
+        digest.update(
+            getattr(seed, "__qualname__", repr(seed)).encode("utf-8"))
+
+    for value in inputs:
+        if isinstance(value, bytes):
+            digest.update(value)
+        elif os.path.exists(value):
+            _hash_path(digest, value)
+        else:
+            digest.update(value.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def reference(driver_class: Type[driver.Driver], digest: str) -> str:
+    """ Image reference of a seeded image. """
+    return f"{REPOSITORY}/{driver_class.__name__.lower()}:{digest[:16]}"
+
+
+def start(driver_class: Type[driver.Driver],
+          seed: Callable[[driver.Driver], None],
+          *args,
+          inputs: Iterable[Union[str, bytes]] = (),
+          timeout: int = 60,
+          **kwargs) -> driver.Driver:
+    """ Start a driver from a seeded image, seeding it first if needed.
+
+    If the image does not exist yet, a driver is started from the base image,
+    `seed` is called with it and the container is committed. The seeded driver
+    is returned without being restarted.
+
+    Args:
+        driver_class: Driver Class to create.
+        seed: Function loading the dataset into a ready driver.
+        args: Positional arguments used to create the driver.
+        inputs: Additional inputs of the dataset, see `key`.
+        timeout: Timeout passed to `wait_until_ready`.
+        kwargs: Keyword arguments used to create the driver.
+
+    Returns:
+        A ready driver holding the dataset.
+
+    Exceptions:
+        TypeError: Raised if the driver Class does not define a
+                   `seed_directory`.
+    """
+    if driver_class.seed_directory is None:
+        raise TypeError(
+            f"{driver_class.__name__} does not support seeded images, it does"
+            " not define a `seed_directory`.")
+
+    image = reference(driver_class,
+                      key(driver_class, seed, *args, inputs=inputs, **kwargs))
+    kwargs["data_directory"] = driver_class.seed_directory
+    # The seeded image only exists on the Docker service it was committed on.
+    kwargs.setdefault("endpoint", backends.LOCAL)
+
+    try:
+        kwargs["endpoint"].client().images.get(image)
+    except docker.errors.ImageNotFound:
+        pass
+    else:
+        instance = driver_class(*args, image=image, **kwargs)
+        instance.wait_or_close(timeout)
+        return instance
+
+    instance = driver_class(*args, **kwargs)
+    instance.wait_or_close(timeout)
+    try:
+        seed(instance)
+        instance.commit(image)
+    except BaseException:
+        instance.close()
+        raise
+    return instance
+
+
+def _hash_path(digest: Any, path: str) -> None:
+    """ Hash the relative paths and contents of a file or directory. """
+    if os.path.isfile(path):
+        paths = [path]
+    else:
+        paths = sorted(
+            os.path.join(directory, name)
+            for directory, _, names in os.walk(path) for name in names)
+
+    for file_path in paths:
+        digest.update(os.path.relpath(file_path, path).encode("utf-8"))
+        with open(file_path, "rb") as contents:
+            for chunk in iter(functools.partial(contents.read, 65536), b""):
+                digest.update(chunk)
@@ -0,0 +1,129 @@
+""" Shell Module.
+
+This module keeps a shell running inside a container, so commands are sent
+through a single Docker exec instance instead of creating one per command.
+Creating an exec instance takes three requests to Docker (create, start and
+inspect), a command run by a `Shell` takes one write and one read on a socket
+which stays open.
+
+Typical usage is done through the `shell` method of the drivers.
+``` python
+from integration_tester import redis_driver
+
+redis = redis_driver.RedisDriver()
+exit_code, output = redis.shell("redis-cli DBSIZE")
+```
+
+Commands are run one at a time, each in a subshell so `exit` or `cd` do not
+affect the next one, without standard input and with standard error merged
+into the output.
+"""
+import secrets
+import struct
+import threading
+from typing import Optional, Tuple
+
+import docker
+
+from integration_tester import errors
+
+# Header of each frame of the multiplexed output stream of Docker.
+_FRAME_HEADER = struct.Struct(">BxxxL")
+
+
+class Shell:
+    """ Shell running inside a container through the Docker exec API.
+
+    The shell is started on initialisation and kept until `close`. Every
+    command is followed by a marker line holding its exit code, and the output
+    is read up to the marker. All methods are thread safe.
+
+    Attr:
+        closed: True once the shell has been closed or has exited.
+    """
+    def __init__(self,
+                 api: docker.APIClient,
+                 container_id: str,
+                 shell: str = "sh"):
+        """ Start the shell.
+
+        Args:
+            api: Low level client of the Docker service of the container.
+            container_id: ID of the running container.
+            shell: Shell to run, it must support POSIX `sh` syntax.
+        """
+        exec_id = api.exec_create(container_id, [shell], stdin=True)["Id"]
+        self._response = api.exec_start(exec_id, socket=True)
+        self._socket = getattr(self._response, "_sock", self._response)
+        self._marker = f"integration_tester_{secrets.token_hex(8)}"
+        self._pending = b""
+        self._output = b""
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def run(self,
+            command: str,
+            timeout: Optional[float] = None) -> Tuple[int, bytes]:
+        """ Run a command in the shell.
+
+        Args:
+            command: Command line, i.e. `redis-cli FLUSHALL ASYNC`.
+            timeout: Seconds to wait for the command, `None` to wait forever.
+                     The shell is closed if the command takes longer.
+
+        Returns:
+            The exit code of the command and its combined output.
+
+        Exceptions:
+            errors.ShellExited: Raised if the shell has exited or is closed.
+            socket.timeout: Raised if the command takes longer than
+                            `timeout`.
+        """
+        script = (f"( {command}\n) </dev/null 2>&1;"
+                  f" printf '\\n{self._marker} %d\\n' \"$?\"\n")
+        with self._lock:
+            if self.closed:
+                raise errors.ShellExited()
+            try:
+                self._socket.settimeout(timeout)
+                self._socket.sendall(script.encode("utf-8"))
+                return self._read_result()
+            except (OSError, errors.ShellExited):
+                self._close()
+                raise
+
+    def close(self) -> None:
+        """ Close the shell, ending it inside the container. """
+        with self._lock:
+            self._close()
+
+    def _close(self) -> None:
+        """ Close the socket, the shell exits at the end of its input. """
+        if not self.closed:
+            self.closed = True
+            self._socket.close()
+            self._response.close()
+
+    def _read_result(self) -> Tuple[int, bytes]:
+        """ Read the output of a command up to its marker line. """
+        marker = f"\n{self._marker} ".encode("utf-8")
+        while True:
+            start = self._output.find(marker)
+            end = self._output.find(b"\n", start + len(marker))
+            if start != -1 and end != -1:
+                output = self._output[:start]
+                exit_code = int(self._output[start + len(marker):end])
+                self._output = self._output[end + 1:]
+                return exit_code, output
+
+            data = self._socket.recv(65536)
+            if not data:
+                raise errors.ShellExited()
+            self._pending += data
+            header = _FRAME_HEADER.size
+            while len(self._pending) >= header:
+                _, size = _FRAME_HEADER.unpack_from(self._pending)
+                if len(self._pending) < header + size:
+                    break
+                self._output += self._pending[header:header + size]
+                self._pending = self._pending[header + size:]
@@ -0,0 +1,233 @@
+""" Stack Module.
+
+This module starts several drivers together. Drivers without dependencies on
+each other are created and waited on concurrently, so the startup time of a
+stack is close to that of its slowest service instead of the sum of all
+services.
+
+Typical usage is done through the `Stack` Class.
+``` python
+from integration_tester import mongo_driver, redis_driver, stack
+
+services = stack.Stack()
+services.add("mongo", mongo_driver.MongoDBDriver)
+services.add("redis", redis_driver.RedisDriver, tag="5.0.7")
+services.add("worker", SomeWorkerDriver, depends_on=["mongo", "redis"])
+
+with services:
+    services["mongo"].reset()
+```
+
+Teardown is fastest when containers are killed instead of stopped gracefully
+and removed in the background, once the test data is no longer needed.
+``` python
+services = stack.Stack(wait_on_stop=False)
+services.add("mongo", mongo_driver.MongoDBDriver, stop_timeout=0)
+```
+"""
+import concurrent.futures
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Type
+
+from integration_tester import driver, errors, reaper
+
+
+class Service(NamedTuple):
+    """ Declaration of a single service within a stack.
+
+    Attr:
+        driver_class: Driver Class used to create the service.
+        args: Positional arguments used to create the driver.
+        kwargs: Keyword arguments used to create the driver.
+        depends_on: Names of the services which must be ready first.
+    """
+    driver_class: Type[driver.Driver]
+    args: Tuple
+    kwargs: Dict
+    depends_on: Tuple[str, ...]
+
+
+class Stack:
+    """ Group of drivers started and stopped together.
+
+    Services are started in dependency order. A service is only created once
+    every service it depends on is ready, all other services are created and
+    waited on in parallel using a thread pool.
+    """
+    def __init__(self,
+                 max_workers: Optional[int] = None,
+                 wait_on_stop: bool = True):
+        """ Initialise an empty stack.
+
+        Args:
+            max_workers: Maximum number of services started at the same time.
+                         Defaults to the number of services.
+            wait_on_stop: Block until every container has been removed when
+                          the stack is stopped. If False the removals are left
+                          to background threads (see `Driver.close`).
+        """
+        self.max_workers = max_workers
+        self.wait_on_stop = wait_on_stop
+        self.services: Dict[str, Service] = {}
+        self.drivers: Dict[str, driver.Driver] = {}
+
+    def add(self,
+            name: str,
+            driver_class: Type[driver.Driver],
+            *args,
+            depends_on: Iterable[str] = (),
+            **kwargs) -> None:
+        """ Declare a service.
+
+        Args:
+            name: Unique name of the service within the stack.
+            driver_class: Driver Class used to create the service.
+            args: Positional arguments used to create the driver.
+            depends_on: Names of services which must be ready before this
+                        service is started.
+            kwargs: Keyword arguments used to create the driver.
+        """
+        if name in self.services:
+            raise ValueError(f"Service '{name}' has already been added.")
+        self.services[name] = Service(driver_class, args, kwargs,
+                                      tuple(depends_on))
+
+    def order(self) -> List[str]:
+        """ Resolve the start order of the services.
+
+        Returns:
+            Service names ordered so each service follows its dependencies.
+
+        Exceptions:
+            errors.DependencyError: Raised if a dependency is unknown or the
+                                    dependencies are circular.
+        """
+        for name, service in self.services.items():
+            for dependency in service.depends_on:
+                if dependency not in self.services:
+                    raise errors.DependencyError(
+                        f"Service '{name}' depends on unknown service"
+                        f" '{dependency}'.")
+
+        ordered: List[str] = []
+        remaining = dict(self.services)
+        while remaining:
+            available = [
+                name for name, service in remaining.items() if all(
+                    dependency in ordered for dependency in service.depends_on)
+            ]
+            if not available:
+                raise errors.DependencyError(
+                    "Circular dependency between services:"
+                    f" {', '.join(sorted(remaining))}.")
+            for name in available:
+                ordered.append(name)
+                del remaining[name]
+        return ordered
+
+    def start(self, timeout: int = 60) -> None:
+        """ Start every service and wait until they are ready.
+
+        If any service fails to start, the services which did start are
+        stopped and the error is raised.
+
+        Args:
+            timeout: Timeout passed to `wait_until_ready` of each service.
+        """
+        pending = {name: self.services[name] for name in self.order()}
+        # The services are created in threads, the signal handlers can only
+        # be installed from the main thread.
+        reaper.install()
+        max_workers = self.max_workers or max(len(pending), 1)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            running = {}
+            failure = None
+            while pending or running:
+                if failure is None:
+                    for name, service in list(pending.items()):
+                        if all(dependency in self.drivers
+                               for dependency in service.depends_on):
+                            del pending[name]
+                            future = executor.submit(self._start_service,
+                                                     service, timeout)
+                            running[future] = name
+
+                if not running:
+                    break
+
+                done, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.drivers[name] = future.result()
+                    except Exception as error:  # pylint: disable=W0703
+                        if failure is None:
+                            failure = error
+
+        if failure is not None:
+            self.stop()
+            raise failure
+
+    def stop(self, wait: Optional[bool] = None) -> None:
+        """ Stop every service concurrently.
+
+        Closing the driver stops and removes its container.
+
+        Args:
+            wait: Block until every container has been removed. Defaults to
+                  `wait_on_stop`.
+        """
+        if wait is None:
+            wait = self.wait_on_stop
+        instances = [
+            self.drivers.pop(name) for name in reversed(list(self.drivers))
+        ]
+        if not instances:
+            return
+        if not wait:
+            for instance in instances:
+                instance.close(wait=False)
+            return
+
+        with concurrent.futures.ThreadPoolExecutor(len(instances)) as executor:
+            futures = [
+                executor.submit(instance.close) for instance in instances
+            ]
+        for future in futures:
+            future.result()
+
+    def reset(self) -> None:
+        """ Reset every service concurrently. """
+        if not self.drivers:
+            return
+        workers = len(self.drivers)
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            futures = [
+                executor.submit(instance.reset)
+                for instance in self.drivers.values()
+            ]
+        for future in futures:
+            future.result()
+
+    def __getitem__(self, name: str) -> driver.Driver:
+        """ Retrieve the driver of a started service. """
+        return self.drivers[name]
+
+    def __enter__(self) -> "Stack":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    @staticmethod
+    def _start_service(service: Service, timeout: int) -> driver.Driver:
+        """ Create a service driver and wait until it is ready.
+
+        A driver which fails to become ready is closed, `start` only stops
+        the services it has been handed.
+        """
+        instance = service.driver_class(*service.args, **service.kwargs)
+        instance.wait_or_close(timeout)
+        return instance
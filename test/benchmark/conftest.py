@@ -0,0 +1,11 @@
+import docker
+import pytest
+
+
+@pytest.fixture
+def docker_available():
+    """ Skip the benchmark unless a real Docker daemon is reachable. """
+    try:
+        docker.from_env().ping()
+    except Exception:
+        pytest.skip("Docker is not available.")
@@ -0,0 +1,90 @@
+""" Benchmarks of the driver lifecycle.
+
+Run with `tox -e bench`, which saves every run under `.benchmarks` so a commit
+can be compared to earlier ones with `--benchmark-compare`.
+
+Start, `wait_until_ready`, warm reuse, teardown and commands run in containers
+against the fake Docker Engine of `fake_docker`, measuring the overhead of the
+drivers alone. `reset`, over the network or with `exec_reset` from inside the
+container, needs the real services and is skipped when Docker is not
+available.
+"""
+import pytest
+
+from integration_tester import (driver, mongo_driver, pool, rabbitmq_driver,
+                                redis_driver)
+
+pytest.importorskip("pytest_benchmark")
+
+DRIVERS = [
+    pytest.param(lambda: driver.Driver("ubuntu:latest"), id="driver"),
+    pytest.param(lambda: mongo_driver.MongoDBDriver(port=0), id="mongo"),
+    pytest.param(lambda: redis_driver.RedisDriver(port=0), id="redis"),
+    pytest.param(lambda: rabbitmq_driver.RabbitMQDriver(port=0),
+                 id="rabbitmq"),
+]
+
+
+@pytest.mark.parametrize("create", DRIVERS)
+def test_cold_start(benchmark, fake_docker, create):
+    """ Create and start a container, including the image lookups. """
+    instances = []
+    benchmark(lambda: instances.append(create()))
+    for instance in instances:
+        instance.close()
+
+
+@pytest.mark.parametrize("create", DRIVERS)
+def test_wait_until_ready(benchmark, fake_docker, create):
+    """ Wait for a container which is already ready. """
+    instance = create()
+    benchmark(instance.wait_until_ready, timeout=10)
+    instance.close()
+
+
+@pytest.mark.parametrize("create", DRIVERS)
+def test_teardown(benchmark, fake_docker, create):
+    """ Stop and remove a container. """
+    def setup():
+        return (create(), ), {}
+
+    benchmark.pedantic(lambda instance: instance.close(),
+                       setup=setup,
+                       rounds=20)
+
+
+def test_warm_reuse(benchmark, fake_docker):
+    """ Acquire and release an idle driver of a pool. """
+    containers = pool.ContainerPool()
+    containers.release(containers.acquire(driver.Driver, "ubuntu:latest"))
+
+    def reuse():
+        containers.release(containers.acquire(driver.Driver, "ubuntu:latest"))
+
+    benchmark(reuse)
+    containers.clear()
+
+
+@pytest.mark.parametrize("method", ["reset", "exec_reset"])
+@pytest.mark.parametrize("driver_class", [
+    mongo_driver.MongoDBDriver, redis_driver.RedisDriver,
+    rabbitmq_driver.RabbitMQDriver
+])
+def test_reset(benchmark, docker_available, driver_class, method):
+    """ Reset a running service over the network or from inside it. """
+    benchmark.group = f"reset {driver_class.__name__}"
+    instance = driver_class(port=0, stop_timeout=0)
+    instance.wait_until_ready()
+    benchmark(getattr(instance, method))
+    instance.close()
+
+
+@pytest.mark.parametrize("method", ["execute", "shell"])
+def test_exec(benchmark, fake_docker, method):
+    """ Run a command in a container, with a new or the kept exec instance.
+    """
+    benchmark.group = "exec"
+    instance = driver.Driver("ubuntu:latest")
+    command = ["true"] if method == "execute" else "true"
+    benchmark(getattr(instance, method), command)
+    instance.close()
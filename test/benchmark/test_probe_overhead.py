@@ -0,0 +1,37 @@
+""" Benchmarks of the readiness probes.
+
+Each probe is run against a local server answering immediately with the reply
+of a ready service, measuring the cost of a probe once the service is up.
+"""
+import struct
+
+import pytest
+
+from integration_tester import probes
+
+pytest.importorskip("pytest_benchmark")
+
+
+def mongodb_reply() -> bytes:
+    """ Build the `OP_REPLY` of a ready service to the `isMaster` request. """
+    elements = b"\x08ismaster\x00\x01" + b"\x01ok\x00" + struct.pack("<d", 1)
+    document = struct.pack("<i", len(elements) + 5) + elements + b"\x00"
+    body = struct.pack("<iqii", 8, 0, 0, 1) + document
+    return struct.pack("<iiii", 16 + len(body), 7, 1, 1) + body
+
+
+PROBES = [
+    pytest.param(probes.tcp_connect, b"", id="tcp"),
+    pytest.param(probes.redis_ping, b"+PONG\r\n", id="redis"),
+    pytest.param(probes.mongodb_hello, mongodb_reply(), id="mongodb"),
+    pytest.param(probes.amqp_handshake,
+                 struct.pack(">BHIHHBB", 1, 0, 6, 10, 10, 0, 9) + b"\xce",
+                 id="amqp"),
+]
+
+
+@pytest.mark.parametrize("probe, reply", PROBES)
+def test_probe(benchmark, reply_server, probe, reply):
+    """ Probe a service which is ready. """
+    port = reply_server(reply)
+    assert benchmark(probe, "127.0.0.1", port)
@@ -0,0 +1,71 @@
+""" Benchmarks of the reset strategies of the drivers.
+
+Each reset runs against a real service and is skipped when Docker is not
+available. The rounds of a group are comparable with each other, i.e. a
+snapshot restore against dropping every database for the same number of
+collections.
+"""
+import pytest
+
+from integration_tester import mongo_driver, rabbitmq_driver
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.mark.parametrize("snapshot", [False, True],
+                         ids=["drop", "snapshot"])
+@pytest.mark.parametrize("collections", [10, 100, 1000])
+def test_mongo_reset(benchmark, docker_available, collections, snapshot):
+    """ Reset a database where a test changed a single collection.
+
+    Each collection holds a document and a secondary index. Without a
+    snapshot every collection is dropped, and has to be created again before
+    the next round.
+    """
+    benchmark.group = f"mongo reset {collections} collections"
+    instance = mongo_driver.MongoDBDriver(port=0, stop_timeout=0)
+    instance.wait_until_ready()
+    db = instance.client.test
+
+    def seed():
+        for index in range(collections):
+            db[f"collection_{index}"].insert_one({"index": index})
+            db[f"collection_{index}"].create_index("index")
+        return (), {}
+
+    def change():
+        db.collection_0.insert_one({"index": -1})
+        return (), {}
+
+    if snapshot:
+        seed()
+        instance.snapshot()
+    benchmark.pedantic(instance.reset,
+                       setup=change if snapshot else seed,
+                       rounds=10)
+    instance.close()
+
+
+@pytest.mark.parametrize("tag", ["3.8-management", "3.8"])
+def test_rabbitmq_reset(benchmark, docker_available, tag):
+    """ Reset a vhost where a test declared a queue bound to an exchange.
+
+    Queues and exchanges are discovered through the management API for
+    `-management` tags and with `rabbitmqctl` otherwise.
+    """
+    benchmark.group = "rabbitmq reset"
+    instance = rabbitmq_driver.RabbitMQDriver(tag=tag,
+                                              port=0,
+                                              stop_timeout=0)
+    instance.wait_until_ready()
+
+    def declare():
+        channel = instance.client.channel()
+        channel.exchange_declare("test_exchange")
+        channel.queue_declare("test_queue")
+        channel.queue_bind("test_queue", "test_exchange")
+        channel.close()
+        return (), {"discover": True}
+
+    benchmark.pedantic(instance.reset, setup=declare, rounds=10)
+    instance.close()
@@ -0,0 +1,63 @@
+import socket
+import threading
+import weakref
+
+import pytest
+
+from fake_docker import FakeDocker
+from integration_tester import docker_client, images, monitor, resources
+
+FAKE_IMAGES = ("ubuntu:latest", "mongo:3.4", "redis:5.0.7",
+               "rabbitmq:latest")
+
+
+@pytest.fixture
+def fake_docker(monkeypatch, tmp_path):
+    """ Point the drivers at an in-process fake of the Docker Engine API. """
+    monkeypatch.setattr(resources, "CLAIMS_DIRECTORY", str(tmp_path))
+    monkeypatch.setattr(resources, "_ALLOCATORS", weakref.WeakKeyDictionary())
+    monkeypatch.setattr(images, "MANAGER",
+                        images.ImageManager(str(tmp_path / "images.json")))
+    server = FakeDocker(images=FAKE_IMAGES)
+    server.start()
+    monkeypatch.setenv("DOCKER_HOST", server.url)
+    monkeypatch.delenv("DOCKER_TLS_VERIFY", raising=False)
+    docker_client.MANAGER.invalidate()
+    monitor.MONITOR.stop()
+    yield server
+    monitor.MONITOR.stop()
+    docker_client.MANAGER.invalidate()
+    server.stop()
+
+
+@pytest.fixture
+def reply_server():
+    """ Start local servers answering every request with a canned reply. """
+    listeners = []
+
+    def start(reply: bytes) -> int:
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        listeners.append(listener)
+
+        def serve():
+            while True:
+                try:
+                    connection, _ = listener.accept()
+                except OSError:
+                    return
+                with connection:
+                    try:
+                        connection.recv(4096)
+                        connection.sendall(reply)
+                    except OSError:
+                        # The probe closed the connection first.
+                        pass
+
+        threading.Thread(target=serve, daemon=True).start()
+        return listener.getsockname()[1]
+
+    yield start
+    for listener in listeners:
+        listener.close()
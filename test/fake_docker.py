@@ -0,0 +1,617 @@
+""" In-process stand-in for the Docker Engine HTTP API.
+
+Only the endpoints used by the driver lifecycle are implemented: pinging,
+pulling and inspecting images, and creating, starting, inspecting, listing,
+logging, stopping and removing containers. Containers never run anything,
+their logs hold the line each service writes once it is ready, so
+`wait_until_ready` completes through the log watcher. Exec instances are run
+by `Sandbox`, an interpreter of the few commands the tests need, nothing is
+run on the host.
+
+This allows the overhead of the drivers themselves to be measured without
+Docker.
+"""
+import copy
+import hashlib
+import http.server
+import itertools
+import json
+import queue
+import re
+import secrets
+import shlex
+import socket
+import struct
+import threading
+import time
+import urllib.parse
+
+API_VERSION = "1.41"
+
+# Log line written by each service once it accepts connections.
+READY_LOGS = {
+    "mongo": b"Waiting for connections on port 27017\n",
+    "redis": b"Ready to accept connections\n",
+    "rabbitmq": b"Server startup complete; 0 plugins started.\n",
+}
+
+
+def image_id(reference):
+    return "sha256:" + hashlib.sha256(reference.encode("utf-8")).hexdigest()
+
+
+def repo_digest(reference):
+    """ Repository digest a registry reports for a reference. """
+    repository = reference.split("@")[0].rsplit(":", 1)[0]
+    digest = hashlib.sha256(f"digest {reference}".encode("utf-8")).hexdigest()
+    return f"{repository}@sha256:{digest}"
+
+
+def _tcp_address(address):
+    """ Format an IPv4 address as in `/proc/net/tcp`. """
+    host, port = address
+    number, = struct.unpack("<I", socket.inet_aton(host))
+    return f"{number:08X}:{port:04X}"
+
+
+def wait_read(connection, timeout=10):
+    """ Wait until the peer of a local connection has read everything sent.
+
+    The queues of both ends are read from `/proc/net/tcp`: the data sent has
+    been acknowledged by the peer, and is no longer in its receive queue. The
+    wait is skipped if the table is not available, i.e. not on Linux, and
+    gives up after `timeout` seconds if the peer stops reading.
+    """
+    local = _tcp_address(connection.getsockname())
+    peer = _tcp_address(connection.getpeername())
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with open("/proc/net/tcp") as table:
+                rows = [line.split() for line in table.readlines()[1:]]
+        except OSError:
+            return
+        queues = {(row[1], row[2]): row[4].split(":") for row in rows}
+        if (local, peer) not in queues or (peer, local) not in queues:
+            return
+        unacknowledged = int(queues[local, peer][0], 16)
+        unread = int(queues[peer, local][1], 16)
+        if unacknowledged == 0 and unread == 0:
+            return
+        time.sleep(0.001)
+
+
+# Script written by `shell.Shell` for each command, see `Shell.run`.
+WRAPPED_COMMAND = re.compile(
+    r"\( (?P<command>.*)\n\) </dev/null 2>&1;"
+    r" printf '\\n(?P<marker>\S+) %d\\n' \"\$\?\"\n", re.DOTALL)
+VARIABLE = re.compile(r"\$(?:\$|\?|\{(\w+)(?::-([^}]*))?\}|(\w+))")
+
+
+class Exit(Exception):
+    """ The script called `exit`, or the shell was killed. """
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+class Sandbox:
+    """ Interpreter of the commands exec instances run in the tests.
+
+    Only `COMMANDS` are known, as shell builtins: other commands fail as if
+    they were not installed, and `kill` can only signal the shell itself.
+    Scripts are split on `;`, with `$$`, `$?`, `$NAME` and `${NAME:-default}`
+    expanded, and the only redirection is `>&2`.
+
+    Args:
+        environment: Environment of the container.
+        write: Called with the stream, 1 or 2, and the output of a command.
+    """
+    COMMANDS = ("cat", "echo", "exit", "export", "false", "kill", "printf",
+                "true")
+    pids = itertools.count(100)
+
+    def __init__(self, environment, write):
+        self.environment = dict(environment)
+        self.write = write
+        self.pid = next(self.pids)
+        self.status = 0
+
+    def run(self, argv, read=None):
+        """ Run the command of an exec instance, return its exit code.
+
+        `sh` reads scripts with `read` until it returns no data.
+        """
+        try:
+            if argv == ["sh"] and read is not None:
+                return self._shell(read)
+            if argv[:2] == ["sh", "-c"] and len(argv) == 3:
+                return self._script(argv[2], self.write)
+            return self._command(list(argv), self.write)
+        except Exit as exit_:
+            return exit_.code
+
+    def _shell(self, read):
+        """ Run the commands wrapped by `shell.Shell`, as they arrive. """
+        pending = b""
+        while True:
+            match = WRAPPED_COMMAND.match(
+                pending.decode("utf-8", "surrogateescape"))
+            if match is None:
+                data = read()
+                if not data:
+                    return self.status
+                pending += data
+                continue
+            pending = pending[len(match.group(0).encode(
+                "utf-8", "surrogateescape")):]
+
+            # The command runs in a subshell, with stderr sent to stdout.
+            shell = copy.copy(self)
+            shell.environment = dict(self.environment)
+            shell.write = lambda _, data: self.write(1, data)
+            try:
+                self.status = shell._script(match.group("command"),
+                                            shell.write)
+            except Exit as exit_:
+                if exit_.code == 137:
+                    raise
+                self.status = exit_.code
+            self.write(1, f"\n{match.group('marker')} {self.status}\n".encode(
+                "utf-8"))
+
+    def _script(self, script, write):
+        """ Run a script of commands separated by `;` or new lines. """
+        for statement in re.split(r"[;\n]", script):
+            argv = shlex.split(VARIABLE.sub(self._expand, statement))
+            if argv:
+                self.status = self._command(argv, write)
+        return self.status
+
+    def _expand(self, match):
+        if match.group(0) == "$$":
+            return str(self.pid)
+        if match.group(0) == "$?":
+            return str(self.status)
+        name = match.group(1) or match.group(3)
+        return self.environment.get(name) or match.group(2) or ""
+
+    def _command(self, argv, write):
+        """ Run a single command, return its exit code. """
+        stream = 1
+        if argv[-1] == ">&2":
+            stream = 2
+            argv = argv[:-1]
+        name, arguments = argv[0], argv[1:]
+
+        def output(text):
+            write(stream, text.encode("utf-8"))
+
+        if name not in self.COMMANDS:
+            write(2, f"sh: {name}: not found\n".encode("utf-8"))
+            return 127
+        if name in ("true", "cat"):
+            return 0
+        if name == "false":
+            return 1
+        if name == "echo":
+            output(" ".join(arguments) + "\n")
+        elif name == "printf":
+            output(arguments[0].encode("utf-8").decode("unicode_escape"))
+        elif name == "export":
+            for argument in arguments:
+                key, _, value = argument.partition("=")
+                self.environment[key] = value
+        elif name == "exit":
+            raise Exit(int(arguments[0]) if arguments else self.status)
+        elif name == "kill":
+            if arguments[-1] != str(self.pid):
+                write(2, b"sh: kill: No such process\n")
+                return 1
+            raise Exit(137)
+        return 0
+
+
+class FakeDocker:
+    """ Docker Engine API server holding images and containers in memory.
+
+    Args:
+        images: References of the images present before any pull.
+        latency: Seconds added to every request, to model a slower engine.
+        cpus: Number of CPUs reported by `docker info`.
+        memory: Total memory in bytes reported by `docker info`.
+    """
+
+    def __init__(self, images=(), latency=0, cpus=4, memory=8 * 1024**3):
+        self.images = {}
+        self.repo_digests = {}
+        for reference in images:
+            self._add_image(reference)
+        self.cpus = cpus
+        self.memory = memory
+        self.id = secrets.token_hex(16)
+        self.containers = {}
+        self.execs = {}
+        self.requests = []
+        self.latency = latency
+        self._ids = itertools.count(1)
+        self._ports = itertools.count(49153)
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._stopped = threading.Event()
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0),
+                                                       self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"tcp://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def exit(self, container_id, exit_code, logs=b""):
+        """ Make a running container die, as if its process had exited. """
+        container = self.containers[container_id]
+        container["_logs"] += logs
+        container["State"] = {
+            "Status": "exited",
+            "Running": False,
+            "ExitCode": exit_code
+        }
+        self._emit(container, "die", exitCode=str(exit_code))
+
+    def _emit(self, container, action, **attributes):
+        """ Hand a container event to the subscribers of `/events`. """
+        labels = container["Config"]["Labels"]
+        event = {
+            "Type": "container",
+            "Action": action,
+            "status": action,
+            "id": container["Id"],
+            "Actor": {
+                "ID": container["Id"],
+                "Attributes": dict(labels, **attributes)
+            },
+            "time": int(time.time()),
+        }
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for events, filters in subscribers:
+            if self._matches(labels, filters):
+                events.put(event)
+
+    @staticmethod
+    def _matches(labels, filters):
+        for label in filters.get("label") or []:
+            name, separator, value = label.partition("=")
+            if name not in labels or (separator and labels[name] != value):
+                return False
+        return True
+
+    def _handler(self):
+        fake = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake._route(self, "GET")
+
+            def do_POST(self):
+                fake._route(self, "POST")
+
+            def do_DELETE(self):
+                fake._route(self, "DELETE")
+
+        return Handler
+
+    def _route(self, request, method):
+        url = urllib.parse.urlsplit(request.path)
+        path = url.path
+        if path.startswith("/v1."):
+            path = path[path.index("/", 1):]
+        query = dict(urllib.parse.parse_qsl(url.query))
+        length = int(request.headers.get("Content-Length") or 0)
+        body = json.loads(request.rfile.read(length) or b"null")
+
+        with self._lock:
+            self.requests.append((method, path))
+        if self.latency:
+            time.sleep(self.latency)
+
+        parts = path.strip("/").split("/")
+        if path == "/events":
+            return self._events(request, query)
+        if path == "/_ping":
+            return self._send(request, 200, b"OK", "text/plain")
+        if path == "/version":
+            return self._send(request, 200, {
+                "ApiVersion": API_VERSION,
+                "MinAPIVersion": "1.12",
+                "Version": "20.10.0",
+            })
+        if path == "/info":
+            with self._lock:
+                running = sum(container["State"]["Running"]
+                              for container in self.containers.values())
+            return self._send(request, 200, {
+                "ID": self.id,
+                "NCPU": self.cpus,
+                "MemTotal": self.memory,
+                "ContainersRunning": running,
+            })
+        if parts[0] == "images":
+            if method == "POST" and parts[1] == "create":
+                return self._pull(request, query)
+            return self._inspect_image(request, "/".join(parts[1:-1]))
+        if parts[0] == "exec":
+            return self._exec(request, parts[1], parts[2:])
+        if parts[0] == "containers":
+            if method == "POST" and parts[1] == "create":
+                return self._create(request, body)
+            if method == "GET" and parts[1] == "json":
+                return self._list(request, query)
+            return self._container(request, method, parts[1], parts[2:], body)
+        return self._error(request, 404, f"page not found: {path}")
+
+    def _events(self, request, query):
+        events = queue.Queue()
+        subscriber = (events, json.loads(query.get("filters") or "{}"))
+        with self._lock:
+            self._subscribers.append(subscriber)
+        request.close_connection = True
+        request.send_response(200)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Transfer-Encoding", "chunked")
+        request.end_headers()
+        try:
+            while not self._stopped.is_set():
+                try:
+                    event = events.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                data = json.dumps(event).encode("utf-8") + b"\n"
+                request.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._subscribers.remove(subscriber)
+
+    def _add_image(self, reference):
+        """ Store an image pulled from a registry by tag or by digest. """
+        identifier = image_id(reference)
+        digest = reference if "@" in reference else repo_digest(reference)
+        self.images[reference] = identifier
+        self.images[digest] = identifier
+        self.repo_digests[identifier] = digest
+
+    def _pull(self, request, query):
+        tag = query.get("tag") or "latest"
+        separator = "@" if tag.startswith("sha256:") else ":"
+        reference = f"{query['fromImage']}{separator}{tag}"
+        with self._lock:
+            self._add_image(reference)
+        return self._send(request, 200, {"status": f"Downloaded {reference}"})
+
+    def _find_image(self, name):
+        with self._lock:
+            if name in self.images:
+                return self.images[name]
+            for identifier in self.images.values():
+                if identifier.split(":")[1].startswith(
+                        name.split(":")[-1]) and name.split(":")[-1]:
+                    return identifier
+        return None
+
+    def _inspect_image(self, request, name):
+        identifier = self._find_image(name)
+        if identifier is None:
+            return self._error(request, 404, f"No such image: {name}")
+        with self._lock:
+            digest = self.repo_digests.get(identifier)
+        return self._send(request, 200, {
+            "Id": identifier,
+            "RepoTags": [],
+            "RepoDigests": [digest] if digest else [],
+        })
+
+    def _create(self, request, body):
+        reference = body["Image"]
+        identifier = self._find_image(reference)
+        if identifier is None:
+            return self._error(request, 404, f"No such image: {reference}")
+
+        host_config = body.get("HostConfig") or {}
+        ports = {}
+        for port, bindings in (host_config.get("PortBindings") or {}).items():
+            ports[port] = [{
+                "HostIp": binding.get("HostIp") or "0.0.0.0",
+                "HostPort": binding.get("HostPort") or str(next(self._ports)),
+            } for binding in bindings]
+
+        container_id = hashlib.sha256(str(next(
+            self._ids)).encode("utf-8")).hexdigest()
+        repository = reference.split("@")[0].rsplit(":", 1)[0].split("/")[-1]
+        with self._lock:
+            self.containers[container_id] = {
+                "Id": container_id,
+                "Name": f"/fake_{container_id[:12]}",
+                "Image": identifier,
+                "Config": {
+                    "Image": reference,
+                    "Cmd": body.get("Cmd"),
+                    "Env": body.get("Env") or [],
+                    "Labels": body.get("Labels") or {},
+                    "Tty": False,
+                },
+                "HostConfig": host_config,
+                "State": {
+                    "Status": "created",
+                    "Running": False
+                },
+                "NetworkSettings": {
+                    "Ports": {}
+                },
+                "_ports": ports,
+                "_logs": READY_LOGS.get(repository, b""),
+            }
+        self._emit(self.containers[container_id], "create")
+        return self._send(request, 201, {"Id": container_id, "Warnings": []})
+
+    def _list(self, request, query):
+        filters = json.loads(query.get("filters") or "{}")
+        with self._lock:
+            containers = [
+                container for container in self.containers.values()
+                if self._matches(container["Config"]["Labels"], filters) and (
+                    query.get("all") in ("1", "true", "True")
+                    or container["State"]["Running"])
+            ]
+        return self._send(request, 200, [{
+            "Id": container["Id"],
+            "Labels": container["Config"]["Labels"]
+        } for container in containers])
+
+    def _container(self, request, method, name, action, body=None):
+        with self._lock:
+            container = self.containers.get(name)
+        if container is None:
+            return self._error(request, 404, f"No such container: {name}")
+
+        if method == "DELETE":
+            with self._lock:
+                self.containers.pop(name, None)
+            if container["State"]["Running"]:
+                self._emit(container, "die", exitCode="137")
+            self._emit(container, "destroy")
+            return self._send(request, 204)
+        if action == ["start"]:
+            container["State"] = {"Status": "running", "Running": True}
+            container["NetworkSettings"]["Ports"] = container["_ports"]
+            self._emit(container, "start")
+            return self._send(request, 204)
+        if action == ["stop"]:
+            container["State"] = {
+                "Status": "exited",
+                "Running": False,
+                "ExitCode": 0
+            }
+            self._emit(container, "die", exitCode="0")
+            self._emit(container, "stop")
+            return self._send(request, 204)
+        if action == ["json"]:
+            return self._send(
+                request, 200, {
+                    key: value
+                    for key, value in container.items()
+                    if not key.startswith("_")
+                })
+        if method == "POST" and action == ["exec"]:
+            exec_id = hashlib.sha256(str(next(
+                self._ids)).encode("utf-8")).hexdigest()
+            with self._lock:
+                self.execs[exec_id] = {
+                    "ID": exec_id,
+                    "ContainerID": name,
+                    "Running": False,
+                    "ExitCode": None,
+                    "_cmd": body["Cmd"],
+                    "_stdin": body.get("AttachStdin", False),
+                }
+            return self._send(request, 201, {"Id": exec_id})
+        if action == ["logs"]:
+            logs = container["_logs"]
+            frame = struct.pack(">BxxxL", 1, len(logs)) + logs if logs else b""
+            return self._send(request, 200, frame,
+                              "application/vnd.docker.raw-stream")
+        return self._error(request, 404, f"page not found: {action}")
+
+    def _exec(self, request, exec_id, action):
+        with self._lock:
+            instance = self.execs.get(exec_id)
+        if instance is None:
+            return self._error(request, 404,
+                               f"No such exec instance: {exec_id}")
+        if action == ["json"]:
+            return self._send(
+                request, 200, {
+                    key: value
+                    for key, value in instance.items()
+                    if not key.startswith("_")
+                })
+        if action != ["start"]:
+            return self._error(request, 404, f"page not found: {action}")
+
+        container = self.containers[instance["ContainerID"]]
+        environment = dict(
+            variable.split("=", 1) for variable in container["Config"]["Env"])
+        instance["Running"] = True
+
+        # The connection is hijacked for the multiplexed stream of the exec.
+        request.close_connection = True
+        if request.headers.get("Upgrade") == "tcp":
+            request.send_response(101, "UPGRADED")
+            request.send_header("Connection", "Upgrade")
+            request.send_header("Upgrade", "tcp")
+        else:
+            request.send_response(200)
+        request.send_header("Content-Type",
+                            "application/vnd.docker.raw-stream")
+        request.end_headers()
+        request.wfile.flush()
+        # Clients read the stream from the socket once the headers are parsed,
+        # output read along with the headers would be lost.
+        wait_read(request.connection)
+
+        def write(stream, data):
+            try:
+                request.wfile.write(
+                    struct.pack(">BxxxL", stream, len(data)) + data)
+                request.wfile.flush()
+            except OSError:
+                pass
+
+        def read():
+            try:
+                return request.rfile.read1(65536)
+            except (OSError, ValueError):
+                return b""
+
+        sandbox = Sandbox(environment, write)
+        exit_code = sandbox.run(instance["_cmd"],
+                                read if instance["_stdin"] else None)
+        instance["ExitCode"] = exit_code
+        instance["Running"] = False
+        # Docker ends the stream with the process.
+        try:
+            request.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _send(request, status, body=b"", content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def _error(self, request, status, message):
+        return self._send(request, status, {"message": message})
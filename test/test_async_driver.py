@@ -0,0 +1,62 @@
+import asyncio
+
+import docker
+import pytest
+
+from integration_tester import async_driver, driver, errors
+
+
+def test_async_driver_standard():
+    """ Standard asynchronous driver use test. """
+
+    async def run():
+        async with async_driver.AsyncDriver("ubuntu:latest") as drive:
+            container_id = drive.driver._container_id
+            assert await drive.ready()
+            assert await drive.reset() is None
+        assert drive.driver is None
+        return container_id
+
+    container_id = asyncio.run(run())
+    with pytest.raises(docker.errors.NotFound):
+        docker.from_env().containers.get(container_id)
+
+
+def test_async_driver_overlaps():
+    """ Test that several drivers start concurrently on one event loop. """
+
+    async def start(tag):
+        async with async_driver.AsyncDriver(tag) as drive:
+            return drive.driver.tag
+
+    async def run():
+        return await asyncio.gather(start("ubuntu:latest"),
+                                    start("alpine:3.8"))
+
+    assert asyncio.run(run()) == ["ubuntu:latest", "alpine:3.8"]
+
+
+def test_async_driver_not_started():
+    """ Test that using a driver before `start` raises an error. """
+    drive = async_driver.AsyncDriver("ubuntu:latest")
+    with pytest.raises(RuntimeError):
+        asyncio.run(drive.reset())
+
+
+def test_async_driver_not_ready(fake_docker, monkeypatch):
+    """ Test that the container is removed if it never becomes ready. """
+
+    def wait_until_ready(self, wait_interval=None, timeout=60):
+        raise errors.ReadyTimeout()
+
+    monkeypatch.setattr(driver.Driver, "wait_until_ready", wait_until_ready)
+    drive = async_driver.AsyncDriver("ubuntu:latest")
+
+    async def run():
+        async with drive:
+            pytest.fail("The driver should not be ready.")
+
+    with pytest.raises(errors.ReadyTimeout):
+        asyncio.run(run())
+    assert drive.driver is None
+    assert not fake_docker.containers
@@ -0,0 +1,92 @@
+import pytest
+
+from fake_docker import FakeDocker
+from integration_tester import backends, driver, errors, redis_driver
+
+
+@pytest.fixture
+def daemons():
+    """ Two fake Docker services, the second with twice the resources. """
+    servers = [
+        FakeDocker(images=["redis:5.0.7"], cpus=2, memory=4 * 1024**3),
+        FakeDocker(images=["redis:5.0.7"], cpus=4, memory=8 * 1024**3),
+    ]
+    for server in servers:
+        server.start()
+    yield servers
+    backends.configure(None)
+    for server in servers:
+        backends.endpoint(server.url).monitor.stop()
+        server.stop()
+
+
+def test_endpoint_host():
+    """ Test the addresses of local and remote endpoints. """
+    assert backends.LOCAL.host is None
+    assert backends.LOCAL.bind_address is None
+    assert backends.endpoint() is backends.LOCAL
+
+    remote = backends.endpoint("tcp://10.0.0.2:2375")
+    assert remote is backends.endpoint("tcp://10.0.0.2:2375")
+    assert remote.host == "10.0.0.2"
+    assert remote.bind_address == "0.0.0.0"
+    assert backends.Endpoint("unix:///var/run/docker.sock").host is None
+
+
+def test_scheduler_placement(daemons):
+    """ Test that containers are spread by capacity and running count. """
+    small, large = (backends.endpoint(server.url) for server in daemons)
+    scheduler = backends.Scheduler([small, large], refresh_interval=60)
+
+    placed = [scheduler.place() for _ in range(6)]
+    assert placed.count(large) == 4
+    assert placed.count(small) == 2
+    assert placed[0] is large
+
+
+def test_scheduler_unreachable(daemons):
+    """ Test that unreachable endpoints are skipped. """
+    unreachable = backends.Endpoint("tcp://127.0.0.1:9")
+    reachable = backends.endpoint(daemons[0].url)
+    scheduler = backends.Scheduler([unreachable, reachable])
+    assert scheduler.place() is reachable
+
+    with pytest.raises(errors.DockerNotAvailable):
+        backends.Scheduler([unreachable]).place()
+
+
+def test_scheduler_unlocked_refresh(daemons, monkeypatch):
+    """ Test that endpoints are asked for their resources without the lock.
+    """
+    remote = backends.endpoint(daemons[0].url)
+    scheduler = backends.Scheduler([remote])
+    client = remote.client()
+    info = client.info
+
+    def unlocked_info():
+        assert not scheduler._lock.locked()
+        return info()
+
+    monkeypatch.setattr(client, "info", unlocked_info)
+    assert scheduler.place() is remote
+
+
+def test_driver_remote_endpoint(daemons, fake_docker):
+    """ Test that drivers run on the scheduled endpoint and report it. """
+    backends.configure([server.url for server in daemons])
+
+    drive = redis_driver.RedisDriver(port=0, stop_timeout=0)
+    server = daemons[1]
+    assert drive.endpoint is backends.endpoint(server.url)
+    container = server.containers[drive._container_id]
+    binding = container["HostConfig"]["PortBindings"]["6379/tcp"][0]
+    assert binding["HostIp"] == "0.0.0.0"
+    assert drive.url == f"redis://127.0.0.1:{drive.port}/0"
+    assert drive.port == int(container["_ports"]["6379/tcp"][0]["HostPort"])
+
+    drive.close()
+    assert drive._container_id not in server.containers
+
+    local = driver.Driver("ubuntu:latest", endpoint=backends.LOCAL)
+    assert local._container_id in fake_docker.containers
+    del (local)
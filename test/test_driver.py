@@ -1,9 +1,32 @@
+import gc
+import os
+import threading
+import time
 import traceback
 
 import docker
 import pytest
+import requests
 
-from integration_tester import driver, errors
+from integration_tester import (docker_client, driver, errors, images,
+                                instrumentation, monitor, readiness, reaper)
+
+
+def wait_until(condition, timeout=30):
+    """ Wait for a condition, i.e. a driver collected in the background. """
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.1)
+
+
+def removed(container_id):
+    """ Check if a container has been removed from Docker. """
+    try:
+        docker.from_env().containers.get(container_id)
+    except docker.errors.NotFound:
+        return True
+    return False
 
 
 def test_driver_standard():
@@ -24,8 +47,8 @@ def test_driver_standard():
     except:
         pytest.fail(traceback.format_exc())
 
-    with pytest.raises(docker.errors.NotFound):
-        docker.from_env().containers.get(id)
+    # Collected drivers are removed in the background.
+    wait_until(lambda: removed(id))
 
 
 def test_image_removal():
@@ -44,4 +67,198 @@ def test_image_removal():
     except:
         pytest.fail(traceback.format_exc())
 
-    assert not docker.from_env().images.list(tag)
+    wait_until(lambda: not docker.from_env().images.list(tag))
+
+
+def test_shared_docker_client():
+    """ Test that the Docker client is shared and reconnects.
+
+    The same client should be returned for every call and a new client should
+    be created after the cached client has been invalidated (i.e. the Docker
+    service was restarted).
+    """
+    client = driver.Driver._get_docker_client()
+    assert driver.Driver._get_docker_client() is client
+
+    docker_client.MANAGER.invalidate()
+    reconnected = driver.Driver._get_docker_client()
+    assert reconnected is not client
+    assert reconnected.ping()
+
+
+def test_backoff_delays():
+    """ Test that readiness polling starts fast and backs off to a cap. """
+    backoff = readiness.Backoff(initial=0.01, factor=2, maximum=0.08,
+                                jitter=0)
+    delays = backoff.delays()
+    assert [next(delays) for _ in range(6)] == [
+        0.01, 0.02, 0.04, 0.08, 0.08, 0.08
+    ]
+
+    jittered = readiness.Backoff(initial=1, maximum=1, jitter=0.5).delays()
+    assert all(0.5 <= next(jittered) <= 1 for _ in range(100))
+
+
+class LogReadyDriver(driver.Driver):
+    """ Driver which is only detected as ready through its logs.
+
+    Attr:
+        probes: Number of calls to `ready`.
+    """
+    ready_log_pattern = "Ready to accept connections"
+    probes = 0
+
+    def ready(self) -> bool:
+        self.probes += 1
+        return False
+
+
+def test_wait_until_ready_log_pattern(fake_docker):
+    """ Test that a matching log line short-circuits `wait_until_ready`.
+
+    The interval between probes is longer than the timeout, so only the log
+    line can end the wait without a `ReadyTimeout`. The probe running when
+    the line is written is the last one.
+    """
+    drive = LogReadyDriver("redis:5.0.7")
+    drive.wait_until_ready(wait_interval=60, timeout=30)
+    assert 1 <= drive.probes <= 2
+    drive.close()
+
+
+def test_free_port():
+    """ Test that Docker chooses free host ports when none are given. """
+    drivers = [
+        driver.Driver("nginx:alpine", ports={80: ("127.0.0.1", 0)})
+        for _ in range(3)
+    ]
+    ports = {drive.ports[80] for drive in drivers}
+    assert len(ports) == 3
+    assert all(port > 0 for port in ports)
+
+    # Attached drivers read the bound ports from the container.
+    attached = driver.Driver("nginx:alpine",
+                             container_id=drivers[0]._container_id)
+    assert attached.ports == drivers[0].ports
+    del (attached, drivers)
+
+
+def test_driver_close():
+    """ Test that closing removes the container and can be repeated. """
+    with driver.Driver("ubuntu:latest") as drive:
+        container_id = drive._container_id
+        container = docker.from_env().containers.get(container_id)
+        assert container.labels[reaper.PID_LABEL] == str(os.getpid())
+
+    with pytest.raises(docker.errors.NotFound):
+        docker.from_env().containers.get(container_id)
+    drive.close()
+    del (drive)
+
+
+def test_driver_events():
+    """ Test that each lifecycle phase of a driver is timed. """
+    events = []
+    instrumentation.add_listener(events.append)
+    try:
+        with driver.Driver("ubuntu:latest", stop_timeout=1) as drive:
+            drive.reset()
+    finally:
+        instrumentation.remove_listener(events.append)
+
+    phases = [event.phase for event in events]
+    for phase in ("create", "start", "ready_probe", "ready", "reset", "stop",
+                  "remove"):
+        assert phase in phases
+    assert all(event.driver == "Driver" for event in events)
+
+
+def test_driver_fake_docker(fake_docker):
+    """ Test the lifecycle of a driver against the fake Docker Engine. """
+    drive = driver.Driver("alpine:latest", ports={80: ("127.0.0.1", 0)})
+    assert "alpine:latest" in fake_docker.images
+    assert drive.ports[80] > 0
+    drive.wait_until_ready(timeout=10)
+
+    container_id = drive._container_id
+    assert container_id in fake_docker.containers
+    # The container is pinned to the digest the tag resolved to.
+    config = fake_docker.containers[container_id]["Config"]
+    assert config["Image"].startswith("alpine@sha256:")
+    assert config["Image"] == images.MANAGER.cached("alpine:latest")
+    drive.close()
+    assert container_id not in fake_docker.containers
+
+
+def test_wait_until_ready_container_exited(fake_docker):
+    """ Test that `wait_until_ready` fails as soon as the container dies. """
+    drive = LogReadyDriver("ubuntu:latest")
+    threading.Timer(
+        0.2,
+        fake_docker.exit,
+        args=(drive._container_id, 3, b"fatal: out of cheese\n")).start()
+
+    start = time.monotonic()
+    with pytest.raises(errors.ContainerExited) as error:
+        drive.wait_until_ready(timeout=30)
+    assert time.monotonic() - start < 5
+    assert error.value.exit_code == 3
+    assert "out of cheese" in error.value.logs
+    assert isinstance(error.value, errors.ReadyTimeout)
+    drive.close()
+
+
+def test_wait_until_ready_attached_exited(fake_docker):
+    """ Test that an attached container which died is noticed.
+
+    The container died before the monitor started, i.e. in another process,
+    so the monitor has no entry for it and the container is inspected.
+    """
+    owner = driver.Driver("ubuntu:latest")
+    monitor.MONITOR.stop()
+    fake_docker.exit(owner._container_id, 3, b"fatal: out of cheese\n")
+    assert monitor.MONITOR.start()
+
+    drive = LogReadyDriver("ubuntu:latest",
+                           container_id=owner._container_id)
+    start = time.monotonic()
+    with pytest.raises(errors.ContainerExited) as error:
+        drive.wait_until_ready(timeout=30)
+    assert time.monotonic() - start < 5
+    assert error.value.exit_code == 3
+    owner.close()
+
+
+def test_driver_collected(fake_docker):
+    """ Test that a collected driver is removed by the `REMOVER` threads.
+
+    The garbage collector may run while the reaper lock is held, closing the
+    driver in `__del__` would then deadlock.
+    """
+    drive = driver.Driver("ubuntu:latest")
+    container_id = drive._container_id
+    with reaper._LOCK:
+        del drive
+        gc.collect()
+    wait_until(lambda: container_id not in fake_docker.containers)
+
+
+def test_driver_connection_error(fake_docker, monkeypatch):
+    """ Test that a connection failure discards the shared Docker client.
+
+    The next call should connect again instead of reusing the broken
+    connection pool, i.e. after the Docker service was restarted.
+    """
+    drive = driver.Driver("ubuntu:latest")
+    client = docker_client.get_client()
+
+    def refused(*args, **kwargs):
+        raise requests.exceptions.ConnectionError("Connection refused")
+
+    monkeypatch.setattr(client.api, "exec_create", refused)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        drive.execute(["true"])
+
+    assert docker_client.get_client() is not client
+    assert drive.execute(["true"])[0] == 0
+    drive.close()
@@ -0,0 +1,261 @@
+import json
+import threading
+import time
+from unittest import mock
+
+import docker
+import pytest
+
+from integration_tester import backends, images
+
+
+class FakeImage:
+
+    def __init__(self, image_id, repository=None):
+        self.id = image_id
+        self.attrs = {
+            "RepoDigests": [f"{repository}@{image_id}"] if repository else []
+        }
+
+
+class FakeRegistry:
+    """ Local stand-in for a Docker service and its registry.
+
+    Pulls are counted and take a short time so parallel pulls can be observed.
+    The repository digest of an image is its ID in the repository.
+    """
+
+    def __init__(self, remote, local=(), base_url=None):
+        self.remote = dict(remote)
+        self.local = {reference: self.remote[reference] for reference in local}
+        self.base_url = base_url
+        self.pulls = []
+        self.failures = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    @property
+    def images(self):
+        return self
+
+    def client(self):
+        return self
+
+    def get(self, reference):
+        repository, _ = images.split_reference(reference)
+        if reference in self.local:
+            return FakeImage(self.local[reference], repository)
+        if reference.partition("@")[2] in self.local.values():
+            return FakeImage(reference.partition("@")[2], repository)
+        if reference in self.local.values():
+            return FakeImage(reference)
+        raise docker.errors.ImageNotFound(reference)
+
+    def pull(self, repository, tag):
+        separator = "@" if tag.startswith("sha256:") else ":"
+        reference = f"{repository}{separator}{tag}"
+        with self._lock:
+            self.pulls.append(reference)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.2)
+        with self._lock:
+            self.active -= 1
+            if self.failures:
+                self.failures -= 1
+                raise docker.errors.APIError("registry unavailable")
+        if separator == "@":
+            if tag not in self.remote.values():
+                raise docker.errors.NotFound(reference)
+            self.local[reference] = tag
+        else:
+            self.local[reference] = self.remote[reference]
+        return FakeImage(self.local[reference], repository)
+
+
+@pytest.mark.parametrize("reference, expected", [
+    ("mongo", ("mongo", "latest")),
+    ("mongo:3.4", ("mongo", "3.4")),
+    ("localhost:5000/mongo", ("localhost:5000/mongo", "latest")),
+    ("localhost:5000/mongo:3.4", ("localhost:5000/mongo", "3.4")),
+    ("mongo@sha256:abc", ("mongo", "sha256:abc")),
+])
+def test_split_reference(reference, expected):
+    """ Test image references are split into repository and tag. """
+    assert images.split_reference(reference) == expected
+
+
+def test_prepull_parallel(tmp_path):
+    """ Test that missing images are pulled in parallel and cached. """
+    registry = FakeRegistry({
+        "mongo:3.4": "sha256:mongo",
+        "redis:5.0.7": "sha256:redis",
+        "rabbitmq:latest": "sha256:rabbitmq",
+    })
+    manager = images.ImageManager(str(tmp_path / "images.json"),
+                                  client=lambda: registry)
+
+    start = time.monotonic()
+    digests = manager.prepull(["mongo:3.4", "redis:5.0.7", "rabbitmq:latest"])
+    assert time.monotonic() - start < 0.5
+    assert registry.max_active == 3
+    assert digests["redis:5.0.7"] == "redis@sha256:redis"
+
+    # A new session resolves from the cache without touching the registry.
+    manager = images.ImageManager(str(tmp_path / "images.json"),
+                                  client=lambda: registry)
+    assert manager.resolve("mongo:3.4") == "mongo@sha256:mongo"
+    assert len(registry.pulls) == 3
+
+
+def test_resolve_offline(tmp_path):
+    """ Test that images present locally never contact the registry. """
+    registry = FakeRegistry({"mongo:3.4": "sha256:mongo"},
+                            local=["mongo:3.4"])
+    registry.remote.clear()
+    manager = images.ImageManager(str(tmp_path / "images.json"),
+                                  client=lambda: registry)
+
+    assert manager.resolve("mongo:3.4") == "mongo@sha256:mongo"
+    assert not registry.pulls
+
+
+def test_warm_background(tmp_path):
+    """ Test that waiting on a warmed image blocks until it is pulled. """
+    registry = FakeRegistry({"mongo:3.4": "sha256:mongo"})
+    manager = images.ImageManager(str(tmp_path / "images.json"),
+                                  client=lambda: registry)
+
+    manager.warm(["mongo:3.4"])
+    manager.warm(["mongo:3.4"])
+    manager.wait("mongo:3.4")
+    assert "mongo:3.4" in registry.local
+    assert registry.pulls == ["mongo:3.4"]
+
+    # Images which are not being warmed do not block.
+    manager.wait("redis:5.0.7", timeout=0)
+
+
+def test_resolve_pinned(tmp_path):
+    """ Test that a moved tag does not change the resolved digest. """
+    registry = FakeRegistry({"mongo:3.4": "sha256:old"})
+    manager = images.ImageManager(str(tmp_path / "images.json"),
+                                  client=lambda: registry)
+    assert manager.resolve("mongo:3.4") == "mongo@sha256:old"
+
+    # Another Docker service pulls the cached digest, not the moved tag.
+    registry.remote["mongo:3.4"] = "sha256:new"
+    other = FakeRegistry({"mongo:3.4": "sha256:new", "old": "sha256:old"})
+    assert manager.resolve("mongo:3.4", endpoint=other) == "mongo@sha256:old"
+    assert other.pulls == ["mongo@sha256:old"]
+
+    assert manager.resolve("mongo:3.4", refresh=True) == "mongo@sha256:new"
+    assert manager.cached("mongo:3.4") == "mongo@sha256:new"
+
+
+def test_resolve_expired(tmp_path):
+    """ Test that a moved tag is followed once its resolution expires. """
+    cache_path = str(tmp_path / "images.json")
+    registry = FakeRegistry({"mongo:latest": "sha256:old"})
+    manager = images.ImageManager(cache_path, client=lambda: registry, ttl=0)
+    assert manager.resolve("mongo:latest") == "mongo@sha256:old"
+
+    # The session keeps the digest it resolved.
+    registry.remote["mongo:latest"] = "sha256:new"
+    assert manager.cached("mongo:latest") == "mongo@sha256:old"
+    assert manager.resolve("mongo:latest") == "mongo@sha256:old"
+
+    # The next session pulls the tag again, but keeps the expired digest
+    # while the registry can not be reached.
+    resolved_at = json.loads(
+        (tmp_path / "images.json").read_text())["mongo:latest"]["resolved_at"]
+    registry.failures = 1
+    manager = images.ImageManager(cache_path, client=lambda: registry, ttl=0)
+    assert manager.cached("mongo:latest") is None
+    assert manager.resolve("mongo:latest") == "mongo@sha256:old"
+    assert manager.cached("mongo:latest") == "mongo@sha256:old"
+    # The expired resolution is not stored again.
+    assert json.loads((tmp_path / "images.json").read_text(
+    ))["mongo:latest"]["resolved_at"] == resolved_at
+
+    manager = images.ImageManager(cache_path, client=lambda: registry, ttl=0)
+    assert manager.resolve("mongo:latest") == "mongo@sha256:new"
+    assert registry.pulls == ["mongo:latest"] * 3
+
+
+def test_resolve_legacy_cache(tmp_path):
+    """ Test that caches without resolution times are treated as expired.
+    """
+    cache_path = tmp_path / "images.json"
+    cache_path.write_text(json.dumps({"mongo:3.4": "mongo@sha256:old"}))
+    registry = FakeRegistry({"mongo:3.4": "sha256:new"})
+    manager = images.ImageManager(str(cache_path), client=lambda: registry)
+
+    assert manager.cached("mongo:3.4") is None
+    assert manager.resolve("mongo:3.4") == "mongo@sha256:new"
+    entry = json.loads(cache_path.read_text())["mongo:3.4"]
+    assert entry["digest"] == "mongo@sha256:new"
+
+
+def test_store_merge(tmp_path):
+    """ Test that sessions sharing the cache keep each other's entries. """
+    cache_path = str(tmp_path / "images.json")
+    registry = FakeRegistry({
+        "mongo:3.4": "sha256:mongo",
+        "redis:5.0.7": "sha256:redis"
+    })
+    first = images.ImageManager(cache_path, client=lambda: registry)
+    second = images.ImageManager(cache_path, client=lambda: registry)
+    # Both sessions load the empty cache before either stores.
+    assert first.cached("mongo:3.4") is None
+    assert second.cached("redis:5.0.7") is None
+
+    first.resolve("mongo:3.4")
+    second.resolve("redis:5.0.7")
+    entries = json.loads((tmp_path / "images.json").read_text())
+    assert sorted(entries) == ["mongo:3.4", "redis:5.0.7"]
+
+
+def test_resolve_committed(tmp_path):
+    """ Test that images without a repository digest are not cached. """
+    registry = FakeRegistry({"seeded/mongo:latest": "sha256:seeded"},
+                            local=["seeded/mongo:latest"])
+    registry.get = lambda reference: FakeImage("sha256:seeded")
+    manager = images.ImageManager(str(tmp_path / "images.json"),
+                                  client=lambda: registry)
+
+    assert manager.resolve("seeded/mongo:latest") == "sha256:seeded"
+    assert manager.cached("seeded/mongo:latest") is None
+
+
+def test_warm_retry(tmp_path):
+    """ Test that a failed warm is pulled again by the next warm. """
+    registry = FakeRegistry({"mongo:3.4": "sha256:mongo"})
+    registry.failures = 1
+    manager = images.ImageManager(str(tmp_path / "images.json"),
+                                  client=lambda: registry)
+
+    with pytest.raises(docker.errors.APIError):
+        manager.prepull(["mongo:3.4"])
+    assert manager.prepull(["mongo:3.4"]) == {"mongo:3.4": "mongo@sha256:mongo"}
+    assert registry.pulls == ["mongo:3.4", "mongo:3.4"]
+
+
+def test_prepull_endpoints(tmp_path, monkeypatch):
+    """ Test that images are pulled on every endpoint of the scheduler. """
+    endpoints = [
+        FakeRegistry({"mongo:3.4": "sha256:mongo"}, base_url=f"tcp://{host}")
+        for host in ("first", "second")
+    ]
+    scheduler = mock.Mock(endpoints=endpoints)
+    monkeypatch.setattr(backends, "SCHEDULER", scheduler)
+    local = FakeRegistry({})
+    manager = images.ImageManager(str(tmp_path / "images.json"),
+                                  client=lambda: local)
+
+    digests = manager.prepull(["mongo:3.4"])
+    assert digests == {"mongo:3.4": "mongo@sha256:mongo"}
+    assert all(len(endpoint.pulls) == 1 for endpoint in endpoints)
+    assert not local.pulls
+    manager.wait("mongo:3.4", endpoint=endpoints[1])
@@ -0,0 +1,92 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Imports each driver module in a clean interpreter. Any attempt to create a
+# Docker API client (and therefore touch the Docker socket) is recorded.
+IMPORT_SCRIPT = """
+import time
+
+import docker
+
+connections = []
+original_init = docker.APIClient.__init__
+
+def record_init(self, *args, **kwargs):
+    connections.append((args, kwargs))
+    original_init(self, *args, **kwargs)
+
+docker.APIClient.__init__ = record_init
+
+start = time.perf_counter()
+import integration_tester.{module}
+duration = time.perf_counter() - start
+
+from integration_tester import docker_client
+assert not connections, connections
+assert docker_client.MANAGER._client is None
+print(duration)
+"""
+
+
+@pytest.mark.parametrize("module",
+                         ["driver", "mongo_driver", "redis_driver",
+                          "rabbitmq_driver"])
+def test_import_does_not_touch_docker(module):
+    """ Benchmark importing a driver module without Docker.
+
+    The Docker host is pointed at a socket which does not exist, so the import
+    would fail if it attempted to connect. The import time is reported to
+    catch regressions which reintroduce work at import time.
+    """
+    env = dict(os.environ, DOCKER_HOST="unix:///nonexistent/docker.sock")
+    result = subprocess.run(
+        [sys.executable, "-c",
+         IMPORT_SCRIPT.format(module=module)],
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=False)
+    assert result.returncode == 0, result.stderr.decode("utf-8")
+
+    duration = float(result.stdout.decode("utf-8").strip())
+    print(f"import integration_tester.{module}: {duration * 1000:.1f}ms")
+
+
+# Imports a driver module with its client library hidden, readiness must not
+# need it and `client` must report the missing package.
+WITHOUT_CLIENT_SCRIPT = """
+import sys
+
+sys.modules["{package}"] = None
+
+from integration_tester import errors, {module}
+
+try:
+    {module}.{driver}.client.fget(None)
+except errors.OptionalModuleNotInstalled:
+    pass
+else:
+    raise AssertionError("client did not raise")
+"""
+
+
+@pytest.mark.parametrize("module,driver,package", [
+    ("mongo_driver", "MongoDBDriver", "pymongo"),
+    ("redis_driver", "RedisDriver", "redis"),
+    ("rabbitmq_driver", "RabbitMQDriver", "pika"),
+])
+def test_import_without_client_library(module, driver, package):
+    """ Test that a driver module imports without its client library. """
+    result = subprocess.run([
+        sys.executable, "-c",
+        WITHOUT_CLIENT_SCRIPT.format(module=module,
+                                     driver=driver,
+                                     package=package)
+    ],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            check=False)
+    assert result.returncode == 0, result.stderr.decode("utf-8")
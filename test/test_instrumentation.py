@@ -0,0 +1,114 @@
+import json
+
+import pytest
+
+from integration_tester import instrumentation
+
+pytest_plugins = ["pytester"]
+
+
+class FakeDriver:
+    _container_id = "0123456789abcdef"
+
+    @instrumentation.timed("reset")
+    def reset(self, fail=False):
+        if fail:
+            raise ValueError("Reset failed.")
+        return "reset"
+
+
+@pytest.fixture
+def events():
+    """ Collect the events emitted during a test. """
+    collected = []
+    instrumentation.add_listener(collected.append)
+    yield collected
+    instrumentation.remove_listener(collected.append)
+
+
+def test_timed(events):
+    """ Test that decorated methods emit an event for each call. """
+    drive = FakeDriver()
+    assert drive.reset() == "reset"
+    with pytest.raises(ValueError):
+        drive.reset(fail=True)
+
+    assert [(event.driver, event.container_id, event.phase, event.error)
+            for event in events] == [
+                ("FakeDriver", "0123456789ab", "reset", None),
+                ("FakeDriver", "0123456789ab", "reset", "ValueError"),
+            ]
+    assert all(event.duration >= 0 for event in events)
+
+
+def test_listener_error(caplog):
+    """ Test that a failing listener changes neither the result nor the error
+    of a phase, and does not stop other listeners.
+    """
+    def broken(event):
+        raise OSError("No space left on device")
+
+    events = []
+    instrumentation.add_listener(broken)
+    instrumentation.add_listener(events.append)
+    try:
+        drive = FakeDriver()
+        assert drive.reset() == "reset"
+        with pytest.raises(ValueError):
+            drive.reset(fail=True)
+    finally:
+        instrumentation.remove_listener(broken)
+        instrumentation.remove_listener(events.append)
+
+    assert len(events) == 2
+    assert "No space left on device" in caplog.text
+
+
+def test_json_lines_exporter(tmp_path):
+    """ Test that events are appended to a file as JSON lines. """
+    path = tmp_path / "events.jsonl"
+    exporter = instrumentation.JsonLinesExporter(str(path))
+    instrumentation.add_listener(exporter)
+    try:
+        with instrumentation.measure(FakeDriver(), "start"):
+            pass
+        with instrumentation.measure(FakeDriver(), "stop"):
+            pass
+    finally:
+        instrumentation.remove_listener(exporter)
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["phase"] for line in lines] == ["start", "stop"]
+
+
+def test_summary():
+    """ Test that the summary orders phases by total duration. """
+    summary = instrumentation.Summary()
+    for phase, duration in (("ready", 2), ("reset", 0.5), ("reset", 2)):
+        summary(
+            instrumentation.Event("MongoDBDriver", None, phase, 0, duration,
+                                  None))
+
+    assert summary.slowest() == [
+        ("MongoDBDriver", "reset", 2, 2.5, 2),
+        ("MongoDBDriver", "ready", 1, 2, 2),
+    ]
+    assert len(summary.slowest(1)) == 1
+
+
+def test_terminal_summary(pytester):
+    """ Test that the slowest phases are reported at the end of a session. """
+    pytester.makepyfile("""
+        from integration_tester import instrumentation
+
+        def test_phase():
+            instrumentation.emit(
+                instrumentation.Event("RedisDriver", None, "ready", 0, 1.5,
+                                      None))
+    """)
+    result = pytester.runpytest("-p", "no:cacheprovider")
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines([
+        "*slowest integration_tester phases*",
+        "*1.50s total*RedisDriver ready",
+    ])
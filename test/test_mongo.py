@@ -1,4 +1,5 @@
 import traceback
+from unittest import mock
 
 import pymongo
 import pytest
@@ -19,8 +20,220 @@ def test_mongo():
     drive.reset()
     assert not list(collection.find({}))
 
-    # Attempt to catch any issues within the deconstruction and fail the test.
+    # Attempt to catch any issues within the removal and fail the test. The
+    # next test binds the same port, the container has to be gone first.
     try:
-        del (drive)
+        drive.close()
     except:
         pytest.fail(traceback.format_exc())
+
+
+def test_mongo_snapshot():
+    """ Test that reset restores a snapshot, including its indexes. """
+    drive = mongo_driver.MongoDBDriver()
+    drive.wait_until_ready()
+
+    db = pymongo.MongoClient().test
+    db.seeded.insert_one({"test": "seed"})
+    db.seeded.create_index("test", unique=True)
+    db.untouched.insert_one({"test": "untouched"})
+    drive.snapshot()
+
+    db.seeded.insert_one({"test": "test"})
+    db.seeded.drop_index("test_1")
+    # Index changes alone do not change the `dbHash` of a collection.
+    db.untouched.create_index("test")
+    db.created.insert_one({"test": "test"})
+    pymongo.MongoClient().other.test.insert_one({"test": "test"})
+
+    drive.reset()
+    assert [doc["test"] for doc in db.seeded.find({})] == ["seed"]
+    assert "test_1" in db.seeded.index_information()
+    assert db.untouched.count_documents({}) == 1
+    assert "test_1" not in db.untouched.index_information()
+    assert "created" not in db.list_collection_names()
+    assert "other" not in pymongo.MongoClient().list_database_names()
+
+    drive.discard_snapshot()
+    drive.reset()
+    assert "test" not in pymongo.MongoClient().list_database_names()
+
+    drive.close()
+
+
+@pytest.mark.parametrize("collections", [10, 100, 1000])
+def test_mongo_snapshot_collections(collections):
+    """ Test that a snapshot of many collections is restored.
+
+    Each collection holds a document and a secondary index, a single
+    collection is changed before the reset. The latency of the restore is
+    measured by `test/benchmark/test_reset.py`.
+    """
+    drive = mongo_driver.MongoDBDriver(port=0)
+    drive.wait_until_ready()
+    db = drive.client.test
+
+    for index in range(collections):
+        db[f"collection_{index}"].insert_one({"index": index})
+        db[f"collection_{index}"].create_index("index")
+    drive.snapshot()
+    db.collection_0.insert_one({"index": -1})
+    drive.reset()
+
+    assert db.collection_0.count_documents({}) == 1
+    assert sorted(db.list_collection_names()) == sorted(
+        f"collection_{index}" for index in range(collections))
+    for index in range(collections):
+        assert "index_1" in db[f"collection_{index}"].index_information()
+    drive.close()
+
+
+def test_mongo_client_reuse():
+    """ Test that `reset` reuses the client of the driver.
+
+    `ready` probes the raw protocol and leaves the client untouched.
+    """
+    drive = mongo_driver.MongoDBDriver()
+    drive.wait_until_ready()
+
+    client = drive.client
+    drive.client.test.test.insert_one({"test": "test"})
+    assert drive.ready()
+    drive.reset()
+    assert drive.client is client
+    assert not list(client.test.test.find({}))
+
+    drive.close()
+
+
+def test_mongo_free_port():
+    """ Test that several MongoDB drivers can run side by side. """
+    first = mongo_driver.MongoDBDriver(port=0)
+    second = mongo_driver.MongoDBDriver(port=None)
+    first.wait_until_ready()
+    second.wait_until_ready()
+
+    assert first.port != second.port
+    assert first.url == f"mongodb://127.0.0.1:{first.port}"
+    first.client.test.test.insert_one({"test": "test"})
+    assert second.client.test.test.count_documents({}) == 0
+    first.close()
+    second.close()
+
+
+@pytest.mark.parametrize("tag, expected", [
+    ("3.4", (3, 4)),
+    ("4.4.6-bionic", (4, 4)),
+    ("7.0", (7, 0)),
+    ("latest", None),
+])
+def test_mongo_version(tag, expected):
+    """ Test that MongoDB versions are parsed from image tags. """
+    assert mongo_driver._version(tag) == expected
+
+
+def test_mongo_fast():
+    """ Test that a fast driver keeps its data in memory only. """
+    drive = mongo_driver.MongoDBDriver(port=0, fast=True)
+    drive.wait_until_ready()
+
+    container = drive._get_docker_client().containers.get(drive._container_id)
+    assert "/data/db" in container.attrs["HostConfig"]["Tmpfs"]
+    options = drive.client.admin.command("getCmdLineOpts")["argv"]
+    assert "--nojournal" in options
+
+    drive.client.test.test.insert_one({"test": "test"})
+    drive.reset()
+    assert drive.client.test.test.count_documents({}) == 0
+    drive.close()
+
+
+def test_mongo_client_timeout(fake_docker):
+    """ Test that the client waits long enough for a busy service. """
+    drive = mongo_driver.MongoDBDriver(port=0)
+    options = drive.client.options
+    assert options.server_selection_timeout == 5
+    drive.close()
+
+
+def test_mongo_restore_indexes():
+    """ Test that indexes are restored when the documents are unchanged.
+
+    The indexes of each collection are only listed if the number of indexes
+    of the database differs from the snapshot.
+    """
+    collection = mock.MagicMock()
+    collection.index_information.return_value = {
+        "_id_": {
+            "key": [("_id", 1)]
+        },
+        "extra_1": {
+            "key": [("extra", 1)]
+        },
+        "extra_2": {
+            "key": [("extra", 2)]
+        },
+    }
+    stats = {"indexes": 3}
+    database = mock.MagicMock()
+    database.command.side_effect = lambda command: {
+        "dbHash": {
+            "collections": {
+                "seeded": "digest"
+            }
+        },
+        "dbStats": stats,
+    }[command]
+    database.__getitem__.return_value = collection
+    client = mock.MagicMock()
+    client.list_database_names.return_value = ["admin", "test"]
+    client.__getitem__.return_value = database
+
+    indexes = {
+        "_id_": {
+            "key": [("_id", 1)]
+        },
+        "test_1": {
+            "key": [("test", 1)],
+            "unique": True,
+            "v": 2
+        },
+    }
+    snapshot = {
+        "test": {
+            "seeded":
+            mongo_driver.CollectionSnapshot([{
+                "test": "seed"
+            }], indexes, {}, "digest")
+        }
+    }
+    mongo_driver.MongoDBDriver._restore(client, snapshot)
+
+    collection.drop_index.assert_has_calls(
+        [mock.call("extra_1"), mock.call("extra_2")], any_order=True)
+    collection.create_index.assert_called_once_with([("test", 1)],
+                                                    name="test_1",
+                                                    unique=True)
+    collection.delete_many.assert_not_called()
+    collection.insert_many.assert_not_called()
+
+    # Unchanged documents and number of indexes, no index is listed.
+    collection.reset_mock()
+    stats["indexes"] = 2
+    mongo_driver.MongoDBDriver._restore(client, snapshot)
+    collection.index_information.assert_not_called()
+
+
+def test_mongo_reset_system_databases(fake_docker):
+    """ Test that reset without a snapshot keeps the system databases. """
+    drive = mongo_driver.MongoDBDriver(port=0)
+    client = mock.MagicMock()
+    client.list_database_names.return_value = [
+        "admin", "config", "local", "test"
+    ]
+    drive._client = client
+
+    drive.reset()
+    client.drop_database.assert_called_once_with("test")
+    drive._client = None
+    drive.close()
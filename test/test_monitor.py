@@ -0,0 +1,62 @@
+from integration_tester import monitor
+
+
+def event(container_id, action, **attributes):
+    return {
+        "Type": "container",
+        "Action": action,
+        "Actor": {
+            "ID": container_id,
+            "Attributes": attributes
+        }
+    }
+
+
+def test_monitor_state():
+    """ Test that container states follow the events. """
+    states = monitor.Monitor(client=lambda: None)
+    changes = []
+    states.subscribe("a", lambda: changes.append("a"))
+    assert states.state("a") is None
+
+    states._apply(event("a", "create"))
+    assert states.state("a") == monitor.State()
+    states._apply(event("a", "start"))
+    assert states.state("a").running
+    states._apply(event("a", "health_status: healthy"))
+    assert states.state("a").health == "healthy"
+    states._apply(event("a", "oom"))
+    states._apply(event("a", "die", exitCode="137"))
+    assert states.state("a") == monitor.State(running=False,
+                                              exit_code=137,
+                                              oom_killed=True,
+                                              health="healthy")
+    assert len(changes) == 5
+
+    states._apply(event("a", "destroy"))
+    assert states.state("a") is None
+    assert len(changes) == 6
+    states._apply(event("a", "create"))
+    assert len(changes) == 6
+
+
+def test_inspected_state():
+    """ Test that inspected attributes give the same state as events. """
+    assert monitor.inspected_state({
+        "State": {
+            "Status": "exited",
+            "Running": False,
+            "ExitCode": 1,
+            "OOMKilled": False
+        }
+    }) == monitor.State(exit_code=1)
+    assert monitor.inspected_state({
+        "State": {
+            "Status": "running",
+            "Running": True,
+            "ExitCode": 0,
+            "Health": {
+                "Status": "starting"
+            }
+        }
+    }) == monitor.State(running=True, health="starting")
@@ -0,0 +1,111 @@
+import time
+
+import docker
+import pytest
+
+from integration_tester import driver, errors, pool
+
+
+class NeverReadyDriver(driver.Driver):
+    """ Driver which never becomes ready. """
+
+    def ready(self) -> bool:
+        return False
+
+
+class PortDriver(driver.Driver):
+    """ Driver publishing a single port, fixed by default. """
+
+    def __init__(self, port: int = 8080, ready: bool = True):
+        super().__init__("ubuntu:latest", ports={80: ("127.0.0.1", port)})
+        self.is_ready = ready
+
+    def ready(self) -> bool:
+        return self.is_ready
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def test_pool_reuse():
+    """ Test that released drivers are reused for the same configuration. """
+    containers = pool.ContainerPool()
+    drive = containers.acquire(driver.Driver, "ubuntu:latest")
+    container_id = drive._container_id
+    containers.release(drive)
+    assert len(containers) == 1
+
+    with containers.lease(driver.Driver, "ubuntu:latest") as reused:
+        assert reused._container_id == container_id
+        assert len(containers) == 0
+    assert len(containers) == 1
+
+    # A different configuration must not be handed the same container.
+    other = containers.acquire(driver.Driver, "alpine:3.8")
+    assert other._container_id != container_id
+    containers.release(other)
+
+    containers.clear()
+    del drive, reused, other
+    with pytest.raises(docker.errors.NotFound):
+        docker.from_env().containers.get(container_id)
+
+
+def test_pool_eviction():
+    """ Test that idle drivers are evicted by TTL and LRU. """
+    containers = pool.ContainerPool(max_idle=1, ttl=1)
+    first = containers.acquire(driver.Driver, "ubuntu:latest")
+    second = containers.acquire(driver.Driver, "ubuntu:latest")
+    containers.release(first)
+    containers.release(second)
+    assert len(containers) == 1
+
+    time.sleep(1.5)
+    containers.evict()
+    assert len(containers) == 0
+
+
+def test_pool_release_foreign_driver():
+    """ Test that only drivers acquired from the pool can be released. """
+    containers = pool.ContainerPool()
+    drive = driver.Driver("ubuntu:latest")
+    with pytest.raises(ValueError):
+        containers.release(drive)
+
+
+def test_pool_not_ready(fake_docker):
+    """ Test that a driver which never becomes ready is removed. """
+    containers = pool.ContainerPool(timeout=1)
+    with pytest.raises(errors.ReadyTimeout):
+        containers.acquire(NeverReadyDriver, "ubuntu:latest")
+
+    assert len(containers) == 0
+    assert not fake_docker.containers
+
+
+def test_pool_spares_free_port(fake_docker):
+    """ Test that spares are started on free ports next to the driver. """
+    containers = pool.ContainerPool(spares=1)
+    drive = containers.acquire(PortDriver)
+    assert drive.ports[80] == 8080
+
+    wait_until(lambda: len(containers) == 1)
+    spare = containers.acquire(PortDriver)
+    assert spare.ports[80] not in (0, 8080)
+    containers.release(drive)
+    containers.release(spare)
+    containers.clear()
+
+
+def test_pool_spares_failure(fake_docker, caplog):
+    """ Test that spares which fail to start are logged. """
+    containers = pool.ContainerPool(spares=1, timeout=1)
+    with pytest.raises(errors.ReadyTimeout):
+        containers.acquire(PortDriver, ready=False)
+
+    wait_until(lambda: "Failed to start a spare PortDriver" in caplog.text)
+    assert not fake_docker.containers
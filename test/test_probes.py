@@ -0,0 +1,73 @@
+import socket
+import struct
+import time
+
+import pytest
+
+from integration_tester import probes
+
+
+def free_port() -> int:
+    """ Find a port nothing is listening on. """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def mongodb_reply(document: bytes) -> bytes:
+    """ Build an `OP_REPLY` to the first request holding a BSON document. """
+    body = struct.pack("<iqii", 8, 0, 0, 1) + document
+    return struct.pack("<iiii", 16 + len(body), 7, 1, 1) + body
+
+
+def bson(*elements: bytes) -> bytes:
+    """ Build a BSON document from encoded elements. """
+    content = b"".join(elements)
+    return struct.pack("<i", len(content) + 5) + content + b"\x00"
+
+
+def test_redis_ping(reply_server):
+    """ Test that only a `PONG` reply is ready. """
+    assert probes.redis_ping("127.0.0.1", reply_server(b"+PONG\r\n"))
+    assert not probes.redis_ping(
+        "127.0.0.1",
+        reply_server(b"-LOADING Redis is loading the dataset in memory\r\n"))
+    assert not probes.redis_ping("127.0.0.1", free_port())
+
+
+def test_mongodb_hello(reply_server):
+    """ Test the `isMaster` handshake with the fields of a real reply. """
+    ready = bson(b"\x08ismaster\x00\x01",
+                 b"\x02msg\x00" + struct.pack("<i", 9) + b"isdbgrid\x00",
+                 b"\x03topologyVersion\x00" + bson(b"\x10counter\x00\0\0\0\0"),
+                 b"\x09localTime\x00" + struct.pack("<q", 0),
+                 b"\x01ok\x00" + struct.pack("<d", 1))
+    failed = bson(b"\x01ok\x00" + struct.pack("<d", 0))
+    assert probes.mongodb_hello("127.0.0.1", reply_server(mongodb_reply(ready)))
+    assert not probes.mongodb_hello("127.0.0.1",
+                                    reply_server(mongodb_reply(failed)))
+    assert not probes.mongodb_hello("127.0.0.1", reply_server(b"HTTP/1.0"))
+    assert not probes.mongodb_hello("127.0.0.1", free_port())
+
+
+def test_amqp_handshake(reply_server):
+    """ Test that the broker must start with `Connection.Start`. """
+    start = struct.pack(">BHIHHBB", 1, 0, 6, 10, 10, 0, 9) + b"\xce"
+    assert probes.amqp_handshake("127.0.0.1", reply_server(start))
+    assert not probes.amqp_handshake("127.0.0.1",
+                                     reply_server(b"AMQP\x00\x00\x09\x01"))
+    assert not probes.amqp_handshake("127.0.0.1", free_port())
+
+
+def test_probe_timeout():
+    """ Test that a service which never answers is not ready in time. """
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        port = listener.getsockname()[1]
+        assert probes.tcp_connect("127.0.0.1", port)
+
+        start = time.monotonic()
+        assert not probes.redis_ping("127.0.0.1", port, timeout=0.1)
+        assert time.monotonic() - start < 0.5
+
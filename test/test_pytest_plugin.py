@@ -0,0 +1,194 @@
+import docker
+import pytest
+
+# The driver modules are imported up front. Modules first imported by a run
+# of `pytester` are dropped from `sys.modules` afterwards, while the package
+# keeps the old module. The drivers patched by the conftest of a later run
+# would no longer be the drivers of the plugin.
+from integration_tester import (mongo_driver, pytest_plugin, rabbitmq_driver,
+                                redis_driver)
+
+pytest_plugins = ["pytester"]
+
+
+def run_worker(pytester, worker):
+    """ Run pytest as a pytest-xdist worker of its own session.
+
+    Workers find the registry in the parent of their base temporary
+    directory, which would otherwise be shared by every run of the tests.
+    """
+    basetemp = pytester.path / "session" / worker
+    basetemp.parent.mkdir(exist_ok=True)
+    return pytester.runpytest("-p", "no:cacheprovider",
+                              f"--basetemp={basetemp}")
+
+
+def test_registry(tmp_path):
+    """ Test that registry entries persist between locked blocks. """
+    registry = pytest_plugin.ContainerRegistry(str(tmp_path))
+    for worker in ("gw0", "gw1", "gw2"):
+        with registry.locked() as entries:
+            entry = entries.setdefault("mongo", {
+                "container_id": "test",
+                "users": []
+            })
+            entry["users"].append(worker)
+
+    with registry.locked() as entries:
+        assert entries == {
+            "mongo": {
+                "container_id": "test",
+                "users": ["gw0", "gw1", "gw2"]
+            }
+        }
+        del entries["mongo"]
+
+    with registry.locked() as entries:
+        assert not entries
+
+
+def test_redis_fixture(pytester):
+    """ Test that the session container is reused and reset between tests. """
+    pytester.makeini("""
+        [pytest]
+        integration_tester_scope = session
+    """)
+    pytester.makepyfile("""
+        def test_set(redis):
+            redis.client.set("test", "test")
+
+        def test_reset(redis, integration_tester_redis):
+            assert redis is integration_tester_redis
+            assert redis.client.get("test") is None
+    """)
+    result = pytester.runpytest("-p", "no:cacheprovider")
+    result.assert_outcomes(passed=2)
+
+    # The container is removed at the end of the session.
+    client = docker.from_env()
+    assert not client.containers.list(filters={"ancestor": "redis:5.0.7"})
+
+
+def test_invalid_scope(pytester):
+    """ Test that an unknown scope is reported as a usage error. """
+    pytester.makeini("""
+        [pytest]
+        integration_tester_scope = forever
+    """)
+    pytester.makepyfile("""
+        def test_mongo(mongo):
+            pass
+    """)
+    result = pytester.runpytest("--collect-only")
+    assert result.ret != 0
+
+
+def test_share_isolation(pytester, fake_docker, monkeypatch):
+    """ Test that workers sharing containers are isolated and reset.
+
+    The clients of the services are replaced, the fake Docker Engine runs no
+    services.
+    """
+    monkeypatch.setenv("PYTEST_XDIST_WORKER", "gw1")
+    monkeypatch.setenv("PYTEST_XDIST_WORKER_COUNT", "2")
+    pytester.makeini("""
+        [pytest]
+        integration_tester_xdist = share
+    """)
+    pytester.makeconftest("""
+        from unittest import mock
+
+        import pytest
+
+        from integration_tester import (mongo_driver, rabbitmq_driver,
+                                        redis_driver)
+
+        @pytest.fixture(scope="session", autouse=True)
+        def clients():
+            mongo = mock.MagicMock()
+            with mock.patch.object(mongo_driver.MongoDBDriver, "client",
+                                   mongo), \\
+                 mock.patch.object(redis_driver.RedisDriver, "reset",
+                                   autospec=True) as redis_reset, \\
+                 mock.patch.object(rabbitmq_driver.RabbitMQDriver, "shell",
+                                   autospec=True,
+                                   return_value=(0, b"")) as shell:
+                yield mongo, redis_reset, shell
+    """)
+    pytester.makepyfile("""
+        def test_mongo(mongo, mongo_db):
+            assert mongo_db == "test_gw1"
+
+        def test_redis(redis, redis_db):
+            assert redis_db == redis.db == 1
+            assert redis.url.endswith("/1")
+
+        def test_rabbitmq(rabbitmq):
+            assert rabbitmq.vhost == "integration_tester_gw1"
+            assert rabbitmq.url.endswith("/integration_tester_gw1")
+
+        def test_resets(clients, mongo, redis, rabbitmq):
+            client, redis_reset, shell = clients
+            client.drop_database.assert_called_once_with("test_gw1")
+            redis_reset.assert_called_once_with(redis, [1])
+            # The vhost is created once, then reset after `test_rabbitmq`.
+            commands = [call.args[1] for call in shell.call_args_list]
+            assert len(commands) == 2
+            assert all(command.startswith(
+                "RABBITMQ_DEFAULT_VHOST=integration_tester_gw1;")
+                       for command in commands)
+    """)
+    result = run_worker(pytester, "gw1")
+    result.assert_outcomes(passed=4)
+    assert not fake_docker.containers
+
+
+def test_shard_registry(pytester, fake_docker, monkeypatch):
+    """ Test that workers are spread across the shards of a service. """
+    monkeypatch.setenv("PYTEST_XDIST_WORKER", "gw3")
+    monkeypatch.setenv("PYTEST_XDIST_WORKER_COUNT", "4")
+    pytester.makeini("""
+        [pytest]
+        integration_tester_xdist = shard
+        integration_tester_xdist_shards = 2
+    """)
+    pytester.makepyfile("""
+        import json
+
+        def test_shard(integration_tester_redis, tmp_path_factory):
+            registry = tmp_path_factory.getbasetemp().parent.joinpath(
+                "integration_tester.json")
+            entries = json.loads(registry.read_text())
+            assert list(entries) == ["redis-1"]
+            assert entries["redis-1"]["users"] == ["gw3"]
+    """)
+    result = run_worker(pytester, "gw3")
+    result.assert_outcomes(passed=1)
+    assert not fake_docker.containers
+
+
+def test_share_not_ready(pytester, fake_docker, monkeypatch):
+    """ Test that a shared container which never becomes ready is removed.
+    """
+    monkeypatch.setenv("PYTEST_XDIST_WORKER", "gw0")
+    pytester.makeconftest("""
+        from unittest import mock
+
+        import pytest
+
+        from integration_tester import errors, redis_driver
+
+        @pytest.fixture(scope="session", autouse=True)
+        def never_ready():
+            with mock.patch.object(redis_driver.RedisDriver,
+                                   "wait_until_ready",
+                                   side_effect=errors.ReadyTimeout()):
+                yield
+    """)
+    pytester.makepyfile("""
+        def test_redis(redis):
+            pass
+    """)
+    result = run_worker(pytester, "gw0")
+    result.assert_outcomes(errors=1)
+    assert not fake_docker.containers
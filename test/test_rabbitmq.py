@@ -1,4 +1,7 @@
+import os
+import subprocess
 import traceback
+from unittest import mock
 
 import pika
 import pytest
@@ -38,8 +41,164 @@ def test_rabbitmqdriver():
                               auto_ack=True,
                               on_message_callback=consume_test)
 
-    # Attempt to catch any issues within the deconstruction and fail the test.
+    # Attempt to catch any issues within the removal and fail the test. The
+    # next test binds the same port, the container has to be gone first.
     try:
-        del (drive)
+        drive.close()
     except:
         pytest.fail(traceback.format_exc())
+
+
+@pytest.mark.parametrize("tag", ["3.8-management", "3.8"])
+def test_rabbitmq_reset_discovery(tag):
+    """ Test that reset finds queues and exchanges without being told.
+
+    The management API is used for `-management` tags and `rabbitmqctl`
+    otherwise, when asked to. The latency of the reset is measured by
+    `test/benchmark/test_reset.py`.
+    """
+    drive = rabbitmq_driver.RabbitMQDriver(tag=tag,
+                                           port=0,
+                                           management_port=0)
+    drive.wait_until_ready()
+
+    connection = pika.BlockingConnection(pika.URLParameters(drive.url))
+    channel = connection.channel()
+    channel.exchange_declare("test_exchange")
+    channel.queue_declare("test_queue")
+    channel.queue_bind("test_queue", "test_exchange")
+
+    drive.reset(discover=True)
+
+    with pytest.raises(pika.exceptions.ChannelClosedByBroker):
+        channel.queue_declare("test_queue", passive=True)
+    channel = connection.channel()
+    with pytest.raises(pika.exceptions.ChannelClosedByBroker):
+        channel.exchange_declare("test_exchange", passive=True)
+
+    drive.close()
+
+
+def test_rabbitmq_client_reuse():
+    """ Test that `reset` reuses the connection of the driver.
+
+    `ready` probes the raw protocol and leaves the connection untouched.
+    """
+    drive = rabbitmq_driver.RabbitMQDriver(tag="3.8-management")
+    drive.wait_until_ready()
+
+    connection = drive.client
+    connection.channel().queue_declare("test")
+    assert drive.ready()
+    drive.reset()
+    assert drive.client is connection
+
+    with pytest.raises(pika.exceptions.ChannelClosedByBroker):
+        connection.channel().queue_declare("test", passive=True)
+
+    drive.close()
+
+
+def test_rabbitmq_exec_reset():
+    """ Test that `reset` works again after the vhost is recreated. """
+    drive = rabbitmq_driver.RabbitMQDriver()
+    drive.wait_until_ready()
+
+    drive.client.channel().queue_declare("test")
+    drive.reset()
+    connection = drive.client
+    connection.channel().queue_declare("test")
+
+    drive.exec_reset()
+    assert not connection.is_open
+    with pytest.raises(pika.exceptions.ChannelClosedByBroker):
+        drive.client.channel().queue_declare("test", passive=True)
+
+    drive.client.channel().queue_declare("test")
+    drive.reset()
+    with pytest.raises(pika.exceptions.ChannelClosedByBroker):
+        drive.client.channel().queue_declare("test", passive=True)
+
+    drive.close()
+
+
+def test_rabbitmq_exec_reset_vhost(fake_docker):
+    """ Test that `exec_reset` recreates the configured vhost and drops the
+    connection of the driver.
+    """
+    drive = rabbitmq_driver.RabbitMQDriver(
+        port=0, environment={"RABBITMQ_DEFAULT_VHOST": "tests"})
+    assert drive.vhost == "tests"
+    assert drive.url.endswith("/tests")
+
+    commands = []
+    drive.shell = lambda command: commands.append(command) or (0, b"")
+    connection = mock.Mock(is_open=True)
+    drive._connection = connection
+    drive.exec_reset()
+
+    assert "${RABBITMQ_DEFAULT_VHOST:-/}" in commands[0]
+    connection.close.assert_called_once()
+    assert drive._connection is None
+    drive.close()
+
+
+def test_rabbitmq_reset_default(fake_docker):
+    """ Test that without the management API `reset` recreates the vhost
+    instead of listing queues with `rabbitmqctl`.
+    """
+    drive = rabbitmq_driver.RabbitMQDriver(port=0)
+    commands = []
+    drive.shell = lambda command: commands.append(command) or (0, b"")
+    drive.execute = mock.Mock(return_value=(0, b"[]"))
+
+    drive.reset()
+    assert commands == [drive.reset_command]
+    drive.execute.assert_not_called()
+
+    drive.reset(discover=True)
+    assert len(commands) == 1
+    assert drive.execute.call_count == 2
+    drive.close()
+
+
+def test_rabbitmq_reset_command(fake_docker, tmp_path):
+    """ Test that the vhost is recreated with the `rabbitmqctl` commands.
+
+    `rabbitmqctl` is replaced by a script recording its arguments. Deleting
+    the vhost fails, as it does when the vhost is missing.
+    """
+    rabbitmqctl = tmp_path / "rabbitmqctl"
+    rabbitmqctl.write_text("#!/bin/sh\nprintf '[%s]' \"$@\" >> calls\n"
+                           "echo >> calls\n[ \"$2\" != delete_vhost ]\n")
+    rabbitmqctl.chmod(0o755)
+    environment = dict(os.environ,
+                       PATH=f"{tmp_path}:{os.environ['PATH']}",
+                       RABBITMQ_DEFAULT_USER="guest")
+
+    drive = rabbitmq_driver.RabbitMQDriver(port=0, vhost='say "hi"\\')
+    subprocess.run(["sh", "-c", drive.reset_command],
+                   check=True,
+                   cwd=tmp_path,
+                   env=environment)
+    drive.close()
+
+    assert (tmp_path / "calls").read_text().splitlines() == [
+        '[-q][delete_vhost][say "hi"\\]',
+        '[-q][add_vhost][say "hi"\\]',
+        '[-q][set_permissions][-p][say "hi"\\][guest][.*][.*][.*]',
+    ]
+
+
+def test_rabbitmq_vhost_created(fake_docker):
+    """ Test that a custom vhost is created once the service is ready. """
+    drive = rabbitmq_driver.RabbitMQDriver(port=0, vhost="tests")
+    commands = []
+    drive.shell = lambda command: commands.append(command) or (0, b"")
+
+    drive.wait_until_ready()
+    drive.create_vhost()
+    assert commands == [drive.vhost_command]
+    assert commands[0].startswith("RABBITMQ_DEFAULT_VHOST=tests;")
+    assert "add_vhost" in commands[0] and "delete_vhost" not in commands[0]
+    drive.close()
@@ -0,0 +1,158 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import docker
+import pytest
+
+from fake_docker import FakeDocker
+from integration_tester import backends, reaper
+
+
+class FakeContainer:
+
+    def __init__(self, container_id, labels, removed=False):
+        self.id = container_id
+        self.labels = labels
+        self.removed = removed
+
+    def remove(self, v=False, force=False):
+        if self.removed:
+            raise docker.errors.NotFound(self.id)
+        self.removed = True
+
+
+class FakeClient:
+    """ Local stand-in for a Docker service holding labelled containers. """
+
+    def __init__(self, containers):
+        self.listed = containers
+
+    @property
+    def containers(self):
+        return self
+
+    def list(self, all=False, filters=None):
+        return list(self.listed)
+
+
+def finished_pid():
+    """ Retrieve the PID of a process which is no longer running. """
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def container_labels(pid, host=None, created=None):
+    labels = reaper.labels()
+    labels[reaper.PID_LABEL] = str(pid)
+    if host is not None:
+        labels[reaper.HOST_LABEL] = host
+    if created is not None:
+        labels[reaper.CREATED_LABEL] = str(int(created))
+    return labels
+
+
+def test_reap_stale():
+    """ Test that only containers of finished processes are reaped. """
+    dead = finished_pid()
+    containers = [
+        FakeContainer("running", container_labels(os.getpid())),
+        FakeContainer("dead", container_labels(dead)),
+        FakeContainer("removed", container_labels(dead), removed=True),
+        FakeContainer("remote", container_labels(dead, host="remote")),
+    ]
+    assert socket.gethostname() != "remote"
+
+    removed = reaper.reap(client=FakeClient(containers))
+    assert removed == ["dead"]
+    assert not containers[0].removed
+    assert not containers[3].removed
+
+
+def test_reap_max_age():
+    """ Test that old containers are reaped whichever host created them. """
+    containers = [
+        FakeContainer(
+            "old", container_labels(1,
+                                    host="remote",
+                                    created=time.time() - 600)),
+        FakeContainer("new", container_labels(1, host="remote")),
+    ]
+    assert reaper.reap(max_age=60, client=FakeClient(containers)) == ["old"]
+    assert reaper.reap(everything=True,
+                       client=FakeClient(containers)) == ["new"]
+
+
+def test_signal_handler(monkeypatch):
+    """ Test that signal handlers unwind instead of closing drivers.
+
+    The drivers are closed by the exit handler, a signal received while a
+    lock is held must not close them from inside the handler.
+    """
+    monkeypatch.setattr(reaper, "close_all",
+                        lambda: pytest.fail("Closed in the signal handler."))
+    with pytest.raises(SystemExit) as exit_info:
+        with reaper._LOCK:
+            reaper._handler(signal.SIG_DFL)(signal.SIGTERM, None)
+    assert exit_info.value.code == 128 + signal.SIGTERM
+
+    received = []
+    reaper._handler(lambda *args: received.append(args))(signal.SIGINT, None)
+    assert received == [(signal.SIGINT, None)]
+    reaper._handler(signal.SIG_IGN)(signal.SIGTERM, None)
+
+
+def test_install_off_main_thread(monkeypatch):
+    """ Test that signal handlers are installed once the main thread tracks a
+    container, even if the first container was created by another thread.
+    """
+    registered = []
+    monkeypatch.setattr(reaper.atexit, "register", registered.append)
+    monkeypatch.setattr(reaper, "_EXIT_INSTALLED", False)
+    monkeypatch.setattr(reaper, "_SIGNALS_INSTALLED", False)
+    previous = {
+        signum: signal.getsignal(signum)
+        for signum in (signal.SIGINT, signal.SIGTERM)
+    }
+    try:
+        thread = threading.Thread(target=reaper.install)
+        thread.start()
+        thread.join()
+        assert registered == [reaper.close_all]
+        assert signal.getsignal(signal.SIGTERM) is previous[signal.SIGTERM]
+
+        reaper.install()
+        reaper.install()
+        assert registered == [reaper.close_all]
+        assert signal.getsignal(signal.SIGTERM) is not previous[signal.SIGTERM]
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+
+def test_reap_endpoints(fake_docker, monkeypatch):
+    """ Test that containers are reaped on every endpoint of `backends`. """
+    remote = FakeDocker(images=["ubuntu:latest"])
+    remote.start()
+    try:
+        unreachable = backends.Endpoint("tcp://127.0.0.1:9")
+        scheduler = backends.Scheduler(
+            [backends.endpoint(remote.url), unreachable])
+        monkeypatch.setattr(backends, "SCHEDULER", scheduler)
+        labels = container_labels(finished_pid())
+        created = [
+            client.containers.create("ubuntu:latest", labels=labels).id
+            for client in (docker.from_env(),
+                           docker.DockerClient(base_url=remote.url))
+        ]
+
+        assert sorted(reaper.reap()) == sorted(created)
+        assert not fake_docker.containers
+        assert not remote.containers
+    finally:
+        remote.stop()
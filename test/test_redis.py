@@ -1,9 +1,10 @@
+import asyncio
 import traceback
 
 import pytest
 import redis
 
-from integration_tester import redis_driver
+from integration_tester import errors, redis_driver
 
 
 def test_redis():
@@ -18,8 +19,90 @@ def test_redis():
     drive.reset()
     assert db.get("test") is None
 
-    # Attempt to catch any issues within the deconstruction and fail the test.
+    # Attempt to catch any issues within the removal and fail the test. The
+    # next test binds the same port, the container has to be gone first.
     try:
-        del (drive)
+        drive.close()
     except:
         pytest.fail(traceback.format_exc())
+
+
+def test_async_redis():
+    """ Asynchronous redis test. """
+
+    async def run():
+        async with redis_driver.AsyncRedisDriver() as drive:
+            db = redis.Redis()
+            assert db.set("test", "test")
+            await drive.reset()
+            assert db.get("test") is None
+
+    asyncio.run(run())
+
+
+def test_redis_databases():
+    """ Test that parallel users of logical databases are isolated. """
+    drive = redis_driver.RedisDriver(databases=3)
+    drive.wait_until_ready()
+
+    first, second = drive.acquire_db(), drive.acquire_db()
+    assert {first, second} == {1, 2}
+    with pytest.raises(errors.DatabaseUnavailable):
+        drive.acquire_db()
+
+    drive.client.set("test", "driver")
+    redis.Redis(db=first).set("test", "first")
+    redis.Redis(db=second).set("test", "second")
+
+    drive.release_db(first)
+    assert redis.Redis(db=first).get("test") is None
+    assert redis.Redis(db=second).get("test").decode("utf-8") == "second"
+    assert drive.client.get("test").decode("utf-8") == "driver"
+    assert drive.acquire_db() == first
+
+    drive.reset()
+    assert redis.Redis(db=second).get("test") is None
+    drive.close()
+
+
+def test_redis_databases_exclude_client(fake_docker):
+    """ Test that the database of the client is not leased. """
+    drive = redis_driver.RedisDriver(port=0, databases=2, db=1)
+    assert drive.acquire_db() == 0
+    with pytest.raises(errors.DatabaseUnavailable):
+        drive.acquire_db()
+    drive.close()
+
+
+def test_redis_client_reuse():
+    """ Test that `reset` reuses the client of the driver.
+
+    `ready` probes the raw protocol and leaves the client untouched.
+    """
+    drive = redis_driver.RedisDriver()
+    drive.wait_until_ready()
+
+    client = drive.client
+    assert client.set("test", "test")
+    assert drive.ready()
+    drive.reset()
+    assert drive.client is client
+    assert client.get("test") is None
+
+    drive.close()
+
+
+def test_redis_fast():
+    """ Test that a fast driver keeps its data in memory only. """
+    drive = redis_driver.RedisDriver(port=0, fast=True)
+    drive.wait_until_ready()
+
+    assert drive.client.config_get("save") == {"save": ""}
+    assert drive.client.config_get("appendonly") == {"appendonly": "no"}
+    container = drive._get_docker_client().containers.get(drive._container_id)
+    assert "/data" in container.attrs["HostConfig"]["Tmpfs"]
+
+    drive.client.set("test", "test")
+    drive.reset()
+    assert drive.client.get("test") is None
+    drive.close()
@@ -0,0 +1,141 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from integration_tester import (backends, driver, mongo_driver,
+                                rabbitmq_driver, redis_driver, reaper,
+                                resources)
+
+# Acquires a CPU set from a shared claims file and holds it until its standard
+# input is closed.
+ACQUIRE_SCRIPT = """
+import sys
+
+from integration_tester import resources
+
+cpus = resources.CpuAllocator(4, sys.argv[1])
+print(cpus.acquire(2), flush=True)
+sys.stdin.read()
+"""
+
+
+def test_memory_bytes():
+    """ Test the conversion of Docker memory sizes. """
+    assert resources.memory_bytes(None) is None
+    assert resources.memory_bytes(1024) == 1024
+    assert resources.memory_bytes("512m") == 512 * 1024**2
+    assert resources.memory_bytes("1.5G") == 3 * 1024**3 // 2
+    assert resources.memory_bytes("100") == 100
+    with pytest.raises(ValueError):
+        resources.memory_bytes("lots")
+
+
+def test_cpu_allocator():
+    """ Test that CPU sets are disjoint until every CPU is used. """
+    cpus = resources.CpuAllocator(4)
+    first, second = cpus.acquire(2), cpus.acquire(2)
+    assert {first, second} == {"0,1", "2,3"}
+    assert cpus.acquire(1) == "0"
+    cpus.release(second)
+    assert cpus.acquire(3) == "1,2,3"
+    assert cpus.acquire(8) == "0,1,2,3"
+
+
+def test_cpu_allocator_processes(tmp_path):
+    """ Test that processes sharing a claims file get disjoint CPU sets. """
+    pytest.importorskip("fcntl")
+    path = str(tmp_path / "cpus.json")
+    processes = [
+        subprocess.Popen([sys.executable, "-c", ACQUIRE_SCRIPT, path],
+                         stdin=subprocess.PIPE,
+                         stdout=subprocess.PIPE) for _ in range(2)
+    ]
+    try:
+        cpusets = {
+            process.stdout.readline().decode("utf-8").strip()
+            for process in processes
+        }
+        assert cpusets == {"0,1", "2,3"}
+        assert resources.CpuAllocator(4, path).usage == [1, 1, 1, 1]
+    finally:
+        for process in processes:
+            process.stdin.close()
+            process.wait()
+
+    # Claims of processes which are no longer running are dropped.
+    assert resources.CpuAllocator(4, path).usage == [0, 0, 0, 0]
+
+
+def test_cpu_allocator_stale_claims(tmp_path):
+    """ Test that claims of dead processes are dropped from the file. """
+    pytest.importorskip("fcntl")
+    path = tmp_path / "cpus.json"
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    path.write_text(json.dumps({str(dead.pid): ["0,1"]}))
+
+    cpus = resources.CpuAllocator(4, str(path))
+    assert cpus.acquire(2) == "0,1"
+    assert cpus.acquire(1, busy=["2"]) == "3"
+
+
+def test_driver_limits(fake_docker):
+    """ Test that limits are passed to the container. """
+    drive = driver.Driver("ubuntu:latest",
+                          mem_limit="256m",
+                          cpuset_cpus="1",
+                          nano_cpus=500000000,
+                          shm_size="64m",
+                          environment={"TEST": "test"})
+    config = fake_docker.containers[drive._container_id]
+    assert config["HostConfig"]["Memory"] == 256 * 1024**2
+    assert config["HostConfig"]["CpusetCpus"] == "1"
+    assert config["HostConfig"]["NanoCpus"] == 500000000
+    assert config["HostConfig"]["ShmSize"] == 64 * 1024**2
+    assert config["Config"]["Env"] == ["TEST=test"]
+    drive.close()
+
+
+def test_driver_auto_limits(fake_docker):
+    """ Test the service presets and the CPU sets of concurrent drivers. """
+    mongo = mongo_driver.MongoDBDriver(port=0,
+                                       mem_limit=resources.AUTO,
+                                       cpuset_cpus=resources.AUTO)
+    rabbitmq = rabbitmq_driver.RabbitMQDriver(port=0,
+                                              mem_limit=resources.AUTO,
+                                              cpuset_cpus=resources.AUTO)
+    redis = redis_driver.RedisDriver(port=0, mem_limit="1g")
+
+    assert mongo.mem_limit == 1024**3
+    assert "--wiredTigerCacheSizeGB" in mongo.command
+    assert mongo.command[mongo.command.index("--wiredTigerCacheSizeGB") +
+                         1] == "0.25"
+    assert {mongo.cpuset_cpus, rabbitmq.cpuset_cpus} == {"0,1", "2,3"}
+    environment = fake_docker.containers[rabbitmq._container_id]["Config"]
+    assert environment["Env"] == [
+        "RABBITMQ_SERVER_ADDITIONAL_ERL_ARGS="
+        "-rabbit vm_memory_high_watermark {absolute,214748364}"
+    ]
+    assert redis.command[-2:] == ["--maxmemory", str(768 * 1024**2)]
+
+    allocator = resources.allocator(backends.LOCAL)
+    mongo.close()
+    rabbitmq.close()
+    redis.close()
+    assert allocator.usage == [0, 0, 0, 0]
+
+
+def test_foreign_cpusets(fake_docker):
+    """ Test that CPU sets of containers from other machines are avoided. """
+    other = driver.Driver("ubuntu:latest", cpuset_cpus="0,1")
+    labels = fake_docker.containers[other._container_id]["Config"]["Labels"]
+    assert labels[resources.CPUSET_LABEL] == "0,1"
+    labels[reaper.HOST_LABEL] = "elsewhere"
+    assert resources.foreign_cpusets(backends.LOCAL) == ["0,1"]
+
+    drive = driver.Driver("ubuntu:latest", cpuset_cpus=resources.AUTO)
+    assert drive.cpuset_cpus == "2"
+    drive.close()
+    other.close()
@@ -0,0 +1,84 @@
+import docker
+import pytest
+
+from integration_tester import driver, redis_driver, seeding
+
+
+def seed_users(redis):
+    redis.client.set("user", "test")
+
+
+def seed_other_users(redis):
+    redis.client.set("user", "other")
+
+
+def test_key(tmp_path):
+    """ Test that the key changes with every input of the seeded image. """
+    fixture = tmp_path / "fixtures"
+    fixture.mkdir()
+    (fixture / "users.json").write_text("[]")
+
+    base = seeding.key(redis_driver.RedisDriver,
+                       seed_users,
+                       inputs=[str(fixture)])
+    assert base == seeding.key(redis_driver.RedisDriver,
+                               seed_users,
+                               inputs=[str(fixture)])
+
+    # Default arguments are part of the key.
+    assert base == seeding.key(redis_driver.RedisDriver,
+                               seed_users,
+                               tag="5.0.7",
+                               inputs=[str(fixture)])
+    assert base != seeding.key(redis_driver.RedisDriver,
+                               seed_users,
+                               tag="6.0",
+                               inputs=[str(fixture)])
+
+    # Arguments which do not affect the data are not.
+    assert base == seeding.key(redis_driver.RedisDriver,
+                               seed_users,
+                               port=0,
+                               inputs=[str(fixture)])
+
+    assert base != seeding.key(redis_driver.RedisDriver,
+                               seed_other_users,
+                               inputs=[str(fixture)])
+
+    (fixture / "users.json").write_text("[{}]")
+    assert base != seeding.key(redis_driver.RedisDriver,
+                               seed_users,
+                               inputs=[str(fixture)])
+
+
+def test_unsupported_driver():
+    """ Test that drivers without a seed directory are rejected. """
+    with pytest.raises(TypeError, match="^Driver does not support"):
+        seeding.start(driver.Driver, seed_users, "ubuntu:latest")
+
+
+def test_seeded_redis():
+    """ Test that the seed runs once and later drivers start seeded. """
+    calls = []
+
+    def seed(redis):
+        calls.append(redis)
+        seed_users(redis)
+
+    image = seeding.reference(redis_driver.RedisDriver,
+                              seeding.key(redis_driver.RedisDriver, seed))
+    client = docker.from_env()
+    try:
+        client.images.remove(image)
+    except docker.errors.ImageNotFound:
+        pass
+
+    first = seeding.start(redis_driver.RedisDriver, seed, port=0)
+    second = seeding.start(redis_driver.RedisDriver, seed, port=0)
+    assert len(calls) == 1
+    assert second.image == image
+    assert second.client.get("user") == b"test"
+
+    first.close()
+    second.close()
+    client.images.remove(image)
@@ -0,0 +1,69 @@
+import pytest
+
+from integration_tester import driver, errors, redis_driver
+
+
+class EchoResetDriver(driver.Driver):
+    """ Driver resetting with a command available outside of a container. """
+    reset_command = "echo reset"
+
+
+def exec_creates(fake_docker):
+    """ Count the exec instances created on the fake Docker Engine. """
+    return sum(path.endswith("/exec") for _, path in fake_docker.requests)
+
+
+def test_shell(fake_docker):
+    """ Test that every command reuses the same exec instance. """
+    drive = driver.Driver("ubuntu:latest")
+    assert drive.shell("echo one; echo two >&2") == (0, b"one\ntwo\n")
+    assert drive.shell("printf partial; false") == (1, b"partial")
+    assert drive.shell("cat") == (0, b"")
+    assert drive.shell("export LEAKED=1; exit 4") == (4, b"")
+    assert drive.shell("echo ${LEAKED:-unset}") == (0, b"unset\n")
+    assert exec_creates(fake_docker) == 1
+    drive.close()
+
+
+def test_shell_restart(fake_docker):
+    """ Test that a new shell is started once the previous one has exited. """
+    drive = driver.Driver("ubuntu:latest")
+    with pytest.raises(errors.ShellExited):
+        drive.shell("kill -9 $$")
+    assert drive.shell("echo again") == (0, b"again\n")
+    assert exec_creates(fake_docker) == 2
+    drive.close()
+
+
+def test_shell_sandbox(fake_docker):
+    """ Test that commands unknown to the fake Docker Engine are not run. """
+    drive = driver.Driver("ubuntu:latest")
+    assert drive.shell("touch leaked") == (127, b"sh: touch: not found\n")
+    assert drive.shell("kill -9 1") == (1, b"sh: kill: No such process\n")
+    assert drive.execute(["rm", "-rf", "leaked"]) == (
+        127, b"sh: rm: not found\n")
+    drive.close()
+
+
+def test_exec_reset(fake_docker):
+    """ Test that `exec_reset` runs `reset_command` and reports failures. """
+    drive = EchoResetDriver("ubuntu:latest")
+    drive.exec_reset()
+    drive.exec_reset()
+    assert exec_creates(fake_docker) == 1
+
+    drive.reset_command = "echo broken >&2; exit 2"
+    with pytest.raises(RuntimeError, match="broken"):
+        drive.exec_reset()
+    drive.close()
+
+    # Drivers without a reset command are left as they are.
+    drive = driver.Driver("ubuntu:latest")
+    drive.exec_reset()
+    assert exec_creates(fake_docker) == 1
+    drive.close()
+
+
+def test_reset_commands():
+    """ Test the reset commands of the service drivers. """
+    assert redis_driver.RedisDriver.reset_command == "redis-cli FLUSHALL ASYNC"
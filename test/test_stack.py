@@ -0,0 +1,141 @@
+import time
+
+import docker
+import pytest
+
+from integration_tester import driver, errors, stack
+
+
+class SlowDriver(driver.Driver):
+    """ Driver which takes one second to become ready.
+
+    The container runs `sleep`, the default command of the images exits
+    straight away and `wait_until_ready` would fail with `ContainerExited`.
+    `sleep` ignores SIGTERM as PID 1, so it is killed on close.
+    """
+
+    def __init__(self, tag: str = "ubuntu:latest"):
+        super().__init__(tag, command=["sleep", "3600"], stop_timeout=0)
+        self.created = time.monotonic()
+
+    def ready(self) -> bool:
+        return time.monotonic() - self.created >= 1
+
+
+class NeverReadyDriver(driver.Driver):
+    """ Driver which never becomes ready. """
+
+    def ready(self) -> bool:
+        return False
+
+
+def test_stack_parallel_start():
+    """ Test that independent services start concurrently.
+
+    Three services that each take a second to become ready should take about
+    as long as one of them, not three times as long.
+    """
+    services = stack.Stack()
+    services.add("first", SlowDriver)
+    services.add("second", SlowDriver)
+    services.add("third", SlowDriver, tag="alpine:3.8")
+
+    start = time.monotonic()
+    with services:
+        assert time.monotonic() - start < 3
+        assert isinstance(services["first"], SlowDriver)
+        services.reset()
+    assert not services.drivers
+
+
+def test_stack_dependencies():
+    """ Test that services wait for the services they depend on. """
+    services = stack.Stack()
+    services.add("dependant", SlowDriver, depends_on=["dependency"])
+    services.add("dependency", SlowDriver)
+    assert services.order() == ["dependency", "dependant"]
+
+    with services:
+        assert (services["dependant"].created -
+                services["dependency"].created) >= 1
+
+
+def test_stack_invalid_dependencies():
+    """ Test unknown and circular dependencies are rejected. """
+    services = stack.Stack()
+    services.add("first", SlowDriver, depends_on=["missing"])
+    with pytest.raises(errors.DependencyError):
+        services.order()
+
+    services = stack.Stack()
+    services.add("first", SlowDriver, depends_on=["second"])
+    services.add("second", SlowDriver, depends_on=["first"])
+    with pytest.raises(errors.DependencyError):
+        services.start()
+
+
+def test_stack_not_ready(fake_docker):
+    """ Test that a service which never becomes ready is removed. """
+    created = []
+
+    def never_ready(*args, **kwargs):
+        instance = NeverReadyDriver(*args, **kwargs)
+        created.append(instance)
+        return instance
+
+    services = stack.Stack()
+    services.add("first", never_ready, "ubuntu:latest")
+    with pytest.raises(errors.ReadyTimeout):
+        services.start(timeout=1)
+
+    assert not services.drivers
+    assert created[0]._container_id not in fake_docker.containers
+
+
+def test_stack_fast_teardown():
+    """ Test that killed services are removed concurrently.
+
+    `sleep` ignores SIGTERM as PID 1, so a graceful stop of each service would
+    wait for the whole stop timeout.
+    """
+    services = stack.Stack()
+    for name in ("first", "second", "third"):
+        services.add(name,
+                     driver.Driver,
+                     "ubuntu:latest",
+                     command=["sleep", "infinity"],
+                     stop_timeout=0)
+
+    with services:
+        containers = [
+            instance._container_id for instance in services.drivers.values()
+        ]
+        start = time.monotonic()
+    assert time.monotonic() - start < 5
+
+    client = docker.from_env()
+    for container_id in containers:
+        with pytest.raises(docker.errors.NotFound):
+            client.containers.get(container_id)
+
+
+def test_stack_background_teardown():
+    """ Test that removals can be left to background threads. """
+    services = stack.Stack(wait_on_stop=False)
+    services.add("first", driver.Driver, "ubuntu:latest", stop_timeout=0)
+    services.start()
+    container_id = services["first"]._container_id
+
+    services.stop()
+    assert not services.drivers
+
+    deadline = time.monotonic() + 10
+    client = docker.from_env()
+    while time.monotonic() < deadline:
+        try:
+            client.containers.get(container_id)
+        except docker.errors.NotFound:
+            break
+        time.sleep(0.1)
+    else:
+        pytest.fail("Container was not removed in the background.")